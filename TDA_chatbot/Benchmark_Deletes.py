@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import statistics
+from datetime import datetime
+import numpy as np
+import chromadb
+from tabulate import tabulate
+from Chroma import delete_where
+from Benchmark_Ingestion import RESULTS_DIR
+
+
+DEFAULT_SIZES = [10_000, 50_000, 100_000, 250_000]
+
+
+def scan_delete(collection, source_value, page_size=5000):
+    """
+    The previous implementation: load the whole collection and filter the metadata in Python.
+
+    The collection is read in pages, since recent ChromaDB versions reject a single get() of a
+    large collection (too many SQL variables); every document and metadata is still loaded.
+    """
+    ids_to_delete = []
+    offset = 0
+    while True:
+        documents = collection.get(limit=page_size, offset=offset)
+        if not documents["ids"]:
+            break
+        ids_to_delete.extend(doc_id for doc_id, metadata in zip(documents["ids"], documents["metadatas"])
+                             if metadata.get("source") == source_value)
+        offset += len(documents["ids"])
+    if ids_to_delete:
+        collection.delete(ids=ids_to_delete)
+    return len(ids_to_delete)
+
+
+def filtered_delete(collection, source_value):
+    """The current implementation: delete the source's chunks through ChromaDB's metadata index."""
+    return delete_where(collection, {"source": source_value})
+
+
+class DeleteBenchmark:
+    def __init__(self, sizes=None, chunks_per_source=200, dim=64, trials=3, scan=True, seed=0):
+        """
+        Benchmark deleting one resource's chunks as the collection grows.
+
+        Synthetic chunks with random vectors are written to a throw-away ChromaDB directory, so
+        no embedding model is needed. At every collection size one source is deleted with the
+        old full scan and with the metadata-filtered delete_where, then restored.
+
+        :param sizes: Collection sizes (number of chunks) to measure at.
+        :param chunks_per_source: Chunks belonging to each synthetic source.
+        :param dim: Vector dimension (the delete cost hardly depends on it; 768 matches PubMedBERT).
+        :param trials: Deletes timed per method and size; the median is reported.
+        :param scan: Also time the old full-scan delete (slow on large collections).
+        """
+        self.sizes = sorted(sizes or DEFAULT_SIZES)
+        self.chunks_per_source = chunks_per_source
+        self.dim = dim
+        self.trials = trials
+        self.scan = scan
+        self.rng = np.random.default_rng(seed)
+
+    def _records(self, source_index):
+        source = f"/uploads/resource_{source_index}.pdf"
+        ids = [f"chunk_{source_index}_{i}" for i in range(self.chunks_per_source)]
+        metadatas = [{"id": doc_id, "source": source, "chunk_index": i + 1} for i, doc_id in enumerate(ids)]
+        documents = [f"Synthetic chunk {i} of resource {source_index}." for i in range(self.chunks_per_source)]
+        embeddings = self.rng.standard_normal((self.chunks_per_source, self.dim), dtype=np.float32)
+        return source, ids, documents, metadatas, embeddings
+
+    def _add_source(self, collection, source_index):
+        source, ids, documents, metadatas, embeddings = self._records(source_index)
+        collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+        return source
+
+    def _time_delete(self, collection, method, source_indices):
+        timings = []
+        for source_index in source_indices:
+            source = f"/uploads/resource_{source_index}.pdf"
+            start = time.perf_counter()
+            deleted = method(collection, source)
+            timings.append((time.perf_counter() - start) * 1000)
+            if deleted != self.chunks_per_source:
+                raise RuntimeError(f"Expected to delete {self.chunks_per_source} chunks of '{source}', deleted {deleted}.")
+            self._add_source(collection, source_index)
+        return round(statistics.median(timings), 2)
+
+    def run(self):
+        """
+        Grow the collection through every size and time the deletes.
+
+        :return: Report dictionary.
+        """
+        index_dir = tempfile.mkdtemp(prefix="tda_delete_bench_")
+        results = []
+        try:
+            client = chromadb.PersistentClient(path=index_dir)
+            collection = client.create_collection(name="benchmark")
+            sources = 0
+            for size in self.sizes:
+                print(f"Growing the collection to {size} chunks...")
+                while sources * self.chunks_per_source < size:
+                    self._add_source(collection, sources)
+                    sources += 1
+
+                # Sources spread over the collection: oldest, middle and newest
+                picks = np.linspace(0, sources - 1, self.trials).astype(int).tolist()
+                result = {
+                    "chunks": collection.count(),
+                    "filtered_delete_ms": self._time_delete(collection, filtered_delete, picks),
+                    "scan_delete_ms": self._time_delete(collection, scan_delete, picks) if self.scan else None,
+                }
+                results.append(result)
+                print(f"  filtered: {result['filtered_delete_ms']} ms | scan: {result['scan_delete_ms']} ms")
+            del collection, client
+        finally:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+        return {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "chromadb": chromadb.__version__,
+            "chunks_per_source": self.chunks_per_source,
+            "dim": self.dim,
+            "trials": self.trials,
+            "results": results,
+        }
+
+    def format_results(self, report):
+        """Format the benchmark report for terminal display."""
+        rows = [
+            [r["chunks"], r["filtered_delete_ms"], r["scan_delete_ms"] if r["scan_delete_ms"] is not None else "-",
+             round(r["scan_delete_ms"] / r["filtered_delete_ms"], 1) if r["scan_delete_ms"] and r["filtered_delete_ms"] else "-"]
+            for r in report["results"]
+        ]
+        headers = ["Chunks in collection", "where-filtered delete (ms)", "Full-scan delete (ms)", "Speed-up"]
+        return (f"Deleting one source of {report['chunks_per_source']} chunks (median of {report['trials']})\n"
+                + tabulate(rows, headers=headers, tablefmt="grid"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark deleting a resource's chunks as the collection grows.")
+    parser.add_argument("--size", type=int, action="append", default=None,
+                        help="Collection size to measure at (repeatable, default: 10k, 50k, 100k, 250k).")
+    parser.add_argument("--chunks-per-source", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=64, help="Vector dimension (default: 64).")
+    parser.add_argument("--trials", type=int, default=3)
+    parser.add_argument("--no-scan", action="store_true", help="Skip the slow full-scan delete.")
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmark_results/deletes_<timestamp>.json).")
+    args = parser.parse_args(argv)
+
+    benchmark = DeleteBenchmark(args.size, args.chunks_per_source, args.dim, args.trials, scan=not args.no_scan)
+    report = benchmark.run()
+    print(benchmark.format_results(report))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"deletes_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to '{output}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
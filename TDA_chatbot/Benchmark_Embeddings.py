@@ -0,0 +1,177 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+from datetime import datetime
+import numpy as np
+from tabulate import tabulate
+from Ingestion import Ingestion_file
+from Embedding_Model import PubMedBERT
+from Onnx_Embeddings import BACKENDS, BACKEND_TORCH, BACKEND_ONNX, BACKEND_ONNX_INT8
+from Benchmark_Ingestion import DATA_DIR, RESULTS_DIR, DRUG_QUESTIONS
+
+
+# Minimum cosine similarity every vector must reach against the PyTorch vector of the same text
+PARITY_THRESHOLDS = {BACKEND_ONNX: 0.999, BACKEND_ONNX_INT8: 0.98}
+
+
+def load_sample_texts(data_dir=DATA_DIR, limit=256):
+    """
+    Collect chunk texts from the bundled Beers PDF and CSV tables.
+
+    :param data_dir: Directory holding the Beers PDF and the "csv" tables.
+    :param limit: Maximum number of texts returned.
+    :return: List of chunk texts.
+    """
+    ingesting = Ingestion_file()
+    texts = []
+    for root, _, filenames in os.walk(data_dir):
+        for name in sorted(filenames):
+            path = os.path.join(root, name)
+            if name.lower().endswith(".pdf"):
+                texts.extend(doc["text"] for doc in ingesting.chunk_pdf_text(path))
+            elif name.lower().endswith(".csv"):
+                texts.extend(doc["text"] for doc in ingesting.chunk_beers_table(path))
+    return texts[:limit]
+
+
+def check_parity(reference, candidate, threshold):
+    """
+    Compare the vectors of two backends for the same texts.
+
+    :param reference: List of reference (PyTorch) vectors.
+    :param candidate: List of vectors of the backend under test, same order.
+    :param threshold: Minimum cosine similarity every pair must reach.
+    :return: Dictionary with mean_cosine, min_cosine, threshold and passed.
+    """
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    cosines = (reference * candidate).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    return {
+        "mean_cosine": round(float(cosines.mean()), 6),
+        "min_cosine": round(float(cosines.min()), 6),
+        "threshold": threshold,
+        "passed": bool(cosines.min() >= threshold),
+    }
+
+
+def benchmark_backend(backend, texts, queries, repeats=3):
+    """
+    Measure load time, per-query latency and ingest throughput of one backend on CPU.
+
+    :param backend: One of BACKENDS.
+    :param texts: Chunk texts embedded for the throughput measurement.
+    :param queries: Short questions embedded one at a time for the latency measurement.
+    :param repeats: Number of times every query is embedded.
+    :return: Tuple of (result dictionary, document vectors).
+    """
+    # The cache is disabled so every call reaches the model
+    model = PubMedBERT(backend=backend, use_cache=False)
+    start = time.perf_counter()
+    model.embed_query("warm-up")
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            model.embed_query(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    model.reset_stats()
+    vectors = model.embed_documents_array(texts)
+    stats = model.get_stats()
+
+    result = {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "query_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "query_p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "query_mean_ms": round(float(np.mean(latencies)), 2),
+        "texts": stats["texts"],
+        "ingest_seconds": round(stats["seconds"], 3),
+        "texts_per_second": round(stats["texts_per_second"], 2),
+        "tokens_per_second": round(stats["tokens_per_second"], 1),
+    }
+    return result, vectors
+
+
+def run(backends=BACKENDS, data_dir=DATA_DIR, samples=256, repeats=3):
+    """
+    Benchmark every backend and check the ONNX backends against the PyTorch vectors.
+
+    :return: Report dictionary.
+    """
+    texts = load_sample_texts(data_dir, samples)
+    queries = [question for question, _ in DRUG_QUESTIONS]
+
+    # PyTorch is always run first: it is the reference for the parity check
+    backends = [BACKEND_TORCH] + [backend for backend in backends if backend != BACKEND_TORCH]
+    results = []
+    reference = None
+    for backend in backends:
+        print(f"Benchmarking the '{backend}' backend on {len(texts)} texts...")
+        result, vectors = benchmark_backend(backend, texts, queries, repeats)
+        if backend == BACKEND_TORCH:
+            reference = vectors
+        else:
+            result["parity"] = check_parity(reference, vectors, PARITY_THRESHOLDS[backend])
+        results.append(result)
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "samples": len(texts),
+        "queries": len(queries) * repeats,
+        "results": results,
+    }
+
+
+def format_results(report):
+    """Format the benchmark report for terminal display."""
+    headers = ["Backend", "Load (s)", "Query p50 (ms)", "Query p95 (ms)", "Texts/s", "Tokens/s",
+               "Mean cos", "Min cos", "Parity"]
+    rows = []
+    for r in report["results"]:
+        parity = r.get("parity")
+        rows.append([
+            r["backend"], r["load_seconds"], r["query_p50_ms"], r["query_p95_ms"], r["texts_per_second"],
+            r["tokens_per_second"],
+            parity["mean_cosine"] if parity else "-", parity["min_cosine"] if parity else "-",
+            ("PASS" if parity["passed"] else "FAIL") if parity else "reference",
+        ])
+    return tabulate(rows, headers=headers, tablefmt="grid")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare PubMedBERT embedding backends on CPU.")
+    parser.add_argument("--backend", action="append", choices=BACKENDS, default=None,
+                        help="Backend to benchmark (repeatable, default: all). PyTorch is always included.")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Directory with the Beers PDF and CSV tables.")
+    parser.add_argument("--samples", type=int, default=256, help="Number of chunk texts embedded (default: 256).")
+    parser.add_argument("--repeats", type=int, default=3, help="Times every query is embedded (default: 3).")
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmark_results/embeddings_<timestamp>.json).")
+    args = parser.parse_args(argv)
+
+    report = run(args.backend or BACKENDS, args.data_dir, args.samples, args.repeats)
+    print(format_results(report))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"embeddings_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to '{output}'.")
+
+    # A non-zero exit code lets the parity check gate a deployment
+    return 0 if all(r.get("parity", {"passed": True})["passed"] for r in report["results"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import itertools
+from datetime import datetime
+import numpy as np
+import chromadb
+from tabulate import tabulate
+from Chroma import DEFAULT_HNSW_PARAMS, hnsw_metadata
+from Ingestion_Artifacts import read_artifact, list_artifacts
+from Benchmark_Ingestion import RESULTS_DIR, DRUG_QUESTIONS
+
+
+DEFAULT_M = [8, 16, 32]
+DEFAULT_CONSTRUCTION_EF = [100, 200]
+DEFAULT_SEARCH_EF = [10, 50, 100]
+
+
+def load_artifact_vectors(directory):
+    """Stack the embeddings of every source artifact in a collection directory."""
+    matrices = [np.asarray(read_artifact(path)[4], dtype=np.float32) for path in list_artifacts(directory)]
+    if not matrices:
+        raise ValueError(f"No ingestion artifacts found in '{directory}'.")
+    return np.vstack(matrices)
+
+
+def load_collection_vectors(collection_name, page_size=5000):
+    """Read every embedding of a live collection, one page at a time."""
+    from Chroma import ChromaManager
+
+    collection = ChromaManager().get_collection(collection_name)
+    pages = []
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    if not pages:
+        raise ValueError(f"Collection '{collection_name}' is empty.")
+    return np.vstack(pages)
+
+
+def exact_neighbours(corpus, queries, k, space):
+    """
+    Brute-force top-k search with the distance ChromaDB uses for the space.
+
+    :return: Integer matrix of shape (len(queries), k) with corpus row indices, nearest first.
+    """
+    if space == "l2":
+        distances = (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ corpus.T + (corpus ** 2).sum(axis=1)[None, :]
+    elif space == "cosine":
+        normalised = corpus / np.clip(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12, None)
+        distances = 1 - (queries / np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)) @ normalised.T
+    elif space == "ip":
+        distances = 1 - queries @ corpus.T
+    else:
+        raise ValueError(f"Unknown space '{space}'. Choose from: l2, cosine, ip")
+
+    top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+class HNSWSweep:
+    def __init__(self, corpus, queries, k=5, space="l2", m_values=None, construction_ef_values=None,
+                 search_ef_values=None):
+        """
+        Sweep HNSW parameters on a fixed set of vectors.
+
+        Every grid point is built as a throw-away ChromaDB collection holding the corpus vectors.
+        Each query is then answered by the index and by exact brute-force search; recall@k is the
+        share of the exact top-k the index returned. Latency is measured one query at a time, as
+        the chatbot issues them.
+
+        :param corpus: float32 matrix of the indexed vectors.
+        :param queries: float32 matrix of the query vectors.
+        :param k: Number of neighbours retrieved per query.
+        :param space: Distance of the index: "l2", "cosine" or "ip".
+        :param m_values: Values of M (graph degree) to try.
+        :param construction_ef_values: Values of construction ef to try.
+        :param search_ef_values: Values of search ef to try.
+        """
+        self.corpus = np.ascontiguousarray(corpus, dtype=np.float32)
+        self.queries = np.ascontiguousarray(queries, dtype=np.float32)
+        self.k = k
+        self.space = space
+        self.m_values = m_values or DEFAULT_M
+        self.construction_ef_values = construction_ef_values or DEFAULT_CONSTRUCTION_EF
+        self.search_ef_values = search_ef_values or DEFAULT_SEARCH_EF
+
+    def _build(self, client, params, batch_size):
+        collection = client.create_collection(name=f"hnsw_{len(client.list_collections())}",
+                                              metadata=hnsw_metadata(params))
+        ids = [str(i) for i in range(len(self.corpus))]
+        start = time.perf_counter()
+        for offset in range(0, len(ids), batch_size):
+            collection.add(ids=ids[offset:offset + batch_size], embeddings=self.corpus[offset:offset + batch_size])
+        return collection, time.perf_counter() - start
+
+    def _measure(self, collection, exact):
+        latencies = []
+        hits = 0
+        for query, expected in zip(self.queries, exact):
+            start = time.perf_counter()
+            result = collection.query(query_embeddings=[query], n_results=self.k, include=["distances"])
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len({int(doc_id) for doc_id in result["ids"][0]} & set(expected.tolist()))
+        return hits / (len(self.queries) * self.k), latencies
+
+    def run(self):
+        """
+        Build and query an index for every parameter combination.
+
+        :return: Report dictionary.
+        """
+        print(f"Computing the exact top-{self.k} of {len(self.queries)} queries over {len(self.corpus)} vectors...")
+        exact = exact_neighbours(self.corpus, self.queries, self.k, self.space)
+
+        index_dir = tempfile.mkdtemp(prefix="tda_hnsw_bench_")
+        results = []
+        try:
+            client = chromadb.PersistentClient(path=index_dir)
+            batch_size = client.get_max_batch_size() if hasattr(client, "get_max_batch_size") else 5000
+            for m, construction_ef, search_ef in itertools.product(
+                    self.m_values, self.construction_ef_values, self.search_ef_values):
+                params = {"space": self.space, "M": m, "construction_ef": construction_ef, "search_ef": search_ef}
+                collection, build_seconds = self._build(client, params, batch_size)
+                recall, latencies = self._measure(collection, exact)
+                result = {
+                    **params,
+                    "build_seconds": round(build_seconds, 3),
+                    "recall_at_k": round(recall, 4),
+                    "query_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                    "query_p99_ms": round(float(np.percentile(latencies, 99)), 3),
+                }
+                results.append(result)
+                print(f"  M={m} construction_ef={construction_ef} search_ef={search_ef}: "
+                      f"recall@{self.k} {result['recall_at_k']} | p50 {result['query_p50_ms']} ms")
+                client.delete_collection(collection.name)
+            del client
+        finally:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+        return {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "chromadb": chromadb.__version__,
+            "vectors": len(self.corpus),
+            "dim": int(self.corpus.shape[1]),
+            "queries": len(self.queries),
+            "k": self.k,
+            "space": self.space,
+            "defaults": DEFAULT_HNSW_PARAMS,
+            "results": results,
+        }
+
+    def format_results(self, report):
+        """Format the sweep report for terminal display."""
+        rows = [
+            [r["M"], r["construction_ef"], r["search_ef"], r["build_seconds"], r["recall_at_k"],
+             r["query_p50_ms"], r["query_p99_ms"]]
+            for r in report["results"]
+        ]
+        headers = ["M", "Construction ef", "Search ef", "Build (s)", f"Recall@{report['k']}", "p50 (ms)", "p99 (ms)"]
+        return (f"{report['vectors']} vectors of dim {report['dim']}, {report['queries']} queries, space '{report['space']}'\n"
+                + tabulate(rows, headers=headers, tablefmt="grid"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure HNSW recall@k and query latency for a grid of index parameters.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--collection", default="Unstructured_data",
+                        help="Live collection whose vectors are indexed (default: Unstructured_data).")
+    source.add_argument("--artifacts", default=None,
+                        help="Collection directory of ingestion artifacts to read the vectors from instead.")
+    source.add_argument("--synthetic", type=int, default=None, help="Use this many random 768-dim vectors instead.")
+    parser.add_argument("--queries", type=int, default=200,
+                        help="Corpus vectors, slightly perturbed, used as queries (default: 200).")
+    parser.add_argument("--questions", action="store_true",
+                        help="Also embed the benchmark drug questions with PubMedBERT and use them as queries.")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"], default=DEFAULT_HNSW_PARAMS["space"])
+    parser.add_argument("--m", type=int, action="append", default=None, help="Value of M (repeatable, default: 8, 16, 32).")
+    parser.add_argument("--construction-ef", type=int, action="append", default=None,
+                        help="Construction ef (repeatable, default: 100, 200).")
+    parser.add_argument("--search-ef", type=int, action="append", default=None,
+                        help="Search ef (repeatable, default: 10, 50, 100).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmark_results/hnsw_<timestamp>.json).")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    if args.synthetic:
+        corpus = rng.standard_normal((args.synthetic, 768), dtype=np.float32)
+    elif args.artifacts:
+        corpus = load_artifact_vectors(args.artifacts)
+    else:
+        corpus = load_collection_vectors(args.collection)
+
+    picks = rng.choice(len(corpus), size=min(args.queries, len(corpus)), replace=False)
+    scale = 0.05 * float(np.linalg.norm(corpus, axis=1).mean()) / np.sqrt(corpus.shape[1])
+    queries = corpus[picks] + rng.standard_normal((len(picks), corpus.shape[1]), dtype=np.float32) * scale
+    if args.questions:
+        from Embedding_Model import shared_pubmedbert
+        model = shared_pubmedbert()
+        queries = np.vstack([queries, model.embed_documents_array([question for question, _ in DRUG_QUESTIONS])])
+
+    sweep = HNSWSweep(corpus, queries, args.k, args.space, args.m, args.construction_ef, args.search_ef)
+    report = sweep.run()
+    print(sweep.format_results(report))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"hnsw_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to '{output}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
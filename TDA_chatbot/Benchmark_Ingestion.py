@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+from datetime import datetime
+import numpy as np
+import chromadb
+from tabulate import tabulate
+from Ingestion import Ingestion_file, StreamingTextSplitter
+from Embedding_Model import PubMedBERT, DEFAULT_MODEL_NAME
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data source")
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmark_results")
+
+# (chunk_size, chunk_overlap) pairs: the app default, the old test harness setting and points in between
+DEFAULT_CONFIGS = [(1000, 500), (1000, 200), (500, 100), (250, 50)]
+
+# Fixed drug questions and the term a relevant chunk must mention
+DRUG_QUESTIONS = [
+    ("Is warfarin appropriate for an older adult with atrial fibrillation?", "warfarin"),
+    ("Should diphenhydramine be avoided in older adults?", "diphenhydramine"),
+    ("What are the risks of glyburide in elderly patients with diabetes?", "glyburide"),
+    ("Does ciprofloxacin need a dose adjustment for reduced kidney function?", "ciprofloxacin"),
+    ("What is the recommended maximum dose of digoxin in older adults?", "digoxin"),
+    ("Which drugs interact with amiodarone in older patients?", "amiodarone"),
+    ("Is zolpidem safe for insomnia in an 80 year old?", "zolpidem"),
+    ("Should nitrofurantoin be used when creatinine clearance is low?", "nitrofurantoin"),
+    ("Is dabigatran preferred over other anticoagulants in the elderly?", "dabigatran"),
+    ("Should aspirin be used for primary prevention of cardiovascular disease in older adults?", "aspirin"),
+    ("Are benzodiazepines such as lorazepam safe in patients with dementia?", "lorazepam"),
+    ("When should metoclopramide be avoided in older adults?", "metoclopramide"),
+    ("Is spironolactone safe with reduced creatinine clearance?", "spironolactone"),
+    ("What are the risks of tramadol in older adults?", "tramadol"),
+]
+
+
+def _directory_size(path):
+    total = 0
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            total += os.path.getsize(os.path.join(root, filename))
+    return total
+
+
+class IngestionBenchmark:
+    def __init__(self, data_dir=DATA_DIR, configs=None, k=5, embed_batch_size=64):
+        """
+        Benchmark ingestion throughput and chunking quality over the bundled Beers PDF and CSV tables.
+
+        Every configuration is indexed into a throw-away ChromaDB directory so the production
+        collections are never touched. PDF pages are extracted with iter_pdf_pages and split with
+        the StreamingTextSplitter the ingestion workers use, timed one after the other, and
+        embedded without the embedding cache, so every configuration pays the full model cost.
+
+        :param data_dir: Directory holding the Beers PDF and the "csv" tables.
+        :param configs: List of (chunk_size, chunk_overlap) pairs for the PDF splitter.
+        :param k: Number of results considered when computing the retrieval hit rate.
+        :param embed_batch_size: Number of chunks per embedding call.
+        """
+        self.data_dir = data_dir
+        self.configs = configs or DEFAULT_CONFIGS
+        self.k = k
+        self.embed_batch_size = embed_batch_size
+        self.ingesting = Ingestion_file()
+        # A cache hit would time a SQLite lookup instead of the model
+        self.embedding_function = PubMedBERT(model_name=os.getenv("EMBEDDING_MODEL") or DEFAULT_MODEL_NAME,
+                                             use_cache=False)
+
+    def _find_files(self, extension):
+        files = []
+        for root, _, filenames in os.walk(self.data_dir):
+            files.extend(os.path.join(root, name) for name in filenames if name.lower().endswith(extension))
+        return sorted(files)
+
+    def _embed(self, texts):
+        batches = [
+            self.embedding_function.embed_documents_array(texts[start:start + self.embed_batch_size])
+            for start in range(0, len(texts), self.embed_batch_size)
+        ]
+        return np.vstack(batches)
+
+    def run_config(self, pdf_files, csv_documents, chunk_size, chunk_overlap):
+        """
+        Chunk, embed, index and query one chunking configuration.
+
+        :param pdf_files: PDF paths, extracted page by page as the ingestion workers do.
+        :param csv_documents: Chunk dicts of the CSV tables (independent of the configuration).
+        :return: Dictionary with timings, chunk count, index size and hit rate.
+        """
+        # PDF extraction; the workers interleave it with splitting, here the pages are collected first
+        # so each step is timed on its own
+        start = time.perf_counter()
+        pdf_pages = {pdf_path: list(self.ingesting.iter_pdf_pages(pdf_path)) for pdf_path in pdf_files}
+        pdf_extract_seconds = time.perf_counter() - start
+
+        # Splitting, page by page with the streaming splitter (same chunks as stream_pdf_chunks)
+        start = time.perf_counter()
+        documents = []
+        for pdf_path, pages in pdf_pages.items():
+            splitter = StreamingTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+            chunks = [chunk for page_text in pages for chunk in splitter.feed(page_text)] + splitter.finish()
+            documents.extend(
+                {"id": f"pdf_{len(documents) + i + 1}", "text": chunk,
+                 "metadata": {"source": pdf_path, "chunk_index": i + 1}}
+                for i, chunk in enumerate(chunks)
+            )
+        split_seconds = time.perf_counter() - start
+        pdf_chunks = len(documents)
+        documents.extend(
+            {"id": f"csv_{i + 1}", "text": doc["text"], "metadata": {"source": doc["metadata"]["source"]}}
+            for i, doc in enumerate(csv_documents)
+        )
+
+        # Embedding
+        texts = [doc["text"] for doc in documents]
+        start = time.perf_counter()
+        embeddings = self._embed(texts)
+        embed_seconds = time.perf_counter() - start
+
+        index_dir = tempfile.mkdtemp(prefix="tda_bench_")
+        try:
+            # Indexing (pre-computed embeddings, so only ChromaDB's own work is timed)
+            client = chromadb.PersistentClient(path=index_dir)
+            collection = client.create_collection(name="benchmark")
+            start = time.perf_counter()
+            batch_size = 5000
+            for begin in range(0, len(documents), batch_size):
+                batch = documents[begin:begin + batch_size]
+                collection.add(
+                    ids=[doc["id"] for doc in batch],
+                    documents=[doc["text"] for doc in batch],
+                    metadatas=[doc["metadata"] for doc in batch],
+                    embeddings=embeddings[begin:begin + batch_size]
+                )
+            index_seconds = time.perf_counter() - start
+            index_bytes = _directory_size(index_dir)
+
+            # Retrieval quality on the fixed drug questions
+            hits = 0
+            start = time.perf_counter()
+            for question, term in DRUG_QUESTIONS:
+                result = collection.query(
+                    query_embeddings=[self.embedding_function.embed_query_array(question)], n_results=self.k
+                )
+                if any(term in text.lower() for text in result["documents"][0]):
+                    hits += 1
+            query_seconds = time.perf_counter() - start
+            del collection, client
+        finally:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+        return {
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "pdf_chunks": pdf_chunks,
+            "csv_chunks": len(csv_documents),
+            "chunks": len(documents),
+            "characters_embedded": sum(len(text) for text in texts),
+            "pdf_extract_seconds": round(pdf_extract_seconds, 4),
+            "split_seconds": round(split_seconds, 4),
+            "embed_seconds": round(embed_seconds, 4),
+            "index_seconds": round(index_seconds, 4),
+            "embeddings_per_second": round(len(texts) / embed_seconds, 2) if embed_seconds else None,
+            "index_bytes": index_bytes,
+            "hit_rate_at_k": round(hits / len(DRUG_QUESTIONS), 4),
+            "mean_query_ms": round(query_seconds / len(DRUG_QUESTIONS) * 1000, 2),
+        }
+
+    def run(self):
+        """
+        Run every configuration.
+
+        :return: Dictionary with environment details, the CSV extraction timing and per-configuration results.
+        """
+        pdf_files = self._find_files(".pdf")
+        csv_files = self._find_files(".csv")
+
+        # CSV extraction is independent of the chunking configuration, so it is timed once
+        start = time.perf_counter()
+        csv_documents = []
+        for csv_path in csv_files:
+            csv_documents.extend(self.ingesting.chunk_beers_table(csv_path))
+        csv_extract_seconds = time.perf_counter() - start
+
+        results = []
+        for chunk_size, chunk_overlap in self.configs:
+            print(f"Benchmarking chunk_size={chunk_size}, chunk_overlap={chunk_overlap}...")
+            results.append(self.run_config(pdf_files, csv_documents, chunk_size, chunk_overlap))
+
+        return {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "model": self.embedding_function.model_name,
+            "k": self.k,
+            "questions": len(DRUG_QUESTIONS),
+            "pdf_files": [os.path.basename(path) for path in pdf_files],
+            "csv_files": [os.path.basename(path) for path in csv_files],
+            "csv_extract_seconds": round(csv_extract_seconds, 4),
+            "results": results,
+        }
+
+    def format_results(self, report):
+        """
+        Format the benchmark report for terminal display.
+
+        :param report: Dictionary returned by run.
+        :return: Formatted table.
+        """
+        headers = ["Size", "Overlap", "Chunks", "PDF extract (s)", "Split (s)", "Embed (s)", "Index (s)", "Emb/s",
+                   "Index (MB)", f"Hit@{report['k']}"]
+        rows = [
+            [r["chunk_size"], r["chunk_overlap"], r["chunks"], r["pdf_extract_seconds"], r["split_seconds"], r["embed_seconds"],
+             r["index_seconds"], r["embeddings_per_second"], round(r["index_bytes"] / 1024 / 1024, 2), r["hit_rate_at_k"]]
+            for r in report["results"]
+        ]
+        return (f"CSV extraction: {report['csv_extract_seconds']}s\n"
+                + tabulate(rows, headers=headers, tablefmt="grid"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ingestion throughput and chunking quality.")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Directory with the Beers PDF and CSV tables.")
+    parser.add_argument("--config", action="append", default=None, metavar="SIZE:OVERLAP",
+                        help="Chunking configuration to test, e.g. 1000:500 (repeatable).")
+    parser.add_argument("--k", type=int, default=5, help="Results considered for the hit rate (default: 5).")
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmark_results/ingestion_<timestamp>.json).")
+    args = parser.parse_args(argv)
+
+    configs = None
+    if args.config:
+        configs = [tuple(int(value) for value in config.split(":")) for config in args.config]
+
+    benchmark = IngestionBenchmark(data_dir=args.data_dir, configs=configs, k=args.k)
+    report = benchmark.run()
+    print(benchmark.format_results(report))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"ingestion_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to '{output}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from Ingestion import Ingestion_file
+from Chroma import ChromaManager
+
+
+# File extension -> ChromaDB collection the chunks are indexed into
+COLLECTION_BY_EXTENSION = {
+    ".pdf": "Unstructured_data",
+    ".csv": "Structured_data",
+}
+
+
+def _chunk_file(file_path, chunk_size=1000, chunk_overlap=500, content_ids=False, pdf_tables=False):
+    """
+    Extract and chunk a single file. Runs inside a worker process.
+
+    :param file_path: Path to a PDF or CSV file.
+    :param chunk_size: Chunk size used for PDF files.
+    :param chunk_overlap: Chunk overlap used for PDF files.
+    :param content_ids: Give the chunks content-hash IDs instead of positional ones.
+    :param pdf_tables: Chunk the Beers tables of PDF files by row (Ingestion_file.chunk_pdf_tables).
+    :return: Tuple of (file_path, collection name, list of chunk dicts).
+    """
+    ingesting = Ingestion_file()
+    extension = os.path.splitext(file_path)[1].lower()
+
+    if extension == ".pdf" and pdf_tables:
+        documents = ingesting.chunk_pdf_tables(file_path, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    elif extension == ".pdf":
+        documents = ingesting.chunk_pdf_text(file_path, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    else:
+        documents = ingesting.chunk_beers_table(file_path)
+
+    if content_ids:
+        documents = ingesting.assign_content_ids(documents)
+
+    return file_path, COLLECTION_BY_EXTENSION[extension], documents
+
+
+class BulkIngestion:
+    def __init__(self, chroma_manager=None, workers=None, embed_batch_size=256, chunk_size=1000, chunk_overlap=500,
+                 incremental=False, pdf_tables=False):
+        """
+        Ingest every PDF and CSV file of a directory into ChromaDB.
+
+        Files are extracted and chunked in a process pool while the parent process funnels the
+        chunks into large batched embedding calls, one collection at a time.
+
+        :param chroma_manager: ChromaManager used for indexing (created on demand if None).
+        :param workers: Number of worker processes (default: number of CPUs).
+        :param embed_batch_size: Number of chunks sent to the embedding model per call.
+        :param chunk_size: Chunk size used for PDF files.
+        :param chunk_overlap: Chunk overlap used for PDF files.
+        :param incremental: Sync each file against what is already indexed and only embed new or changed chunks.
+        :param pdf_tables: Chunk the Beers tables of PDF files by row instead of as plain text.
+        """
+        self.chroma_manager = chroma_manager
+        self.workers = workers or os.cpu_count() or 1
+        self.embed_batch_size = embed_batch_size
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.incremental = incremental
+        self.pdf_tables = pdf_tables
+
+    def find_files(self, directory):
+        """
+        List the files of a directory that can be ingested.
+
+        :param directory: Directory to scan (sub-directories included).
+        :return: Sorted list of PDF and CSV file paths.
+        """
+        files = []
+        for root, _, filenames in os.walk(directory):
+            for filename in filenames:
+                if os.path.splitext(filename)[1].lower() in COLLECTION_BY_EXTENSION:
+                    files.append(os.path.join(root, filename))
+        return sorted(files)
+
+    def _flush(self, collection_name, pending):
+        """Embed and index the pending chunks of one collection."""
+        if not pending:
+            return 0
+        self.chroma_manager.add_documents(pending, collection_name=collection_name)
+        return len(pending)
+
+    def ingest_directory(self, directory):
+        """
+        Chunk all files of a directory in parallel and index them in batches.
+
+        :param directory: Directory containing PDF and/or CSV files.
+        :return: Dictionary with counts, elapsed time and throughput figures.
+        """
+        files = self.find_files(directory)
+        if not files:
+            print(f"No PDF or CSV files found in '{directory}'.")
+            return {"files": 0, "chunks": 0, "embeddings": 0, "seconds": 0.0}
+
+        if self.chroma_manager is None:
+            self.chroma_manager = ChromaManager()
+
+        pending = {name: [] for name in set(COLLECTION_BY_EXTENSION.values())}
+        stats = {"files": 0, "failed": 0, "chunks": 0, "embeddings": 0, "skipped": 0, "deleted": 0}
+        embedding_seconds = 0.0
+        start = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(_chunk_file, file_path, self.chunk_size, self.chunk_overlap, self.incremental,
+                                self.pdf_tables)
+                for file_path in files
+            ]
+
+            for future in as_completed(futures):
+                try:
+                    file_path, collection_name, documents = future.result()
+                except Exception as e:
+                    print(f"Error while chunking file: {e}")
+                    stats["failed"] += 1
+                    continue
+
+                stats["files"] += 1
+                stats["chunks"] += len(documents)
+                print(f"Chunked '{file_path}' into {len(documents)} chunks -> {collection_name}")
+
+                if self.incremental:
+                    # Diffing is done per source, so each file is synced on its own
+                    embed_start = time.perf_counter()
+                    result = self.chroma_manager.sync_documents(documents, source_value=file_path,
+                                                                collection_name=collection_name)
+                    embedding_seconds += time.perf_counter() - embed_start
+                    stats["embeddings"] += result["added"]
+                    stats["skipped"] += result["skipped"]
+                    stats["deleted"] += result["deleted"]
+                    continue
+
+                pending[collection_name].extend(documents)
+                while len(pending[collection_name]) >= self.embed_batch_size:
+                    batch = pending[collection_name][:self.embed_batch_size]
+                    pending[collection_name] = pending[collection_name][self.embed_batch_size:]
+                    embed_start = time.perf_counter()
+                    stats["embeddings"] += self._flush(collection_name, batch)
+                    embedding_seconds += time.perf_counter() - embed_start
+
+        # Index whatever is left over once all workers are done
+        for collection_name, batch in pending.items():
+            embed_start = time.perf_counter()
+            stats["embeddings"] += self._flush(collection_name, batch)
+            embedding_seconds += time.perf_counter() - embed_start
+
+        elapsed = time.perf_counter() - start
+        stats["seconds"] = elapsed
+        stats["embedding_seconds"] = embedding_seconds
+        stats["files_per_second"] = stats["files"] / elapsed if elapsed else 0.0
+        stats["chunks_per_second"] = stats["chunks"] / elapsed if elapsed else 0.0
+        stats["embeddings_per_second"] = stats["embeddings"] / embedding_seconds if embedding_seconds else 0.0
+        stats["model"] = self.chroma_manager.embedding_function.get_stats()
+        return stats
+
+    def format_stats(self, stats):
+        """
+        Format ingestion statistics for terminal display.
+
+        :param stats: Dictionary returned by ingest_directory.
+        :return: Human readable summary.
+        """
+        return (
+            f"Files: {stats['files']} ({stats.get('failed', 0)} failed) | "
+            f"Chunks: {stats['chunks']} | Embeddings: {stats['embeddings']} | "
+            f"Skipped: {stats.get('skipped', 0)} | Deleted: {stats.get('deleted', 0)} | "
+            f"Elapsed: {stats['seconds']:.2f}s\n"
+            f"Throughput: {stats.get('files_per_second', 0.0):.2f} files/s, "
+            f"{stats.get('chunks_per_second', 0.0):.2f} chunks/s, "
+            f"{stats.get('embeddings_per_second', 0.0):.2f} embeddings/s"
+            + (f"\nModel: {stats['model']['batches']} batches, "
+               f"{stats['model']['tokens_per_second']:.0f} tokens/s, "
+               f"{stats['model']['padding_efficiency']:.0%} padding efficiency" if stats.get("model") else "")
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk ingest a directory of PDF and CSV files into ChromaDB.")
+    parser.add_argument("directory", help="Directory containing PDF and/or CSV files.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    parser.add_argument("--batch-size", type=int, default=256, help="Chunks per embedding call (default: 256).")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="PDF chunk size (default: 1000).")
+    parser.add_argument("--chunk-overlap", type=int, default=500, help="PDF chunk overlap (default: 500).")
+    parser.add_argument("--incremental", action="store_true", help="Only embed new or changed chunks of each file.")
+    parser.add_argument("--pdf-tables", action="store_true",
+                        help="Chunk the Beers tables of PDF files by row, with drug metadata (experimental).")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        print(f"'{args.directory}' is not a directory.")
+        return 1
+
+    bulk = BulkIngestion(
+        workers=args.workers,
+        embed_batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        incremental=args.incremental,
+        pdf_tables=args.pdf_tables,
+    )
+    stats = bulk.ingest_directory(args.directory)
+    print(bulk.format_stats(stats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,127 @@
 import os
+import json
+import uuid
+import itertools
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import chromadb
+import numpy as np
 from dotenv import load_dotenv
 from langchain_chroma import Chroma
-from langchain_core.documents import Document
-from Embedding_Model import PubMedBERT
+from Embedding_Model import shared_pubmedbert
+from Ingestion_Artifacts import write_artifact, read_artifact, list_artifacts
+from Collection_Aliases import CollectionAliases, ALIASES_FILE
+from Sparse_Index import shared_bm25_index, INDEX_FILE
+
+
+# ChromaDB's HNSW defaults, used by collections created without explicit parameters
+DEFAULT_HNSW_PARAMS = {"space": "l2", "M": 16, "construction_ef": 100, "search_ef": 10}
+
+# HNSW mismatches already reported by this process, so every ChromaManager does not repeat them
+_reported_hnsw_mismatches = set()
+_reported_hnsw_mismatches_lock = threading.Lock()
+
+
+def hnsw_metadata(params):
+    """
+    Translate index parameters into ChromaDB collection metadata.
+
+    :param params: Dictionary with any of space ("l2", "cosine" or "ip"), M, construction_ef and search_ef.
+    :return: Dictionary of "hnsw:*" metadata keys.
+    """
+    unknown = set(params) - set(DEFAULT_HNSW_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown HNSW parameter(s) {sorted(unknown)}. Choose from: {list(DEFAULT_HNSW_PARAMS)}")
+    return {f"hnsw:{key}": value for key, value in params.items()}
+
+
+def _report_hnsw_mismatch(key, physical_name, current, differing):
+    """Print once per process and physical collection that the configured HNSW parameters are not in effect."""
+    reported = (physical_name, tuple(sorted(differing.items())))
+    with _reported_hnsw_mismatches_lock:
+        if reported in _reported_hnsw_mismatches:
+            return
+        _reported_hnsw_mismatches.add(reported)
+    print(f"Collection '{key}' was built with {current}; {differing} only apply after it is rebuilt.")
+
+
+def distance_to_similarity(distance, space):
+    """
+    Convert a ChromaDB distance into cosine similarity.
+
+    The stored embeddings are L2-normalised, so all three spaces map onto the same scale:
+    squared L2 distance is 2 - 2 * cos, and cosine and inner-product distances are 1 - cos.
+
+    :param distance: Distance returned by a query.
+    :param space: Distance of the collection: "l2", "cosine" or "ip".
+    :return: Similarity in [-1, 1], higher is closer.
+    """
+    if space == "l2":
+        return 1 - distance / 2
+    if space in ("cosine", "ip"):
+        return 1 - distance
+    raise ValueError(f"Unknown space '{space}'. Choose from: l2, cosine, ip")
+
+
+def load_hnsw_params():
+    """
+    Read per-collection index parameters from CHROMA_HNSW_PARAMS.
+
+    The variable holds JSON keyed by collection, e.g. {"Unstructured_data": {"space": "cosine", "M": 32}}.
+    """
+    raw = os.getenv("CHROMA_HNSW_PARAMS")
+    return json.loads(raw) if raw else {}
+
+
+def delete_where(collection, where, batch_size=5000, on_delete=None):
+    """
+    Delete every record of a collection matching a metadata filter.
+
+    Matching IDs are looked up by ChromaDB's metadata index (no documents or embeddings are
+    loaded) and deleted in batches, so the cost follows the number of matches, not the
+    collection size.
+
+    :param collection: ChromaDB collection.
+    :param where: ChromaDB metadata filter, e.g. {"source": path}.
+    :param batch_size: Maximum number of IDs fetched and deleted per call.
+    :param on_delete: Optional callable(ids) called after every deleted batch.
+    :return: Number of deleted records.
+    """
+    deleted = 0
+    while True:
+        # Deleted records drop out of the result, so the next page always starts at offset 0
+        ids = collection.get(where=where, include=[], limit=batch_size)["ids"]
+        if not ids:
+            return deleted
+        collection.delete(ids=ids)
+        if on_delete:
+            on_delete(ids)
+        deleted += len(ids)
 
 
 class ChromaManager:
-    def __init__(self):
+    def __init__(self, hnsw_params=None, check_model=True):
+        """
+        Access to the Structured_data and Unstructured_data collections.
+
+        Every document method takes an optional collection_name. When it is given the call only
+        touches that collection, so one long-lived instance can be shared by concurrent threads.
+        Without it the active collection (set_active_collection) is used, which is only safe when
+        the instance is not shared.
+
+        COLLECTION_NAME_S/COLLECTION_NAME_U name the physical collections until a blue/green
+        re-index (Reindex.py) swaps in a rebuilt one; from then on the CollectionAliases file next to
+        the data decides, and every instance follows a swap or rollback on its next lookup.
+
+        :param hnsw_params: Index parameters per collection, e.g. {"Unstructured_data": {"M": 32, "search_ef": 100}}
+                            (default: CHROMA_HNSW_PARAMS). They are fixed when a collection is created;
+                            an existing collection keeps its parameters until it is rebuilt.
+        :param check_model: Refuse collections built with another embedding model than this process's.
+                            Only tooling that never embeds queries against the live collections
+                            (Reindex.py reads their metadata and IDs) should turn it off.
+        """
         # Load environment variables from the .env file
         load_dotenv()
 
@@ -19,33 +133,78 @@ class ChromaManager:
         if not self.chroma_path or not self.collection_name_s or not self.collection_name_u:
             raise ValueError("CHROMA_PATH, COLLECTION_NAME_S, and COLLECTION_NAME_U must be set in the .env file.")
 
-        # Initialize the embedding function
-        self.embedding_function = PubMedBERT()
+        # Initialize the embedding function (shared by the whole process, loaded on first use)
+        self.embedding_function = shared_pubmedbert()
 
         # Initialize the ChromaDB client
         self.client = chromadb.PersistentClient(path=self.chroma_path)
 
-        # Initialize both collections
-        self.collections = {
-            "Structured_data": self.client.get_or_create_collection(
-                name=self.collection_name_s,
-                embedding_function=self.embedding_function
-            ),
-            "Unstructured_data": self.client.get_or_create_collection(
-                name=self.collection_name_u,
-                embedding_function=self.embedding_function    
-            )
-        }
+        # Logical collection -> physical collection, switched by blue/green re-indexing
+        self.aliases = CollectionAliases(os.path.join(self.chroma_path, ALIASES_FILE))
+        self.default_names = {"Structured_data": self.collection_name_s, "Unstructured_data": self.collection_name_u}
+        # BM25 keyword index of every physical collection, kept in step with its writes and deletes
+        self.keyword_index = shared_bm25_index(os.path.join(self.chroma_path, INDEX_FILE))
+        self.hnsw_params = load_hnsw_params() if hnsw_params is None else hnsw_params
+        self.check_model = check_model
+        self.collections = {}
+        self.vectorstores = {}
+        # Shadow collections being rebuilt, addressable as "<key>:shadow" until they are swapped in
+        self._shadows = {}
+        self._lock = threading.Lock()
 
         # Set the default collection
-        self.active_collection = self.collection_name_s
+        self.active_collection = "Structured_data"
+        self._open_collections()
+
+    def _open_collections(self):
+        """Open the physical collections the aliases point at, with their HNSW parameters if configured."""
+        self._aliases_version = self.aliases.version()
+        collections = {}
+        for key, default_name in self.default_names.items():
+            params = self.hnsw_params.get(key)
+            collection = self.client.get_or_create_collection(
+                name=self.aliases.resolve(key, default_name),
+                embedding_function=self.embedding_function,
+                metadata=hnsw_metadata(params) if params else None
+            )
 
-        # Initialize LangChain Chroma wrapper for retrieval
-        self.vectorstore_client = Chroma(
-            client=self.client,
-            collection_name=self.collection_name_s,
-            embedding_function=self.embedding_function
-        )
+            # A collection rebuilt with another model cannot be queried with this process's embeddings
+            model = (collection.metadata or {}).get("embedding_model")
+            if self.check_model and model and model != self.embedding_function.model_name:
+                if key not in self.collections:
+                    raise ValueError(f"Collection '{collection.name}' was built with '{model}' but this process embeds "
+                                     f"with '{self.embedding_function.model_name}'. Set EMBEDDING_MODEL to match.")
+                print(f"Not switching {key} to '{collection.name}': it was built with '{model}'. "
+                      f"Restart with EMBEDDING_MODEL='{model}' to serve it.")
+                collections[key] = self.collections[key]
+                continue
+
+            collections[key] = collection
+            if params:
+                current = {param: (collection.metadata or {}).get(f"hnsw:{param}", default)
+                           for param, default in DEFAULT_HNSW_PARAMS.items()}
+                differing = {param: value for param, value in params.items() if current[param] != value}
+                if differing:
+                    _report_hnsw_mismatch(key, collection.name, current, differing)
+        collections.update(self._shadows)
+
+        # LangChain Chroma wrappers for retrieval, one per collection, created once per (re)open.
+        # The dictionaries are replaced, not mutated, so concurrent readers see either the old or the new set.
+        self.vectorstores = {
+            key: Chroma(client=self.client, collection_name=collection.name, embedding_function=self.embedding_function)
+            for key, collection in collections.items()
+        }
+        self.collections = collections
+        self.collection_name_s = collections["Structured_data"].name
+        self.collection_name_u = collections["Unstructured_data"].name
+        self.vectorstore_client = self.vectorstores[self.active_collection]
+
+    def refresh_collections(self):
+        """Reopen the collections if another process swapped or rolled back an alias."""
+        if self.aliases.version() != self._aliases_version:
+            with self._lock:
+                if self.aliases.version() != self._aliases_version:
+                    self._open_collections()
 
 
     # === COLLECTIONS ===
@@ -59,15 +218,47 @@ class ChromaManager:
             raise ValueError(f"Invalid collection name. Choose from: {list(self.collections.keys())}")
 
         self.active_collection = collection_name
-        self.vectorstore_client = Chroma(
-            client=self.client,
-            collection_name=self.collections[collection_name].name,
-            embedding_function=self.embedding_function
-        )
+        self.vectorstore_client = self.vectorstores[collection_name]
 
     def get_current_collection(self):
         """Return the name of the currently active collection."""
         return self.active_collection
+
+    def get_index_params(self, collection_name=None):
+        """
+        Return the HNSW parameters of a collection.
+
+        :param collection_name: Collection to inspect (default: the active collection).
+        :return: Dictionary with space, M, construction_ef and search_ef.
+        """
+        metadata = self.get_collection(collection_name).metadata or {}
+        return {key: metadata.get(f"hnsw:{key}", default) for key, default in DEFAULT_HNSW_PARAMS.items()}
+
+    def get_collection(self, collection_name=None):
+        """
+        Return the ChromaDB collection for collection_name, or the active one if it is None.
+
+        :param collection_name: "Structured_data", "Unstructured_data" or None.
+        """
+        self.refresh_collections()
+        collection_name = collection_name or self.active_collection
+        collection = self.collections.get(collection_name)
+        if collection is None:
+            raise ValueError(f"Invalid collection name. Choose from: {list(self.collections.keys())}")
+        return collection
+
+    def get_vectorstore(self, collection_name=None):
+        """
+        Return the LangChain Chroma wrapper for collection_name, or the active one if it is None.
+
+        :param collection_name: "Structured_data", "Unstructured_data" or None.
+        """
+        self.refresh_collections()
+        collection_name = collection_name or self.active_collection
+        vectorstore = self.vectorstores.get(collection_name)
+        if vectorstore is None:
+            raise ValueError(f"Invalid collection name. Choose from: {list(self.vectorstores.keys())}")
+        return vectorstore
     
     def list_collections(self):
         """
@@ -81,27 +272,155 @@ class ChromaManager:
             print(f"Error listing collections: {e}")
             return []
 
+    def health_check(self):
+        """
+        Check that the ChromaDB client responds and report the size of each collection.
+
+        :return: Dictionary with the client heartbeat, the storage path and the document count per collection.
+        """
+        return {
+            "heartbeat": self.client.heartbeat(),
+            "path": self.chroma_path,
+            "collections": {key: collection.count() for key, collection in self.collections.items()},
+        }
+
     def delete_collection(self, collection_name: str):
         """
         Delete a collection.
 
         :param collection_name: Name of the collection to delete.
         """
-        if collection_name in self.collections:
-            self.client.delete_collection(name=self.collections[collection_name].name)
-            del self.collections[collection_name]
-            print(f"Deleted collection: {collection_name}")
-        else:
-            print(f"Collection '{collection_name}' not found.")
+        with self._lock:
+            if collection_name in self.collections:
+                self.client.delete_collection(name=self.collections[collection_name].name)
+                self.keyword_index.drop(self.collections[collection_name].name)
+                del self.collections[collection_name]
+                del self.vectorstores[collection_name]
+                print(f"Deleted collection: {collection_name}")
+                return
+        print(f"Collection '{collection_name}' not found.")
+
+    # === BLUE/GREEN RE-INDEXING ===
+    def open_shadow_collection(self, key, name=None):
+        """
+        Create (or reopen) the shadow collection a logical collection is rebuilt into.
+
+        The shadow is tagged with the embedding model that actually computes its vectors (in client
+        mode, the one the embedding server reports) and gets the configured HNSW parameters. Until it is swapped in, every document method reaches it as "<key>:shadow".
+
+        :param key: Logical collection, "Structured_data" or "Unstructured_data".
+        :param name: Physical name (default: the COLLECTION_NAME_S/U value plus a timestamp).
+        :return: Tuple of (shadow key, physical name).
+        """
+        if key not in self.default_names:
+            raise ValueError(f"Invalid collection name. Choose from: {list(self.default_names)}")
+        name = name or f"{self.default_names[key]}_{datetime.now():%Y%m%d_%H%M%S}"
+        params = self.hnsw_params.get(key)
+        metadata = {**(hnsw_metadata(params) if params else {}), "embedding_model": self.embedding_function.served_model()}
+        collection = self.client.get_or_create_collection(
+            name=name, embedding_function=self.embedding_function, metadata=metadata
+        )
+
+        shadow_key = f"{key}:shadow"
+        with self._lock:
+            self._shadows[shadow_key] = collection
+            self._open_collections()
+        return shadow_key, name
+
+    def drop_shadow_collection(self, key):
+        """Delete the shadow collection of a logical collection, e.g. after a failed build."""
+        with self._lock:
+            collection = self._shadows.pop(f"{key}:shadow", None)
+            if collection is not None:
+                self.client.delete_collection(name=collection.name)
+                self.keyword_index.drop(collection.name)
+            self._open_collections()
+
+    def swap_collection(self, key, before_swap=None):
+        """
+        Atomically make the shadow collection of key the live one.
+
+        The swap holds the write fence: writes to the live collections in any process wait until
+        the alias is switched and then go to the new collection. before_swap runs under the fence,
+        so a final catch-up done there cannot miss a write.
+
+        The replaced collection is kept (and remembered in the aliases) so the swap can be rolled back.
+
+        :param before_swap: Optional callable run once no write is in flight, right before the switch.
+        :return: Physical name of the replaced collection.
+        """
+        with self.aliases.swap_fence():
+            if f"{key}:shadow" not in self._shadows:
+                raise ValueError(f"No shadow collection open for {key}.")
+            if before_swap:
+                before_swap()
+            with self._lock:
+                shadow = self._shadows.pop(f"{key}:shadow")
+                previous = self.collections[key].name
+                self.aliases.set(key, current=shadow.name, previous=previous)
+                self._open_collections()
+        print(f"{key} now served by '{shadow.name}' (previous: '{previous}').")
+        return previous
+
+    def rollback_collection(self, key):
+        """
+        Switch a logical collection back to the collection it was served by before the last swap.
+
+        A rollback is itself recorded as a swap, so it can be undone the same way.
+
+        :return: Physical name of the restored collection.
+        """
+        with self.aliases.swap_fence(), self._lock:
+            entry = self.aliases.get(key)
+            if not entry or not entry.get("previous"):
+                raise ValueError(f"{key} has no previous collection to roll back to.")
+            self.aliases.set(key, current=entry["previous"], previous=entry["current"])
+            self._open_collections()
+        print(f"{key} rolled back to '{entry['previous']}'.")
+        return entry["previous"]
+
+    def drop_previous_collection(self, key):
+        """
+        Delete the collection kept for rolling back a logical collection, once the swap is trusted.
+
+        :return: Physical name of the deleted collection, or None if there was none.
+        """
+        with self._lock:
+            entry = self.aliases.get(key)
+            if not entry or not entry.get("previous"):
+                return None
+            self.client.delete_collection(name=entry["previous"])
+            self.keyword_index.drop(entry["previous"])
+            self.aliases.set(key, current=entry["current"], previous=None)
+            self._open_collections()
+        return entry["previous"]
+
+    @contextmanager
+    def write_fence(self, collection_name=None):
+        """
+        Keep alias swaps out while writing, and yield the collection to write to.
+
+        The collection is resolved under the fence, so a write that waited for a swap lands in the
+        collection that is live after it instead of the replaced one. Shadow collections are not
+        fenced; only the re-index writes to them.
+
+        :param collection_name: Collection to write to (default: the active collection).
+        """
+        if (collection_name or self.active_collection).endswith(":shadow"):
+            yield self.get_collection(collection_name)
+            return
+        with self.aliases.write_fence():
+            yield self.get_collection(collection_name)
 
     # === DOCUMENTS ===
-    def list_documents(self):
+    def list_documents(self, collection_name=None):
         """
-        List all documents in the current collection.
+        List all documents in a collection.
 
+        :param collection_name: Collection to list (default: the active collection).
         :return: List of documents with their IDs, text, and metadata.
         """
-        collection = self.collections[self.active_collection]
+        collection = self.get_collection(collection_name)
         documents = collection.get()
 
         if not documents or not documents.get("documents"):
@@ -115,82 +434,412 @@ class ChromaManager:
             )
         ]
 
-    def add_documents(self, documents):
+    def list_documents_page(self, collection_name=None, limit=50, offset=0, source=None, where=None,
+                            include=("documents", "metadatas")):
+        """
+        List one page of documents, optionally restricted to one source, loading only the requested fields.
+
+        :param collection_name: Collection to list (default: the active collection).
+        :param limit: Maximum number of documents returned.
+        :param offset: Number of matching documents skipped.
+        :param source: Only list documents whose 'source' metadata equals this value.
+        :param where: Additional ChromaDB metadata filter.
+        :param include: Fields to load, any of "documents", "metadatas" and "embeddings" (IDs are always returned).
+        :return: Dictionary with 'documents' (dicts with 'id' and the 'text'/'metadata'/'embedding' requested),
+                 'offset', 'limit' and 'next_offset' (None on the last page).
+        """
+        collection = self.get_collection(collection_name)
+        if source is not None:
+            where = {"source": source} if where is None else {"$and": [where, {"source": source}]}
+
+        # One extra record tells whether another page follows
+        records = collection.get(where=where, include=list(include), limit=limit + 1, offset=offset)
+        fields = {"documents": "text", "metadatas": "metadata", "embeddings": "embedding"}
+        documents = []
+        for i, doc_id in enumerate(records["ids"][:limit]):
+            document = {"id": doc_id}
+            for field in include:
+                document[fields[field]] = records[field][i]
+            documents.append(document)
+
+        return {
+            "documents": documents,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": offset + limit if len(records["ids"]) > limit else None,
+        }
+
+    def get_documents(self, ids, collection_name=None):
+        """
+        Fetch documents by ID.
+
+        :param ids: List of document IDs.
+        :param collection_name: Collection holding the documents (default: the active collection).
+        :return: List of documents with their IDs, text, and metadata.
+        """
+        collection = self.get_collection(collection_name)
+        batch_size = self._max_batch_size()
+
+        documents = []
+        for start in range(0, len(ids), batch_size):
+            records = collection.get(ids=ids[start:start + batch_size], include=["documents", "metadatas"])
+            documents.extend(
+                {"id": doc_id, "text": doc_text, "metadata": metadata}
+                for doc_id, doc_text, metadata in zip(records["ids"], records["documents"], records["metadatas"])
+            )
+        return documents
+
+    def add_documents(self, documents, use_ids=False, collection_name=None):
         """
         Add documents to the Chroma vector store.
 
         :param documents: List of dictionaries with 'id', 'text', and optional 'metadata'.
+        :param use_ids: Store the documents under their own 'id' instead of a generated one.
+                        Only safe when the IDs are unique, e.g. content-hash IDs.
+        :param collection_name: Collection to add to (default: the active collection).
         """
         if not isinstance(documents, list):
             raise ValueError("Documents should be a list of dictionaries with 'id', 'text', and 'metadata'.")
+        if not documents:
+            return
 
-        # Convert dictionaries to Document objects
-        document_objects = [
-            Document(page_content=doc["text"], metadata={"id": doc["id"], **doc.get("metadata", {})})
-            for doc in documents
-        ]
+        prepared = self._embed_batch(documents, use_ids)
+        with self.write_fence(collection_name) as collection:
+            self._write_batch(collection, *prepared)
+
+    def add_documents_stream(self, chunks, batch_size=256, use_ids=False, collection_name=None,
+                             progress_callback=None):
+        """
+        Add an iterable of documents in fixed-size batches, embedding the next batch while the previous one is written.
+
+        Only two batches are held in memory at any time, so arbitrarily large sources (e.g. the
+        generator of Ingestion_file.stream_pdf_chunks) can be indexed with bounded memory.
+
+        :param chunks: Iterable of dictionaries with 'id', 'text', and optional 'metadata'.
+        :param batch_size: Number of documents embedded and written per batch.
+        :param use_ids: Store the documents under their own 'id' instead of a generated one.
+        :param collection_name: Collection to add to (default: the active collection).
+        :param progress_callback: Optional callable(written, batch) called after every batch is written,
+                                  with the running total and the list of documents just written. It runs on
+                                  the writer thread under the write fence, so bookkeeping done there is
+                                  visible to a swap's final catch-up.
+        :return: Number of documents written.
+        """
+        # Fail on an unknown collection before anything is embedded
+        self.get_collection(collection_name)
+        chunks = iter(chunks)
+        written = 0
+        pending = None
+
+        def write(prepared, batch, total):
+            # Resolved per batch, so the batches written after a swap reach the new live collection
+            with self.write_fence(collection_name) as collection:
+                self._write_batch(collection, *prepared)
+                if progress_callback:
+                    progress_callback(total, batch)
+
+        # One writer thread: batch N is written while batch N+1 is embedded on the calling thread
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            while True:
+                batch = list(itertools.islice(chunks, batch_size))
+                prepared = self._embed_batch(batch, use_ids) if batch else None
+
+                if pending is not None:
+                    pending_future, pending_batch = pending
+                    pending_future.result()
+                    written += len(pending_batch)
+                    pending = None
+
+                if prepared is None:
+                    return written
+                pending = (writer.submit(write, prepared, batch, written + len(batch)), batch)
+
+    def _embed_batch(self, documents, use_ids):
+        """Build the IDs, texts and metadata of a batch and embed it."""
+        texts = [doc["text"] for doc in documents]
+        metadatas = [{"id": doc["id"], **doc.get("metadata", {})} for doc in documents]
+        # Same ID scheme as the LangChain wrapper when the documents' own IDs are not used
+        ids = [doc["id"] for doc in documents] if use_ids else [str(uuid.uuid4()) for _ in documents]
+
+        # Embed straight into a float32 matrix and hand it to ChromaDB, instead of going through
+        # the LangChain wrapper, which converts every vector to a list of Python floats and back
+        embeddings = self.embedding_function.embed_documents_array(texts)
+        return ids, texts, metadatas, embeddings
+
+    def _write_batch(self, collection, ids, texts, metadatas, embeddings):
+        """Upsert embedded records, split to ChromaDB's maximum batch size, and index their keywords."""
+        batch_size = self._max_batch_size()
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            collection.upsert(
+                ids=ids[start:end],
+                documents=texts[start:end],
+                metadatas=metadatas[start:end],
+                embeddings=embeddings[start:end]
+            )
+        self.keyword_index.add(collection.name, ids, texts, collection_id=str(collection.id))
 
-        # Add the documents to the active vector store
-        self.vectorstore_client.add_documents(document_objects)
+    def _max_batch_size(self):
+        return self.client.get_max_batch_size() if hasattr(self.client, "get_max_batch_size") else 5000
 
-    def delete_document(self, document_id):
+    def sync_documents(self, documents, source_value, collection_name=None):
         """
-        Delete a specific document by ID in a active collection.
+        Incrementally re-index one source.
 
-        :param document_id: ID of the document to delete.
+        The documents must carry content-hash IDs (see Ingestion_file.assign_content_ids).
+        Chunks whose ID is already stored are not embedded again, only their metadata is refreshed;
+        new or changed chunks are added and chunks that vanished from the source are deleted.
+
+        :param documents: List of dictionaries with 'id', 'text', and 'metadata' for the whole source.
+        :param source_value: The 'source' metadata value identifying the file.
+        :param collection_name: Collection holding the source (default: the active collection).
+        :return: Dictionary with the number of added, deleted and skipped (not re-embedded) chunks.
         """
-        collection = self.collections[self.active_collection]
+        if not isinstance(documents, list):
+            raise ValueError("Documents should be a list of dictionaries with 'id', 'text', and 'metadata'.")
 
-        existing_docs = collection.get(ids=[document_id])
-        if not existing_docs["ids"]:
-            print(f"Document with ID '{document_id}' does not exist in the collection.")
-            return
+        with self.write_fence(collection_name) as collection:
+            existing = collection.get(where={"source": source_value}, include=["metadatas"])
+            existing_metadata = dict(zip(existing["ids"], existing["metadatas"]))
+
+            incoming_ids = {doc["id"] for doc in documents}
+            new_docs = [doc for doc in documents if doc["id"] not in existing_metadata]
+            kept_docs = [doc for doc in documents if doc["id"] in existing_metadata]
+            vanished_ids = [doc_id for doc_id in existing_metadata if doc_id not in incoming_ids]
+
+            # Unchanged chunks may have moved (e.g. new chunk_index): update metadata without re-embedding
+            moved_docs = [
+                doc for doc in kept_docs
+                if existing_metadata[doc["id"]] != {"id": doc["id"], **doc.get("metadata", {})}
+            ]
+            if moved_docs:
+                collection.update(
+                    ids=[doc["id"] for doc in moved_docs],
+                    metadatas=[{"id": doc["id"], **doc.get("metadata", {})} for doc in moved_docs]
+                )
+
+            if vanished_ids:
+                collection.delete(ids=vanished_ids)
+                self.keyword_index.remove(collection.name, vanished_ids)
+            if new_docs:
+                self.add_documents(new_docs, use_ids=True, collection_name=collection_name)
+
+        result = {"added": len(new_docs), "deleted": len(vanished_ids), "skipped": len(kept_docs)}
+        print(f"Synced source '{source_value}': {result['added']} added, {result['deleted']} deleted, "
+              f"{result['skipped']} embeddings skipped.")
+        return result
+
+    def delete_document(self, document_id, collection_name=None):
+        """
+        Delete a specific document by ID.
+
+        :param document_id: ID of the document to delete.
+        :param collection_name: Collection holding the document (default: the active collection).
+        """
+        with self.write_fence(collection_name) as collection:
+            existing_docs = collection.get(ids=[document_id])
+            if not existing_docs["ids"]:
+                print(f"Document with ID '{document_id}' does not exist in the collection.")
+                return
 
-        collection.delete(ids=[document_id])
+            collection.delete(ids=[document_id])
+            self.keyword_index.remove(collection.name, [document_id])
         print(f"Deleted document with ID: {document_id}")
 
-    def delete_document_via_metadata(self, metadata_id):
+    def delete_documents(self, ids, collection_name=None):
+        """
+        Delete documents by ID, in batches.
+
+        :param ids: List of document IDs (unknown IDs are ignored).
+        :param collection_name: Collection holding the documents (default: the active collection).
+        :return: Number of IDs submitted for deletion.
+        """
+        batch_size = self._max_batch_size()
+        with self.write_fence(collection_name) as collection:
+            for start in range(0, len(ids), batch_size):
+                collection.delete(ids=ids[start:start + batch_size])
+                self.keyword_index.remove(collection.name, ids[start:start + batch_size])
+        return len(ids)
+
+    def delete_document_via_metadata(self, metadata_id, collection_name=None):
         """
         Delete a specific document by its metadata 'id'.
 
         :param metadata_id: Metadata 'id' of the document to delete.
+        :param collection_name: Collection holding the document (default: the active collection).
         """
-        collection = self.collections[self.active_collection]
-        documents = collection.get()
-
-        if not documents or not documents.get("documents"):
-            print("No documents found in the collection.")
-            return
-
-        for doc_id, doc_metadata in zip(documents["ids"], documents["metadatas"]):
-            if doc_metadata.get("id") == metadata_id:
-                collection.delete(ids=[doc_id])
-                print(f"Deleted document with metadata ID: {metadata_id}")
+        with self.write_fence(collection_name) as collection:
+            matches = collection.get(where={"id": metadata_id}, include=[], limit=1)["ids"]
+            if not matches:
+                print(f"Document with metadata ID '{metadata_id}' not found.")
                 return
 
-        print(f"Document with metadata ID '{metadata_id}' not found.")
+            collection.delete(ids=matches)
+            self.keyword_index.remove(collection.name, matches)
+        print(f"Deleted document with metadata ID: {metadata_id}")
 
-    def delete_documents_by_metadata_source(self, source_value):
+    def delete_documents_by_metadata_source(self, source_value, collection_name=None):
         """
         Delete all documents that match the specified metadata 'source'.
 
         :param source_value: The value of the 'source' metadata to match for deletion.
+        :param collection_name: Collection holding the source (default: the active collection).
         """
-        collection = self.collections[self.active_collection]
-        documents = collection.get()
+        batch_size = self._max_batch_size()
+        with self.write_fence(collection_name) as collection:
+            deleted = delete_where(collection, {"source": source_value}, batch_size,
+                                   on_delete=lambda ids: self.keyword_index.remove(collection.name, ids))
+        if deleted:
+            print(f"Deleted {deleted} documents with source '{source_value}'.")
+        else:
+            print(f"No documents found with source '{source_value}'.")
+        return deleted
 
-        if not documents or not documents.get("documents"):
-            print("No documents found in the collection.")
-            return
+    # === QUERIES ===
+    def similarity_search(self, query, k=10, collection_name=None, where=None):
+        """
+        Return the k documents most similar to the query.
 
-        ids_to_delete = [doc_id for doc_id, doc_metadata in zip(documents["ids"], documents["metadatas"]) 
-        if doc_metadata.get("source") == source_value]
+        :param query: Query text.
+        :param k: Number of documents to return.
+        :param collection_name: Collection to search (default: the active collection).
+        :param where: Optional ChromaDB metadata filter.
+        :return: List of (Document, distance) tuples.
+        """
+        return self.get_vectorstore(collection_name).similarity_search_with_score(query, k=k, filter=where)
 
-        if ids_to_delete:
-            collection.delete(ids=ids_to_delete)
-            print(f"Deleted documents with source '{source_value}': {ids_to_delete}")
-        else:
-            print(f"No documents found with source '{source_value}'.")
+    def similarity_search_by_vector(self, embedding, k=10, collection_name=None, where=None):
+        """
+        Search a collection with an already embedded query, so one embedding can serve several collections.
+
+        :param embedding: Query vector.
+        :param k: Number of documents to return.
+        :param collection_name: Collection to search (default: the active collection).
+        :param where: Optional ChromaDB metadata filter.
+        :return: List of (Document, distance) tuples.
+        """
+        return self.get_vectorstore(collection_name).similarity_search_by_vector_with_relevance_scores(
+            embedding, k=k, filter=where
+        )
+
+    def rebuild_keyword_index(self, collection_name=None, page_size=5000):
+        """
+        Rebuild the BM25 keyword index of a collection from the chunks stored in ChromaDB.
+
+        :param collection_name: Collection to index (default: the active collection).
+        :param page_size: Number of chunks read per call.
+        :return: Number of chunks indexed.
+        """
+        collection = self.get_collection(collection_name)
+        self.keyword_index.drop(collection.name)
+        offset = 0
+        while True:
+            page = collection.get(include=["documents"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            self.keyword_index.add(collection.name, page["ids"], page["documents"], collection_id=str(collection.id))
+            offset += len(page["ids"])
+        self.keyword_index.verified[collection.name] = str(collection.id)
+        return offset
+
+    def keyword_search(self, query, k=10, collection_name=None):
+        """
+        Return the k chunks with the best BM25 score for the query.
+
+        The first search of a collection in a process checks the keyword index against the
+        collection's ChromaDB ID and size, and rebuilds it if either differs (e.g. chunks indexed
+        before it existed, or a collection deleted and created again under the same name); after
+        that a search only reads the posting lists of the query's terms.
+
+        :param query: Query text.
+        :param k: Number of documents to return.
+        :param collection_name: Collection to search (default: the active collection).
+        :return: List of (document, score) tuples, where each document has 'id', 'text' and 'metadata'.
+        """
+        collection = self.get_collection(collection_name)
+        collection_id = str(collection.id)
+        if self.keyword_index.verified.get(collection.name) != collection_id:
+            if self.keyword_index.describe(collection.name) != (collection.count(), collection_id):
+                print(f"Keyword index of '{collection.name}' is out of date; rebuilding it.")
+                self.rebuild_keyword_index(collection_name)
+            self.keyword_index.verified[collection.name] = collection_id
+
+        hits = self.keyword_index.search(collection.name, query, k)
+        documents = {doc["id"]: doc for doc in self.get_documents([doc_id for doc_id, _ in hits], collection_name)}
+        return [(documents[doc_id], score) for doc_id, score in hits if doc_id in documents]
+
+    # === ARTIFACTS ===
+    def export_collection(self, collection_name, directory, page_size=5000):
+        """
+        Export a collection as pre-built ingestion artifacts: one file pair per source holding the
+        chunk text, metadata and float32 embeddings (see Ingestion_Artifacts).
+
+        :param collection_name: Name of the collection to export.
+        :param directory: Output directory for this collection's artifacts.
+        :param page_size: Number of records read from ChromaDB at a time while listing sources.
+        :return: Number of chunks exported.
+        """
+        collection = self.get_collection(collection_name)
+
+        # First pass: find the sources without loading documents or embeddings
+        sources = set()
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            sources.update((metadata or {}).get("source", "") for metadata in page["metadatas"])
+            offset += len(page["ids"])
+
+        exported = 0
+        for source in sorted(sources):
+            records = collection.get(where={"source": source}, include=["documents", "metadatas", "embeddings"])
+            write_artifact(
+                directory, source, self.embedding_function.model_name,
+                records["ids"], records["documents"], records["metadatas"], records["embeddings"]
+            )
+            exported += len(records["ids"])
+            print(f"Exported {len(records['ids'])} chunks of '{source}'.")
+
+        print(f"Exported {exported} chunks from {collection_name} to '{directory}'.")
+        return exported
+
+    def import_collection(self, collection_name, directory, batch_size=5000):
+        """
+        Bulk-load a collection from pre-built ingestion artifacts without calling the embedding model.
+
+        :param collection_name: Name of the collection to load into.
+        :param directory: Directory holding this collection's artifacts.
+        :param batch_size: Number of records written to ChromaDB per call.
+        :return: Number of chunks imported.
+        """
+        self.get_collection(collection_name)
+        batch_size = min(batch_size, self._max_batch_size())
+
+        imported = 0
+        for chunks_path in list_artifacts(directory):
+            header, ids, texts, metadatas, embeddings = read_artifact(chunks_path)
+            if header["model"] != self.embedding_function.model_name:
+                print(f"Skipping '{chunks_path}': built with '{header['model']}', "
+                      f"collection uses '{self.embedding_function.model_name}'.")
+                continue
+
+            with self.write_fence(collection_name) as collection:
+                for start in range(0, len(ids), batch_size):
+                    end = start + batch_size
+                    collection.upsert(
+                        ids=ids[start:end],
+                        documents=texts[start:end],
+                        metadatas=metadatas[start:end],
+                        embeddings=np.asarray(embeddings[start:end], dtype=np.float32)
+                    )
+                    self.keyword_index.add(collection.name, ids[start:end], texts[start:end],
+                                           collection_id=str(collection.id))
+            imported += len(ids)
+            print(f"Imported {len(ids)} chunks of '{header['source']}'.")
+
+        print(f"Imported {imported} chunks into {collection_name} from '{directory}'.")
+        return imported
 
 
 def test_collection_add_doc():
@@ -327,8 +976,53 @@ def hy_app_test():
     print(f"Available collections: {collections}")
     """
     
+def test_concurrent_collections():
+    from concurrent.futures import ThreadPoolExecutor
+
+    # One shared manager, two threads writing to different collections at the same time
+    chroma_manager = ChromaManager()
+    jobs = {
+        "Structured_data": [{"id": f"thread_s_{i}", "text": f"Structured test row {i}", "metadata": {"source": "thread_test.csv"}} for i in range(20)],
+        "Unstructured_data": [{"id": f"thread_u_{i}", "text": f"Unstructured test chunk {i}", "metadata": {"source": "thread_test.pdf"}} for i in range(20)],
+    }
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(chroma_manager.add_documents, documents, True, collection_name)
+            for collection_name, documents in jobs.items()
+        ]
+        for future in futures:
+            future.result()
+
+    try:
+        for collection_name, documents in jobs.items():
+            collection = chroma_manager.get_collection(collection_name)
+            other_ids = [doc["id"] for name, docs in jobs.items() if name != collection_name for doc in docs]
+            own = collection.get(ids=[doc["id"] for doc in documents])
+            misplaced = collection.get(ids=other_ids)
+            assert len(own["ids"]) == len(documents), f"{collection_name}: {len(own['ids'])} of {len(documents)} written"
+            assert not misplaced["ids"], f"{collection_name} holds documents of another collection: {misplaced['ids']}"
+
+        # Both collections queried at the same time through the shared manager
+        def query(collection_name):
+            source = jobs[collection_name][0]["metadata"]["source"]
+            return chroma_manager.similarity_search("test", k=5, collection_name=collection_name, where={"source": source})
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = dict(zip(jobs, executor.map(query, jobs)))
+        for collection_name, documents in jobs.items():
+            own_ids = {doc["id"] for doc in documents}
+            found_ids = [doc.metadata["id"] for doc, _ in results[collection_name]]
+            assert found_ids, f"{collection_name}: concurrent query returned nothing"
+            assert set(found_ids) <= own_ids, f"{collection_name}: concurrent query returned {found_ids}"
+            print(f"{collection_name}: {len(documents)} documents written and queried concurrently, none misplaced.")
+    finally:
+        for collection_name, documents in jobs.items():
+            chroma_manager.delete_documents_by_metadata_source(documents[0]["metadata"]["source"],
+                                                               collection_name=collection_name)
+
 if __name__ == "__main__":
     try:
+        test_concurrent_collections()
         hy_app_test()
 
     except Exception as e:
@@ -0,0 +1,168 @@
+import sqlite3
+from datetime import datetime
+
+
+class ChunkManifest:
+    def __init__(self, db_path):
+        """
+        Persistent record of which ChromaDB chunks belong to which uploaded resource.
+
+        Maintained by the ingestion workers when chunks are added or re-indexed and by the admin
+        app when a resource is deleted, so a resource's chunks can be addressed by ID instead of
+        scanning a collection for its source path.
+
+        :param db_path: Path of the SQLite file holding the manifest tables.
+        """
+        self.db_path = db_path
+        self._create_tables()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _create_tables(self):
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS manifest_resources (
+                    resource_name TEXT PRIMARY KEY,
+                    collection TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS manifest_chunks (
+                    resource_name TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    position INTEGER,
+                    PRIMARY KEY (resource_name, chunk_id)
+                ) WITHOUT ROWID
+            """)
+            # Manifests created before chunks were paged in document order have no position column
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(manifest_chunks)")}
+            if "position" not in columns:
+                connection.execute("ALTER TABLE manifest_chunks ADD COLUMN position INTEGER")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS manifest_chunks_position ON manifest_chunks (resource_name, position)"
+            )
+
+    def _upsert_resource(self, connection, resource_name, collection, source):
+        connection.execute(
+            "INSERT INTO manifest_resources (resource_name, collection, source, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(resource_name) DO UPDATE SET collection = excluded.collection, "
+            "source = excluded.source, updated_at = excluded.updated_at",
+            (resource_name, collection, source, datetime.now().isoformat())
+        )
+
+    def add_chunks(self, resource_name, collection, source, chunk_ids):
+        """
+        Record chunks that were added for a resource.
+
+        :param resource_name: Name of the Resource row.
+        :param collection: ChromaDB collection the chunks were written to.
+        :param source: The 'source' metadata value of the chunks.
+        :param chunk_ids: IDs of the added chunks, in document order.
+        """
+        with self._connect() as connection:
+            self._upsert_resource(connection, resource_name, collection, source)
+            start = connection.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM manifest_chunks WHERE resource_name = ?", (resource_name,)
+            ).fetchone()[0]
+            connection.executemany(
+                "INSERT OR IGNORE INTO manifest_chunks (resource_name, chunk_id, position) VALUES (?, ?, ?)",
+                [(resource_name, chunk_id, start + i) for i, chunk_id in enumerate(chunk_ids)]
+            )
+
+    def replace_chunks(self, resource_name, collection, source, chunk_ids):
+        """
+        Replace the recorded chunks of a resource, e.g. after it was re-indexed.
+
+        :param chunk_ids: IDs of every chunk the resource now has, in document order.
+        """
+        with self._connect() as connection:
+            connection.execute("DELETE FROM manifest_chunks WHERE resource_name = ?", (resource_name,))
+            self._upsert_resource(connection, resource_name, collection, source)
+            connection.executemany(
+                "INSERT OR IGNORE INTO manifest_chunks (resource_name, chunk_id, position) VALUES (?, ?, ?)",
+                [(resource_name, chunk_id, i) for i, chunk_id in enumerate(chunk_ids)]
+            )
+
+    def get_resource(self, resource_name):
+        """
+        Return the manifest entry of a resource.
+
+        :return: Dictionary with resource_name, collection, source, updated_at and chunk_ids, or None if unknown.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM manifest_resources WHERE resource_name = ?", (resource_name,)
+            ).fetchone()
+            if row is None:
+                return None
+            chunk_ids = [chunk["chunk_id"] for chunk in connection.execute(
+                "SELECT chunk_id FROM manifest_chunks WHERE resource_name = ? ORDER BY position, chunk_id",
+                (resource_name,)
+            )]
+        return {**dict(row), "chunk_ids": chunk_ids}
+
+    def list_chunk_ids(self, resource_name, limit=50, offset=0):
+        """
+        Return one page of a resource's chunk IDs, in document order.
+
+        :param limit: Maximum number of IDs returned.
+        :param offset: Number of IDs skipped.
+        """
+        with self._connect() as connection:
+            return [chunk["chunk_id"] for chunk in connection.execute(
+                "SELECT chunk_id FROM manifest_chunks WHERE resource_name = ? ORDER BY position, chunk_id "
+                "LIMIT ? OFFSET ?", (resource_name, limit, offset)
+            )]
+
+    def count_chunks(self, resource_name):
+        """Return the number of chunks recorded for a resource."""
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT COUNT(*) FROM manifest_chunks WHERE resource_name = ?", (resource_name,)
+            ).fetchone()[0]
+
+    def get_entry(self, resource_name):
+        """
+        Return the manifest entry of a resource without its chunk IDs.
+
+        :return: Dictionary with resource_name, collection, source and updated_at, or None if unknown.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM manifest_resources WHERE resource_name = ?", (resource_name,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def list_resources(self, collection=None):
+        """
+        Return the manifest entries (without chunk IDs), optionally only those of one collection.
+
+        :return: List of dictionaries with resource_name, collection, source and updated_at.
+        """
+        with self._connect() as connection:
+            if collection is None:
+                rows = connection.execute("SELECT * FROM manifest_resources ORDER BY resource_name").fetchall()
+            else:
+                rows = connection.execute(
+                    "SELECT * FROM manifest_resources WHERE collection = ? ORDER BY resource_name", (collection,)
+                ).fetchall()
+        return [dict(row) for row in rows]
+
+    def has_resource(self, resource_name):
+        """Return True if the resource has a manifest entry."""
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT 1 FROM manifest_resources WHERE resource_name = ?", (resource_name,)
+            ).fetchone() is not None
+
+    def delete_resource(self, resource_name):
+        """Forget a resource and its chunks."""
+        with self._connect() as connection:
+            connection.execute("DELETE FROM manifest_chunks WHERE resource_name = ?", (resource_name,))
+            connection.execute("DELETE FROM manifest_resources WHERE resource_name = ?", (resource_name,))
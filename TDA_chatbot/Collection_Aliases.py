@@ -0,0 +1,155 @@
+import os
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: the fence only covers the threads of one process
+    fcntl = None
+
+
+ALIASES_FILE = "collection_aliases.json"
+
+# Fences held by the current thread, by lock file, so a writer can re-enter its own fence
+_held_fences = threading.local()
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+def _local_lock(path):
+    with _local_locks_guard:
+        return _local_locks.setdefault(path, threading.Lock())
+
+
+class CollectionAliases:
+    def __init__(self, path):
+        """
+        Maps the logical collections (Structured_data, Unstructured_data) to the physical ChromaDB
+        collection currently serving them.
+
+        The mapping is a small JSON file next to the ChromaDB data. Every change rewrites it through
+        a temporary file and os.replace, so a reader sees either the old or the new mapping, never
+        a partial one. ChromaManager instances compare version() on every collection lookup and
+        reopen their collections when it changes.
+
+        Writes to the live collections hold the shared write fence and a swap holds it exclusively,
+        so no write can land in a collection between the swap's final catch-up and the alias switch.
+
+        :param path: Path of the JSON file.
+        """
+        self.path = path
+        self.lock_path = f"{path}.lock"
+
+    def version(self):
+        """
+        Return a token that changes whenever the file is replaced.
+
+        os.replace gives the file a new inode, so this also detects two swaps within the
+        timestamp resolution of the file system.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @contextmanager
+    def _fence(self, exclusive):
+        held = _held_fences.__dict__.setdefault("depth", {})
+        if held.get(self.lock_path):
+            # Re-entered by the thread holding it, e.g. sync_documents calling add_documents
+            held[self.lock_path] += 1
+            try:
+                yield
+            finally:
+                held[self.lock_path] -= 1
+            return
+
+        if fcntl is None:
+            lock = _local_lock(self.lock_path)
+            lock.acquire()
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+            descriptor = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(descriptor, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            except BaseException:
+                os.close(descriptor)
+                raise
+        held[self.lock_path] = 1
+        try:
+            yield
+        finally:
+            held[self.lock_path] = 0
+            if fcntl is None:
+                lock.release()
+            else:
+                # Closing the descriptor releases the lock
+                os.close(descriptor)
+
+    def write_fence(self):
+        """Context manager held while writing to a live collection; any number of writers can hold it at once."""
+        return self._fence(exclusive=False)
+
+    def swap_fence(self):
+        """Context manager held while switching an alias; waits for the writers in flight and keeps new ones out."""
+        return self._fence(exclusive=True)
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, aliases):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(prefix=".aliases_", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+                json.dump(aliases, file, indent=2)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def get_all(self):
+        """Return every alias entry, keyed by logical collection."""
+        return self._read()
+
+    def get(self, key):
+        """
+        Return the alias entry of a logical collection.
+
+        :return: Dictionary with current, previous and swapped_at, or None if it was never swapped.
+        """
+        return self._read().get(key)
+
+    def resolve(self, key, default):
+        """
+        Return the physical collection serving a logical collection.
+
+        :param key: Logical collection, e.g. "Structured_data".
+        :param default: Name used while the collection was never swapped (COLLECTION_NAME_S/U).
+        """
+        entry = self.get(key)
+        return entry["current"] if entry else default
+
+    def set(self, key, current, previous):
+        """
+        Point a logical collection at another physical collection, keeping the old one for rollback.
+
+        :param key: Logical collection.
+        :param current: Physical collection that serves it from now on.
+        :param previous: Physical collection it is switched away from (None to forget it).
+        """
+        aliases = self._read()
+        aliases[key] = {"current": current, "previous": previous, "swapped_at": datetime.now().isoformat()}
+        self._write(aliases)
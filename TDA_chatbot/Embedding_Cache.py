@@ -0,0 +1,174 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+
+class EmbeddingCache:
+    def __init__(self, db_path, model_name, max_bytes=512 * 1024 * 1024):
+        """
+        Content-addressed, on-disk cache of embedding vectors.
+
+        Vectors are stored as float32 blobs in SQLite, keyed by the model name and the SHA-256 of
+        the text, so any process embedding the same text with the same model reuses them. When
+        the stored vectors exceed max_bytes the least recently used ones are evicted.
+
+        The number and total size of the stored vectors are kept in a one-row table, updated by
+        triggers on every write from any process, so neither eviction nor get_stats scans the
+        cache; it is summed only once, when the cache is opened.
+
+        :param db_path: Path of the SQLite cache file.
+        :param model_name: Name of the embedding model; vectors of other models are never returned.
+        :param max_bytes: Maximum total size of the stored vectors.
+        """
+        self.db_path = db_path
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        with self._lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings_totals (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    entries INTEGER NOT NULL,
+                    bytes INTEGER NOT NULL
+                )
+            """)
+            self.connection.execute("""
+                CREATE TRIGGER IF NOT EXISTS embeddings_inserted AFTER INSERT ON embeddings BEGIN
+                    UPDATE embeddings_totals SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 0;
+                END
+            """)
+            self.connection.execute("""
+                CREATE TRIGGER IF NOT EXISTS embeddings_deleted AFTER DELETE ON embeddings BEGIN
+                    UPDATE embeddings_totals SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 0;
+                END
+            """)
+            self.connection.execute("""
+                CREATE TRIGGER IF NOT EXISTS embeddings_resized AFTER UPDATE OF size ON embeddings BEGIN
+                    UPDATE embeddings_totals SET bytes = bytes + NEW.size - OLD.size WHERE id = 0;
+                END
+            """)
+            # The one full scan: (re)start the running totals from the stored vectors
+            self.connection.execute(
+                "INSERT OR REPLACE INTO embeddings_totals (id, entries, bytes) "
+                "SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+            )
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts):
+        """
+        Look up the vectors of several texts.
+
+        :param texts: List of strings.
+        :return: Dictionary mapping the position of every cached text to its vector (read-only float32 array).
+        """
+        keys = [self._key(text) for text in texts]
+        found = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters, so look up in slices
+            for start in range(0, len(keys), 500):
+                batch = list(set(keys[start:start + 500]))
+                placeholders = ", ".join("?" for _ in batch)
+                rows = self.connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                with self.connection:
+                    now = time.time()
+                    self.connection.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                    )
+
+            results = {
+                i: np.frombuffer(found[key], dtype=np.float32)
+                for i, key in enumerate(keys) if key in found
+            }
+            self.hits += len(results)
+            self.misses += len(texts) - len(results)
+        return results
+
+    def put_many(self, texts, vectors):
+        """
+        Store the vectors of several texts, evicting old entries if the cache grows too large.
+
+        :param texts: List of strings.
+        :param vectors: Vectors (lists, arrays or rows of a matrix), in the same order as texts.
+        """
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((self._key(text), blob, len(blob), now))
+
+        with self._lock, self.connection:
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete would bypass the totals triggers
+            self.connection.executemany(
+                "INSERT INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET vector = excluded.vector, size = excluded.size, "
+                "last_used = excluded.last_used", rows
+            )
+            self._evict()
+
+    def _totals(self):
+        return self.connection.execute("SELECT entries, bytes FROM embeddings_totals WHERE id = 0").fetchone()
+
+    def _evict(self):
+        """Delete the least recently used vectors until the cache is back under 90% of max_bytes."""
+        total = self._totals()[1]
+        if total <= self.max_bytes:
+            return
+
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        keys = []
+        for key, size in self.connection.execute("SELECT key, size FROM embeddings ORDER BY last_used"):
+            keys.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        self.connection.executemany("DELETE FROM embeddings WHERE key = ?", keys)
+
+    def get_stats(self):
+        """
+        Return hit/miss counters and the current size of the cache.
+
+        :return: Dictionary with hits, misses, hit_rate, entries and bytes.
+        """
+        with self._lock:
+            entries, size = self._totals()
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self):
+        """Remove every cached vector."""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM embeddings")
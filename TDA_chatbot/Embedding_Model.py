@@ -1,14 +1,97 @@
+import os
+import time
+import threading
+import numpy as np
 from langchain_huggingface import HuggingFaceEmbeddings
+from Embedding_Cache import EmbeddingCache
+from Model_Registry import model_registry
+from Onnx_Embeddings import BACKENDS, BACKEND_TORCH, BACKEND_ONNX_INT8
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "embedding_cache.sqlite3")
+DEFAULT_MODEL_NAME = "NeuML/pubmedbert-base-embeddings"
 
 class PubMedBERT:
-    def __init__(self, model_name="NeuML/pubmedbert-base-embeddings"):
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, batch_size=32, max_batch_tokens=8192,
+                 max_seq_length=512, use_cache=True, cache_path=None, cache_max_mb=None, backend=None,
+                 server_url=None):
         """
         Initializes the PubMedBERT embedding model.
+
+        Args:
+            model_name (str): HuggingFace model to load.
+            batch_size (int): Maximum number of texts per forward pass.
+            max_batch_tokens (int): Maximum padded tokens (longest text x texts) per forward pass.
+                Short texts are batched together in large batches, long texts in small ones.
+            max_seq_length (int): Token length at which the model truncates inputs.
+            use_cache (bool): Keep embeddings in a persistent on-disk cache shared by all processes.
+            cache_path (str): SQLite cache file (default: EMBEDDING_CACHE_PATH or instance/embedding_cache.sqlite3).
+            cache_max_mb (int): Cache size limit in MB (default: EMBEDDING_CACHE_MAX_MB or 512).
+            backend (str): "torch" (full-precision PyTorch), "onnx" (ONNX Runtime, float32) or
+                "onnx-int8" (ONNX Runtime, dynamically int8-quantized). Default: EMBEDDING_BACKEND or "torch".
+            server_url (str): Embedding server to send texts to instead of loading the model in this
+                process (client mode). Default: EMBEDDING_SERVER_URL; "" forces a local model.
+        """
+        self.backend = (backend or os.getenv("EMBEDDING_BACKEND") or BACKEND_TORCH).lower()
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{self.backend}', expected one of {', '.join(BACKENDS)}.")
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_seq_length = max_seq_length
+        self.server_url = os.getenv("EMBEDDING_SERVER_URL", "") if server_url is None else server_url
+        # The weights are loaded once per process, on first use (see Model_Registry)
+        self._embedding_model = None
+        self.cache = None
+        # In client mode the server keeps the cache
+        if use_cache and not self.server_url:
+            self.cache = EmbeddingCache(
+                cache_path or os.getenv("EMBEDDING_CACHE_PATH") or DEFAULT_CACHE_PATH,
+                # ONNX vectors differ slightly from the PyTorch ones, so they are cached separately
+                model_name if self.backend == BACKEND_TORCH else f"{model_name}#{self.backend}",
+                max_bytes=int(cache_max_mb or os.getenv("EMBEDDING_CACHE_MAX_MB", "512")) * 1024 * 1024
+            )
+        # The shared instance embeds from request threads and writer threads at once
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def embedding_model(self):
+        """
+        The shared embedding backend of this model, loaded on first access.
+        """
+        if self._embedding_model is None and self.server_url:
+            from Embedding_Server import EmbeddingServerClient
+            # The client raises if the server embeds with another model or backend than this process expects
+            self._embedding_model = EmbeddingServerClient(self.server_url, model_name=self.model_name,
+                                                          backend=self.backend)
+        elif self._embedding_model is None:
+            self._embedding_model = model_registry.get(
+                f"embeddings:{self.model_name}:{self.backend}", self._load_backend
+            )
+        return self._embedding_model
+
+    def _load_backend(self):
+        if self.backend == BACKEND_TORCH:
+            return HuggingFaceEmbeddings(
+                model_name=self.model_name,
+                encode_kwargs={"normalize_embeddings": True, "batch_size": self.batch_size}
+            )
+
+        from Onnx_Embeddings import OnnxEmbeddings
+        return OnnxEmbeddings(self.model_name, quantized=self.backend == BACKEND_ONNX_INT8,
+                              max_seq_length=self.max_seq_length)
+
+    def served_model(self):
         """
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name=model_name,
-            encode_kwargs={"normalize_embeddings": True}
-        )
+        Returns the name of the model that computes this instance's embeddings.
+
+        In client mode this is the model the embedding server reports (the client raises if it is
+        not model_name), which is what a collection built through it must be tagged with.
+        """
+        if self.server_url:
+            return self.embedding_model.health()["model"]
+        return self.model_name
 
     def embed_query(self, text=None):
         """
@@ -21,9 +104,29 @@ class PubMedBERT:
         Returns:
             list[float]: The embedding vector for the query.
         """
+        return self.embed_query_array(text).tolist()
+
+    def embed_query_array(self, text=None):
+        """
+        Embeds a single query as a NumPy vector.
+
+        Args:
+            text (str): The user query to embed.
+
+        Returns:
+            numpy.ndarray: float32 vector of shape (dim,).
+        """
         if not text or not isinstance(text, str):
             raise ValueError("The 'text' parameter must be a non-empty string.")
-        return self.embedding_model.embed_query(text)
+        if self.cache is None:
+            return self._encode([text])[0]
+
+        cached = self.cache.get_many([text])
+        if cached:
+            return cached[0]
+        embedding = self._encode([text])[0]
+        self.cache.put_many([text], [embedding])
+        return embedding
 
     def embed_documents(self, documents: list):
         """
@@ -35,15 +138,190 @@ class PubMedBERT:
         Returns:
             list[list[float]]: A list of embedding vectors for the documents.
         """
+        return self.embed_documents_array(documents).tolist()
+
+    def embed_documents_array(self, documents: list):
+        """
+        Embeds a list of document strings into one NumPy matrix.
+
+        Prefer this over embed_documents for large batches: the vectors stay in a single float32
+        buffer instead of being boxed into hundreds of Python floats per text.
+
+        Args:
+            documents (list): A list of strings representing documents.
+
+        Returns:
+            numpy.ndarray: C-contiguous float32 matrix of shape (len(documents), dim).
+        """
         if not isinstance(documents, list) or not all(isinstance(x, str) for x in documents):
             raise ValueError("Input must be a list of strings.")
-        return self.embedding_model.embed_documents(documents)
+        if not documents:
+            return np.empty((0, 0), dtype=np.float32)
+        if self.cache is None:
+            return self._embed_uncached(documents)
+
+        # Only texts that are not cached yet go through the model
+        cached = self.cache.get_many(documents)
+        missing_texts = list(dict.fromkeys(text for i, text in enumerate(documents) if i not in cached))
+        computed = {}
+        if missing_texts:
+            matrix = self._embed_uncached(missing_texts)
+            self.cache.put_many(missing_texts, matrix)
+            computed = dict(zip(missing_texts, matrix))
+
+        first = next(iter(cached.values())) if cached else next(iter(computed.values()))
+        embeddings = np.empty((len(documents), first.shape[0]), dtype=np.float32)
+        for i, text in enumerate(documents):
+            embeddings[i] = cached[i] if i in cached else computed[text]
+        return embeddings
+
+    def _encode(self, texts):
+        """
+        Runs one forward pass over texts and returns a float32 matrix.
+        """
+        model = self.embedding_model
+        if hasattr(model, "embed_array"):
+            # ONNX backend and embedding server client
+            return model.embed_array(texts)
+
+        client = getattr(model, "_client", None) or getattr(model, "client", None)
+        if hasattr(client, "encode"):
+            # HuggingFaceEmbeddings would convert sentence-transformers' matrix to lists
+            return np.ascontiguousarray(client.encode(
+                texts, batch_size=len(texts), normalize_embeddings=True, convert_to_numpy=True,
+                show_progress_bar=False
+            ), dtype=np.float32)
+        return np.asarray(model.embed_documents(texts), dtype=np.float32)
+
+    def _embed_uncached(self, documents):
+        """
+        Embeds documents with the model, in length-bucketed batches, into a float32 matrix.
+        """
+        start = time.perf_counter()
+        if self.server_url:
+            # The server batches by length itself, so the texts are sent in one request
+            embeddings = self._encode(documents)
+            self._count(batches=1, texts=len(documents), seconds=time.perf_counter() - start)
+            return embeddings
+
+        lengths = self._token_lengths(documents)
+        embeddings = None
+        batches = 0
+        padded_tokens = 0
+
+        for batch in self._length_buckets(lengths):
+            batch_embeddings = self._encode([documents[i] for i in batch])
+            if embeddings is None:
+                embeddings = np.empty((len(documents), batch_embeddings.shape[1]), dtype=np.float32)
+            embeddings[batch] = batch_embeddings
+
+            batches += 1
+            padded_tokens += max(lengths[i] for i in batch) * len(batch)
+
+        self._count(batches=batches, padded_tokens=padded_tokens, texts=len(documents), tokens=sum(lengths),
+                    seconds=time.perf_counter() - start)
+        return embeddings
+
+    def _count(self, **increments):
+        """Adds to the throughput counters."""
+        with self._stats_lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def _token_lengths(self, documents):
+        """
+        Returns the (truncated) token length of every document.
+        Falls back to a characters-per-token estimate if the tokenizer is not reachable.
+        """
+        client = getattr(self.embedding_model, "_client", None) or getattr(self.embedding_model, "client", None)
+        tokenizer = getattr(client, "tokenizer", None) or getattr(self.embedding_model, "tokenizer", None)
+        if tokenizer is None:
+            return [min(len(text) // 4 + 2, self.max_seq_length) for text in documents]
+
+        encoded = tokenizer(documents, add_special_tokens=True, truncation=True, max_length=self.max_seq_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def _length_buckets(self, lengths):
+        """
+        Groups document indices of similar token length into batches.
+
+        Indices are sorted by length, then cut into batches holding at most batch_size texts and
+        at most max_batch_tokens padded tokens, so little compute is spent on padding.
+
+        Returns:
+            list[list[int]]: Batches of indices into the original document list.
+        """
+        batches = []
+        batch = []
+        for i in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+            # Sorted ascending, so the current text is the longest of the batch
+            if batch and (len(batch) >= self.batch_size or lengths[i] * (len(batch) + 1) > self.max_batch_tokens):
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def reset_stats(self):
+        """Resets the throughput counters."""
+        with self._stats_lock:
+            self.stats = {"texts": 0, "batches": 0, "tokens": 0, "padded_tokens": 0, "seconds": 0.0}
+
+    def get_stats(self):
+        """
+        Returns the throughput counters of embed_documents.
+
+        Returns:
+            dict: Raw counters plus texts/s, tokens/s, the share of computed tokens that were not padding
+                and the embedding cache hit/miss counts.
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        seconds = stats["seconds"]
+        stats["texts_per_second"] = stats["texts"] / seconds if seconds else 0.0
+        stats["tokens_per_second"] = stats["tokens"] / seconds if seconds else 0.0
+        stats["padding_efficiency"] = stats["tokens"] / stats["padded_tokens"] if stats["padded_tokens"] else 1.0
+        if self.cache is not None:
+            stats["cache"] = self.cache.get_stats()
+        return stats
     
     def __call__(self, input):
         """
-        Callable interface for embedding documents.
+        Callable interface for embedding documents (ChromaDB embedding function).
+        ChromaDB stores NumPy vectors, so the rows of the float32 matrix are passed as they are.
         """
-        return self.embed_documents(input)
+        return list(self.embed_documents_array(input))
+
+class NumpyEmbeddings:
+    def __init__(self, model):
+        """
+        LangChain-style view of a PubMedBERT instance that returns float32 NumPy vectors instead of lists.
+
+        For consumers that turn the vectors into NumPy buffers anyway, such as the Redis vector
+        store behind RedisSemanticCache.
+
+        Args:
+            model (PubMedBERT): The embedding model to wrap.
+        """
+        self.model = model
+
+    def embed_query(self, text):
+        return self.model.embed_query_array(text)
+
+    def embed_documents(self, texts):
+        # A list of row views, so callers can still index and test it like a list
+        return list(self.model.embed_documents_array(texts))
+
+def shared_pubmedbert(model_name=None, backend=None):
+    """
+    Returns the process-wide PubMedBERT instance for model_name (default: EMBEDDING_MODEL or PubMedBERT).
+    Components should use this instead of constructing their own PubMedBERT.
+    """
+    model_name = model_name or os.getenv("EMBEDDING_MODEL") or DEFAULT_MODEL_NAME
+    backend = (backend or os.getenv("EMBEDDING_BACKEND") or BACKEND_TORCH).lower()
+    return model_registry.get(f"pubmedbert:{model_name}:{backend}",
+                              lambda: PubMedBERT(model_name=model_name, backend=backend))
 
 def test_script1():
     model = PubMedBERT()
@@ -60,6 +338,7 @@ def test_script1():
     ]
     document_embeddings = model.embed_documents(documents)
     print(f"Document Embedding: \n{len(document_embeddings)} entries, each of length {len(document_embeddings[0])}")
+    print(f"Throughput: {model.get_stats()}")
 
 
 
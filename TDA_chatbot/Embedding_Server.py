@@ -0,0 +1,306 @@
+import os
+import sys
+import json
+import time
+import queue
+import base64
+import argparse
+import threading
+import urllib.error
+import urllib.request
+import numpy as np
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class MicroBatcher:
+    def __init__(self, embed_function, max_wait_ms=5.0, max_batch_texts=64):
+        """
+        Coalesces concurrent embedding requests into shared forward passes.
+
+        Requests are queued by the HTTP threads; a single batching thread takes the first waiting
+        request, keeps collecting requests for up to max_wait_ms (or until max_batch_texts texts
+        are gathered) and embeds them all with one call. A single request larger than
+        max_batch_texts is never split, it is simply embedded on its own.
+
+        The merged texts are sorted and bucketed by length once, by the embed function; the
+        EmbeddingServer sizes the model's buckets to max_batch_texts so a merged batch is one
+        forward pass instead of being cut up again.
+
+        :param embed_function: Callable taking a list of strings and returning their vectors.
+        :param max_wait_ms: How long the first request of a batch waits for others to join.
+        :param max_batch_texts: Maximum number of texts merged into one call.
+        """
+        self.embed_function = embed_function
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_texts = max_batch_texts
+        self.pending = queue.Queue()
+        self.stats = {"requests": 0, "batches": 0, "texts": 0, "seconds": 0.0}
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, texts):
+        """
+        Queue texts for embedding and wait for the result.
+
+        :param texts: List of strings.
+        :return: List of vectors, in the same order.
+        """
+        future = Future()
+        self.pending.put((texts, future))
+        return future.result()
+
+    def _collect(self):
+        batch = [self.pending.get()]
+        size = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_texts:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                texts, future = self.pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append((texts, future))
+            size += len(texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            start = time.perf_counter()
+            try:
+                vectors = self.embed_function(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["texts"] += len(texts)
+            self.stats["seconds"] += time.perf_counter() - start
+
+            offset = 0
+            for request_texts, future in batch:
+                future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+    def get_stats(self):
+        """
+        Return the coalescing counters.
+
+        :return: Dictionary with requests, batches, texts, seconds and requests_per_batch.
+        """
+        stats = dict(self.stats)
+        stats["requests_per_batch"] = stats["requests"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+
+class _EmbeddingRequestHandler(BaseHTTPRequestHandler):
+    # Set by EmbeddingServer
+    batcher = None
+    model = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(404, {"error": "Not found."})
+            return
+        self._send_json(200, {
+            "status": "ok",
+            **self._model_id(),
+            "batching": self.batcher.get_stats(),
+            "model_stats": self.model.get_stats(),
+        })
+
+    def _model_id(self):
+        # Sent with every response, so clients notice a server restarted with another model
+        return {"model": self.model.model_name, "backend": self.model.backend}
+
+    def do_POST(self):
+        if self.path != "/embed":
+            self._send_json(404, {"error": "Not found."})
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            texts = payload["texts"]
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise ValueError("'texts' must be a list of strings.")
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            embeddings = np.asarray(self.batcher.submit(texts), dtype=np.float32) if texts else np.empty((0, 0), np.float32)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+
+        if payload.get("encoding") == "base64":
+            # Raw float32 bytes: no float formatting/parsing on either side
+            self._send_json(200, {
+                **self._model_id(),
+                "shape": list(embeddings.shape),
+                "dtype": "float32",
+                "embeddings": base64.b64encode(np.ascontiguousarray(embeddings).tobytes()).decode("ascii"),
+            })
+        else:
+            self._send_json(200, {**self._model_id(), "embeddings": embeddings.tolist()})
+
+    def log_message(self, format, *args):
+        # One line per request would flood the console under chat load
+        pass
+
+
+class _EmbeddingHTTPServer(ThreadingHTTPServer):
+    # Many chat sessions may connect at once; the default backlog of 5 resets connections
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class EmbeddingServer:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, backend=None, max_wait_ms=5.0, max_batch_texts=64,
+                 model_name=None):
+        """
+        Local HTTP embedding service shared by every process of the application.
+
+        The model (and its on-disk cache) is loaded once in this process. Clients are PubMedBERT
+        instances in client mode (EMBEDDING_SERVER_URL). Concurrent requests are merged into one
+        forward pass by a MicroBatcher.
+
+        The model buckets by length with batches of up to max_batch_texts texts, so a merged batch
+        is sorted and bucketed once and embedded in a single pass. The trade-off is padding: short
+        texts merged with a long one are padded to its length, which a finer split would avoid,
+        but at the coalescing sizes used here one larger pass is cheaper than several small ones.
+        Requests larger than max_batch_texts are still split into length buckets.
+
+        :param host: Interface to bind; keep it on localhost, the service has no authentication.
+        :param port: TCP port.
+        :param backend: Embedding backend of the model (see PubMedBERT).
+        :param max_wait_ms: Coalescing window of the MicroBatcher.
+        :param max_batch_texts: Maximum number of texts merged into one forward pass.
+        :param model_name: Model to serve (default: EMBEDDING_MODEL or PubMedBERT), reported by /health.
+        """
+        from Embedding_Model import PubMedBERT, DEFAULT_MODEL_NAME
+
+        # server_url="" so the server never becomes a client of itself
+        # The token budget fits max_batch_texts texts of the full 512 tokens, so merged batches are never re-split
+        model_name = model_name or os.getenv("EMBEDDING_MODEL") or DEFAULT_MODEL_NAME
+        self.model = PubMedBERT(model_name=model_name, backend=backend, server_url="", batch_size=max_batch_texts,
+                                max_batch_tokens=max_batch_texts * 512)
+        self.batcher = MicroBatcher(self.model.embed_documents_array, max_wait_ms, max_batch_texts)
+
+        handler = type("EmbeddingRequestHandler", (_EmbeddingRequestHandler,),
+                       {"batcher": self.batcher, "model": self.model})
+        self.httpd = _EmbeddingHTTPServer((host, port), handler)
+
+    def serve_forever(self):
+        # Load the weights before accepting requests so the first client does not wait for them
+        self.model.embed_query("warm-up")
+        host, port = self.httpd.server_address[:2]
+        print(f"Embedding server listening on http://{host}:{port} "
+              f"(model: {self.model.model_name}, backend: {self.model.backend}).")
+        self.httpd.serve_forever()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class EmbeddingServerClient:
+    def __init__(self, server_url, timeout=60, model_name=None, backend=None):
+        """
+        Client of an EmbeddingServer, with the embed_documents/embed_query interface of the local backends.
+
+        Every response carries the server's model and backend; if they differ from the expected
+        ones the client raises instead of returning vectors from another embedding space.
+
+        :param server_url: Base URL of the server, e.g. http://127.0.0.1:8765.
+        :param timeout: Request timeout in seconds.
+        :param model_name: Model the server must serve (None to accept any).
+        :param backend: Backend the server must use (None to accept any).
+        """
+        self.server_url = server_url.rstrip("/")
+        self.timeout = timeout
+        self.model_name = model_name
+        self.backend = backend
+
+    def _request(self, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(f"{self.server_url}{path}", data=data,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                result = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"Embedding server error {e.code}: {e.read().decode('utf-8', 'replace')}") from e
+        except urllib.error.URLError as e:
+            raise ConnectionError(f"Embedding server at {self.server_url} is not reachable: {e.reason}") from e
+
+        for field, expected in (("model", self.model_name), ("backend", self.backend)):
+            if expected and result.get(field) != expected:
+                raise ValueError(f"Embedding server at {self.server_url} uses {field} '{result.get(field)}', "
+                                 f"expected '{expected}'. Set EMBEDDING_MODEL/EMBEDDING_BACKEND to match.")
+        return result
+
+    def embed_array(self, texts):
+        """
+        Embed a list of strings on the server.
+
+        :return: float32 matrix of shape (len(texts), dim).
+        """
+        response = self._request("/embed", {"texts": texts, "encoding": "base64"})
+        matrix = np.frombuffer(base64.b64decode(response["embeddings"]), dtype=np.float32)
+        return matrix.reshape(response["shape"])
+
+    def embed_documents(self, texts):
+        """Embed a list of strings on the server."""
+        if not texts:
+            return []
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        """Embed a single string on the server."""
+        return self.embed_documents([text])[0]
+
+    def health(self):
+        """Return the server status, batching and model statistics."""
+        return self._request("/health")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the local embedding server shared by all app processes.")
+    parser.add_argument("--host", default=os.getenv("EMBEDDING_SERVER_HOST", DEFAULT_HOST))
+    parser.add_argument("--port", type=int, default=int(os.getenv("EMBEDDING_SERVER_PORT", DEFAULT_PORT)))
+    parser.add_argument("--model", default=None, help="Model to serve (default: EMBEDDING_MODEL or PubMedBERT).")
+    parser.add_argument("--backend", default=None, help="torch, onnx or onnx-int8 (default: EMBEDDING_BACKEND or torch).")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="How long a request waits for others to join its batch (default: 5).")
+    parser.add_argument("--max-batch", type=int, default=64, help="Maximum texts per forward pass (default: 64).")
+    args = parser.parse_args(argv)
+
+    server = EmbeddingServer(args.host, args.port, args.backend, args.max_wait_ms, args.max_batch, args.model)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping embedding server.")
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,348 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from collections import Counter, deque
 import PyPDF2
 import csv
+import io
 import math
+import hashlib
+import os
+import re
 from Chroma import ChromaManager
 
+# Beers Criteria table columns (normalised header -> metadata field) kept as filterable metadata
+BEERS_METADATA_FIELDS = {
+    "drugs": "drug",
+    "drug(s)": "drug",
+    "drug": "drug",
+    "organ system, therapeutic category, drug(s)": "drug",
+    "object drug or class": "drug",
+    "pharmacological class": "pharmacological_class",
+    "disease or syndrome": "disease",
+    "interacting drug or class": "interacting_drug",
+    "crcl (ml/min) at which action is required": "crcl_threshold",
+    "quality of evidence": "quality_of_evidence",
+    "strength of recommendation": "strength_of_recommendation",
+}
+
+# "<30", "<=80", "eGFR <60" -> upper CrCl bound (mL/min) below which action is required
+CRCL_THRESHOLD_PATTERN = re.compile(r"^(?:egfr\s*)?<=?\s*(\d+)$")
+
+# Table captions are letter-spaced in the journal layout: "T A B L E 2 2023 American Geriatrics..."
+TABLE_CAPTION_PATTERN = re.compile(r"T\s*A\s*B\s*L\s*E\s*(\d+)")
+
+# Writing direction of a character -> page rotation that makes it upright
+PDF_ROTATION_FOR_DIRECTION = {(1, 0): 0, (0, 1): 90, (-1, 0): 180, (0, -1): 270}
+
+# pdfplumber's default (3pt) glues the tightly set words of the Beers PDF together
+PDF_X_TOLERANCE = 1
+
+
+def normalise_beers_value(value):
+    """Collapse whitespace and lower-case a Beers table cell so it can be matched with a Chroma 'where' clause."""
+    return " ".join(value.split()).lower()
+
+
+def is_beers_header(headers):
+    """Return True if a table header row has a Beers drug column."""
+    return any(BEERS_METADATA_FIELDS.get(" ".join((header or "").split()).lower()) == "drug" for header in headers)
+
+
+def table_row_document(doc_id, headers, values, metadata):
+    """
+    Build the chunk dict of one table row, shared by the CSV and PDF table paths.
+
+    The text is the "header: value" format of chunk_csv_text and the Beers columns are kept as
+    normalised metadata (plus 'crcl_max' when the CrCl threshold is a simple upper bound).
+
+    :param doc_id: Chunk ID.
+    :param headers: Column names.
+    :param values: Cell values, in column order.
+    :param metadata: Base metadata (source, chunk_index, ...), extended in place.
+    :return: Chunk dict.
+    """
+    parts = []
+    for header, value in zip(headers, values):
+        header = " ".join((header or "").split())
+        value = (value or "").strip()
+        if not value:
+            continue
+        if header:
+            parts.append(f"{header}: {value}")
+        field = BEERS_METADATA_FIELDS.get(header.lower())
+        if field:
+            metadata[field] = normalise_beers_value(value)
+
+    match = CRCL_THRESHOLD_PATTERN.match(metadata.get("crcl_threshold", ""))
+    if match:
+        metadata["crcl_max"] = int(match.group(1))
+
+    return {"id": doc_id, "text": " ".join(parts), "metadata": metadata}
+
+
+def is_beers_table_header(headers):
+    """
+    Return True if a header row extracted from a PDF has the Beers columns.
+
+    Stricter than is_beers_header: besides the drug column, the quality of evidence and strength
+    of recommendation columns must be found and no column may be unnamed, so a table whose
+    columns were not recovered correctly is not turned into row chunks.
+    """
+    fields = [BEERS_METADATA_FIELDS.get(" ".join((header or "").split()).lower()) for header in headers]
+    return (all(headers) and "drug" in fields
+            and "quality_of_evidence" in fields and "strength_of_recommendation" in fields)
+
+
+def text_direction(char):
+    """Return the writing direction of a pdfplumber character: (1, 0) for upright text."""
+    a, b = char["matrix"][:2]
+    if abs(a) >= abs(b):
+        return (1 if a > 0 else -1, 0)
+    return (0, 1 if b > 0 else -1)
+
+
+def clean_table_cell(text):
+    """Join the lines of an extracted cell, keeping words hyphenated across a line break whole."""
+    return " ".join(re.sub(r"-\n(?=\S)", "-", text or "").split())
+
+
+def _text_lines(words):
+    lines = []
+    for word in sorted(words, key=lambda word: (word["top"], word["x0"])):
+        if lines and abs(lines[-1][-1]["top"] - word["top"]) < 2:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    return lines
+
+
+def find_beers_tables(page):
+    """
+    Locate the Beers Criteria tables of an upright pdfplumber page and split them into rows.
+
+    The tables of the journal PDF have no ruling lines, only shaded stripes, which defeats
+    pdfplumber's line-based detection. Each table is anchored on its "Recommendation" header
+    instead: column boundaries come from the positions of the header words (footnote markers,
+    in a smaller font, are dropped), row boundaries from the edges of the shaded stripes, and
+    the table ends at the rule below it. Section labels (e.g. "Cardiovascular"), set in their
+    own font on a line of their own, become separate section rows.
+
+    :param page: pdfplumber page (or filtered view) whose text is upright.
+    :return: List of dictionaries with bbox, caption ("Table 2", or None), header (column names)
+             and rows, a list of ("section", label) and ("row", cells) tuples.
+    """
+    words = page.extract_words(x_tolerance=PDF_X_TOLERANCE, extra_attrs=["size", "fontname"])
+    stripes = [rect for rect in page.rects if rect["height"] > 5 and rect["width"] > 20]
+    tables = []
+    for anchor in [word for word in words if word["text"] == "Recommendation"]:
+        header_band = [rect for rect in stripes
+                       if rect["top"] <= anchor["top"] + 1 and rect["bottom"] >= anchor["bottom"] - 1]
+        top = min([rect["top"] for rect in header_band] + [anchor["top"] - 12])
+        bottom = max([rect["bottom"] for rect in header_band] + [anchor["bottom"] + 1])
+
+        columns = []
+        header_words = [word for word in words if word["top"] >= top - 1 and word["bottom"] <= bottom + 1
+                        and word["fontname"] == anchor["fontname"] and word["size"] >= 0.8 * anchor["size"]]
+        for word in sorted(header_words, key=lambda word: word["x0"]):
+            if columns and word["x0"] - columns[-1]["x1"] <= 6:
+                columns[-1]["x1"] = max(columns[-1]["x1"], word["x1"])
+                columns[-1]["words"].append(word)
+            else:
+                columns.append({"x0": word["x0"], "x1": word["x1"], "words": [word]})
+        if len(columns) < 2:
+            continue
+        header = [" ".join(word["text"] for line in _text_lines(column["words"]) for word in line)
+                  for column in columns]
+
+        left = min([rect["x0"] for rect in header_band] + [columns[0]["x0"] - 2])
+        right = max([rect["x1"] for rect in header_band] + [columns[-1]["x1"]])
+        rules = [rect for rect in page.rects
+                 if rect["top"] > bottom and rect["height"] < 2 and rect["width"] > 0.5 * (right - left)]
+        body = [word for word in words if word["top"] >= bottom and word["x0"] >= left - 1
+                and word["x1"] <= right + 1 and word["text"] != "(Continues)"]
+        if not body:
+            continue
+        table_bottom = min([rect["top"] for rect in rules] + [max(word["bottom"] for word in body) + 1])
+        body = [word for word in body if word["bottom"] <= table_bottom]
+        if not body:
+            continue
+        right = max([right] + [rect["x1"] for rect in rules if rect["top"] == table_bottom])
+
+        edges = {bottom, table_bottom}
+        edges.update(y for rect in stripes for y in (rect["top"], rect["bottom"]) if bottom < y < table_bottom)
+        body_font = Counter(word["fontname"] for word in body).most_common(1)[0][0]
+        sections = {}
+        for line in _text_lines(body):
+            if line[0]["x0"] < columns[1]["x0"] and all(
+                    word["fontname"] not in (body_font, anchor["fontname"]) for word in line):
+                line_bottom = max(word["bottom"] for word in line)
+                sections[(line[0]["top"] + line_bottom) / 2] = " ".join(word["text"] for word in line)
+                edges.update((line[0]["top"] - 0.5, line_bottom + 0.5))
+
+        # Footnote markers are dropped from the cells as well, so they do not stick to drug names
+        cells_page = page.crop((left, bottom, right, table_bottom)).filter(
+            lambda obj: obj["object_type"] != "char" or obj["size"] >= 0.8 * anchor["size"]
+        )
+        found = cells_page.find_table({
+            "vertical_strategy": "explicit",
+            "horizontal_strategy": "explicit",
+            "explicit_vertical_lines": [left] + [column["x0"] - 2 for column in columns[1:]] + [right],
+            "explicit_horizontal_lines": sorted(edges),
+            "snap_tolerance": 0.1,
+            "join_tolerance": 0.1,
+        })
+        rows = []
+        if found:
+            for row, cells in zip(found.rows, found.extract(x_tolerance=PDF_X_TOLERANCE)):
+                label = next((text for middle, text in sections.items() if row.bbox[1] < middle < row.bbox[3]), None)
+                rows.append(("section", label) if label else ("row", [clean_table_cell(cell) for cell in cells]))
+
+        caption = None
+        for line in reversed(_text_lines([word for word in words if word["bottom"] <= top + 1])):
+            match = TABLE_CAPTION_PATTERN.search(" ".join(word["text"] for word in line))
+            if match:
+                caption = f"Table {match.group(1)}"
+                break
+
+        tables.append({"bbox": (left, top, right, table_bottom), "caption": caption, "header": header, "rows": rows})
+    return tables
+
+
+class _SplitLevel:
+    def __init__(self, separators, chunk_size, chunk_overlap, emit):
+        """
+        One separator level of StreamingTextSplitter.
+
+        Text is cut into pieces that start with the separator. Pieces shorter than chunk_size are
+        merged with the overlap rules of TextSplitter._merge_splits; a piece that reaches chunk_size
+        is handed to a child level with the remaining separators, as
+        RecursiveCharacterTextSplitter._split_text does. Only the current piece (at most chunk_size
+        characters) and the pieces of the chunk being merged are held in memory.
+        """
+        self.separator = separators[0]
+        self.child_separators = separators[1:]
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.emit = emit
+        self.pending = ""  # Tail that may be the start of a separator split across two feeds
+        self.piece = ""
+        self.child = None  # Splits the current piece once it reached chunk_size
+        self.long_piece = None  # Same, when no separators are left: emitted as is
+        self.current = deque()
+        self.total = 0
+
+    def feed(self, text):
+        if not self.separator:
+            for character in text:
+                self._extend(character)
+                self._end_piece()
+            return
+
+        text = self.pending + text
+        start = 0
+        position = text.find(self.separator)
+        while position != -1:
+            self._extend(text[start:position])
+            self._end_piece()
+            start = position + len(self.separator)
+            self._extend(self.separator)
+            position = text.find(self.separator, start)
+
+        keep = max(start, len(text) - len(self.separator) + 1)
+        self._extend(text[start:keep])
+        self.pending = text[keep:]
+
+    def finish(self):
+        self._extend(self.pending)
+        self.pending = ""
+        self._end_piece()
+        self._flush()
+
+    def _extend(self, text):
+        if not text:
+            return
+        if self.child is not None:
+            self.child.feed(text)
+            return
+        if self.long_piece is not None:
+            self.long_piece.append(text)
+            return
+
+        self.piece += text
+        if len(self.piece) >= self.chunk_size:
+            self._flush()
+            if self.child_separators:
+                self.child = _SplitLevel(self.child_separators, self.chunk_size, self.chunk_overlap, self.emit)
+                self.child.feed(self.piece)
+            else:
+                self.long_piece = [self.piece]
+            self.piece = ""
+
+    def _end_piece(self):
+        if self.child is not None:
+            self.child.finish()
+            self.child = None
+        elif self.long_piece is not None:
+            self.emit("".join(self.long_piece))
+            self.long_piece = None
+        elif self.piece:
+            self._merge(self.piece)
+            self.piece = ""
+
+    def _merge(self, piece):
+        if self.total + len(piece) > self.chunk_size and self.current:
+            self._emit_current()
+            while self.total > self.chunk_overlap or (self.total + len(piece) > self.chunk_size and self.total > 0):
+                self.total -= len(self.current.popleft())
+        self.current.append(piece)
+        self.total += len(piece)
+
+    def _emit_current(self):
+        chunk = "".join(self.current).strip()
+        if chunk:
+            self.emit(chunk)
+
+    def _flush(self):
+        self._emit_current()
+        self.current.clear()
+        self.total = 0
+
+
+class StreamingTextSplitter:
+    def __init__(self, chunk_size=1000, chunk_overlap=500, separators=None):
+        """
+        Incremental version of RecursiveCharacterTextSplitter (default separators, kept at the
+        start of each split, whitespace stripped).
+
+        Feeding a text in any number of parts yields exactly the chunks split_text returns for the
+        whole text. A chunk is only returned once no later text can change it, so nothing has to
+        be re-split when the next part arrives.
+
+        :param chunk_size: Maximum size of a chunk in characters.
+        :param chunk_overlap: Overlap between consecutive chunks in characters.
+        :param separators: Separators to split on, coarsest first.
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), "
+                             f"should be smaller.")
+        self._chunks = []
+        self._root = _SplitLevel(separators or ["\n\n", "\n", " ", ""], chunk_size, chunk_overlap,
+                                 self._chunks.append)
+
+    def _drain(self):
+        chunks, self._chunks[:] = list(self._chunks), []
+        return chunks
+
+    def feed(self, text):
+        """Add the next part of the text and return the chunks completed by it."""
+        self._root.feed(text)
+        return self._drain()
+
+    def finish(self):
+        """Mark the end of the text and return the remaining chunks."""
+        self._root.finish()
+        return self._drain()
+
+
 class Ingestion_file:
     def __init__(self):
         """Initializes the Ingestion class"""
@@ -15,15 +354,34 @@ class Ingestion_file:
         :param pdf_path: Path to the PDF file.
         :return: Extracted text as a single string.
         """
-        text = ""
+        pages = []
         try:
             with open(pdf_path, "rb") as file:
                 reader = PyPDF2.PdfReader(file)
                 for page in reader.pages:
-                    text += page.extract_text() + "\n"
+                    pages.append((page.extract_text() or "") + "\n")
+        except Exception as e:
+            print(f"Error reading PDF file: {e}")
+        return "".join(pages)
+
+    def iter_pdf_pages(self, pdf_path, progress_callback=None):
+        """
+        Lazily extract text from a PDF file, one page at a time.
+        :param pdf_path: Path to the PDF file.
+        :param progress_callback: Optional callable receiving (pages_parsed, pages_total) after each page.
+        :return: Generator yielding the text of each page (with a trailing newline).
+        """
+        try:
+            with open(pdf_path, "rb") as file:
+                reader = PyPDF2.PdfReader(file)
+                pages_total = len(reader.pages)
+                for page_number, page in enumerate(reader.pages, start=1):
+                    page_text = (page.extract_text() or "") + "\n"
+                    if progress_callback:
+                        progress_callback(page_number, pages_total)
+                    yield page_text
         except Exception as e:
             print(f"Error reading PDF file: {e}")
-        return text
 
     def chunk_pdf_text(self, pdf_path, chunk_size=1000, chunk_overlap=500, debug=False):
 
@@ -56,6 +414,257 @@ class Ingestion_file:
         return documents
 
 
+    def stream_pdf_chunks(self, pdf_path, chunk_size=1000, chunk_overlap=500, debug=False, progress_callback=None):
+        """
+        Stream chunks of a PDF file page by page instead of splitting the whole document at once.
+
+        Pages are fed to a StreamingTextSplitter, which yields a chunk as soon as no later page can
+        change it, so chunks still cross page boundaries and the result is identical to
+        chunk_pdf_text. Only the current page and the text of the chunk being built are held in
+        memory.
+
+        :param pdf_path: Path to the PDF file.
+        :param chunk_size: Maximum size of a chunk in characters.
+        :param chunk_overlap: Overlap between consecutive chunks in characters.
+        :param debug: Print every chunk as it is produced.
+        :param progress_callback: Optional callable receiving (pages_parsed, pages_total) after each page.
+        :return: Generator yielding chunk dicts in the same format as chunk_pdf_text.
+        """
+        try:
+            chunking = StreamingTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        except Exception as e:
+            print(f"Error during PDF text splitting: {e}")
+            return
+
+        chunk_index = 0
+
+        def make_document(chunk):
+            if debug:
+                print(f"Chunk #{chunk_index}:\n{chunk}\nSize: {len(chunk)}\n{'-'*20}")
+            return {"id": f"pdf_{chunk_index}", "text": chunk, "metadata": {"source": pdf_path, "chunk_index": chunk_index}}
+
+        for page_text in self.iter_pdf_pages(pdf_path, progress_callback=progress_callback):
+            for chunk in chunking.feed(page_text):
+                chunk_index += 1
+                yield make_document(chunk)
+
+        for chunk in chunking.finish():
+            chunk_index += 1
+            yield make_document(chunk)
+
+        if chunk_index == 0:
+            print("No text found in PDF.")
+
+    def iter_pdf_page_views(self, pdf_path, progress_callback=None, min_share=0.1):
+        """
+        Lazily open the pages of a PDF file with pdfplumber, turned so that their text is upright.
+
+        Journal PDFs often draw landscape tables with rotated text instead of rotating the page,
+        which makes pdfplumber read them backwards. The writing direction of every character is
+        checked; for each direction holding at least min_share of the page's characters, a view
+        of the page is returned, rotated (through PyPDF2's /Rotate) so that this text is upright
+        and filtered to it. The dominant direction comes first.
+
+        :param pdf_path: Path to the PDF file.
+        :param progress_callback: Optional callable receiving (pages_parsed, pages_total) after each page.
+        :param min_share: Minimum share of the characters for a secondary direction to be kept.
+        :return: Generator yielding the list of upright views of each page.
+        """
+        import pdfplumber
+
+        reader = PyPDF2.PdfReader(pdf_path)
+        with pdfplumber.open(pdf_path) as pdf:
+            pages_total = len(pdf.pages)
+            for page_number, page in enumerate(pdf.pages, start=1):
+                directions = Counter(text_direction(char) for char in page.chars)
+                characters = sum(directions.values())
+                rotated = []
+                views = []
+                for rank, (direction, count) in enumerate(directions.most_common() or [((1, 0), 0)]):
+                    if rank and count < min_share * characters:
+                        continue
+                    view = page
+                    rotation = PDF_ROTATION_FOR_DIRECTION[direction]
+                    if rotation:
+                        writer = PyPDF2.PdfWriter()
+                        writer.add_page(reader.pages[page_number - 1]).rotate(rotation)
+                        buffer = io.BytesIO()
+                        writer.write(buffer)
+                        rotated.append(pdfplumber.open(buffer))
+                        view = rotated[-1].pages[0]
+                    views.append(view.filter(
+                        lambda obj: obj["object_type"] != "char" or text_direction(obj) == (1, 0)
+                    ))
+                try:
+                    yield views
+                finally:
+                    for document in rotated:
+                        document.close()
+                    page.close()
+                if progress_callback:
+                    progress_callback(page_number, pages_total)
+
+    def stream_pdf_table_chunks(self, pdf_path, chunk_size=1000, chunk_overlap=500, debug=False, progress_callback=None):
+        """
+        Table-aware PDF chunking: one chunk per Beers table row, character chunks for the remaining prose.
+
+        Pages are read upright (see iter_pdf_page_views) and the Beers tables are located with
+        find_beers_tables. Each row becomes a chunk in the same "header: value" format (and with
+        the same Beers metadata) as chunk_beers_table, with the table caption ("Table 2") as
+        'table' and the current section label as 'section'. Rows split over two stripes or two
+        pages (no strength of recommendation yet) are merged into the row they continue, and a
+        first column left empty by a merged cell is filled down. Tables
+        whose header does not have the Beers columns (is_beers_table_header) are left in the
+        prose, which is streamed through StreamingTextSplitter as in stream_pdf_chunks. Falls back
+        to stream_pdf_chunks when pdfplumber is not installed.
+
+        :param pdf_path: Path to the PDF file.
+        :param chunk_size: Maximum size of a prose chunk in characters.
+        :param chunk_overlap: Overlap between consecutive prose chunks in characters.
+        :param debug: Print every chunk as it is produced.
+        :param progress_callback: Optional callable receiving (pages_parsed, pages_total) after each page.
+        :return: Generator yielding chunk dicts ('chunk_type' metadata is "table_row" or "text").
+        """
+        try:
+            import pdfplumber
+        except ImportError:
+            print("pdfplumber is not installed, falling back to plain PDF text chunking.")
+            yield from self.stream_pdf_chunks(pdf_path, chunk_size, chunk_overlap, debug, progress_callback)
+            return
+
+        chunking = StreamingTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        default_table_name = os.path.splitext(os.path.basename(pdf_path))[0]
+        chunk_index = 0
+        table_name = None
+        header = None
+        section = None
+        pending = None  # Last row, held back until no later stripe or page can continue it
+
+        def make_text_document(chunk):
+            if debug:
+                print(f"Chunk #{chunk_index}:\n{chunk}\nSize: {len(chunk)}\n{'-'*20}")
+            return {"id": f"pdf_{chunk_index}", "text": chunk,
+                    "metadata": {"source": pdf_path, "chunk_index": chunk_index, "chunk_type": "text"}}
+
+        def make_row_document(row):
+            metadata = {"source": pdf_path, "chunk_index": chunk_index, "table": row["table"],
+                        "page": row["page"], "chunk_type": "table_row"}
+            document = table_row_document(f"pdf_{chunk_index}", row["header"], row["cells"], metadata)
+            if row["section"]:
+                metadata["section"] = row["section"]
+                document["text"] = f"Section: {row['section']} {document['text']}"
+            if debug:
+                print(f"Chunk #{chunk_index}:\n{document['text']}\n{metadata}\n{'-'*20}")
+            return document
+
+        try:
+            for page_number, views in enumerate(self.iter_pdf_page_views(pdf_path, progress_callback), start=1):
+                for view in views:
+                    tables = [table for table in find_beers_tables(view) if is_beers_table_header(table["header"])]
+
+                    for table in tables:
+                        name = table["caption"] or (table_name if table["header"] == header else default_table_name)
+                        if name != table_name or table["header"] != header:
+                            if pending:
+                                chunk_index += 1
+                                yield make_row_document(pending)
+                                pending = None
+                            table_name, header, section = name, table["header"], None
+
+                        strength = [BEERS_METADATA_FIELDS.get(name.lower()) for name in header].index(
+                            "strength_of_recommendation")
+                        for kind, value in table["rows"]:
+                            if kind == "section":
+                                if pending:
+                                    chunk_index += 1
+                                    yield make_row_document(pending)
+                                    pending = None
+                                section = value
+                                continue
+                            if not any(value):
+                                continue
+                            if pending and not value[strength]:
+                                pending["cells"] = [" ".join(filter(None, cells))
+                                                    for cells in zip(pending["cells"], value)]
+                                continue
+                            if pending:
+                                if not value[0]:
+                                    value = [pending["cells"][0]] + value[1:]
+                                chunk_index += 1
+                                yield make_row_document(pending)
+                            pending = {"table": table_name, "header": header, "cells": value,
+                                       "page": page_number, "section": section}
+
+                    # Prose: everything outside the Beers tables
+                    prose = view
+                    for table in tables:
+                        prose = prose.outside_bbox(table["bbox"])
+                    for chunk in chunking.feed((prose.extract_text(x_tolerance=PDF_X_TOLERANCE) or "") + "\n"):
+                        chunk_index += 1
+                        yield make_text_document(chunk)
+        except Exception as e:
+            print(f"Error reading PDF file: {e}")
+            return
+
+        if pending:
+            chunk_index += 1
+            yield make_row_document(pending)
+        for chunk in chunking.finish():
+            chunk_index += 1
+            yield make_text_document(chunk)
+
+        if chunk_index == 0:
+            print("No text found in PDF.")
+
+    def chunk_pdf_tables(self, pdf_path, chunk_size=1000, chunk_overlap=500, debug=False):
+        """
+        List version of stream_pdf_table_chunks.
+        :return: List of chunk dicts.
+        """
+        return list(self.stream_pdf_table_chunks(pdf_path, chunk_size, chunk_overlap, debug))
+
+    def batch_chunks(self, chunks, batch_size=64):
+        """
+        Group a stream of chunk dicts into lists that can be passed to ChromaManager.add_documents.
+        :param chunks: Iterable of chunk dicts.
+        :param batch_size: Number of chunks per batch.
+        :return: Generator yielding lists of at most batch_size chunk dicts.
+        """
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def assign_content_ids(self, documents, occurrences=None):
+        """
+        Replace positional chunk IDs (pdf_1, csv_1, ...) with content-hash IDs.
+
+        The ID is derived from the chunk's source and text, so an unchanged chunk keeps the same ID
+        across re-ingestions of a revised file. Identical chunks within one source are told apart
+        by their occurrence number. The hash is also stored as 'content_hash' metadata.
+
+        :param documents: List of chunk dicts as returned by chunk_pdf_text / chunk_csv_text.
+        :param occurrences: Occurrence counts to carry over between batches of one streamed source.
+        :return: The same list with 'id' and 'metadata.content_hash' rewritten.
+        """
+        if occurrences is None:
+            occurrences = {}
+        for doc in documents:
+            prefix = doc["id"].split("_", 1)[0]
+            source = doc.get("metadata", {}).get("source", "")
+            content_hash = hashlib.sha256(f"{source}\x00{doc['text']}".encode("utf-8")).hexdigest()[:32]
+
+            occurrence = occurrences.get(content_hash, 0)
+            occurrences[content_hash] = occurrence + 1
+
+            doc["id"] = f"{prefix}_{content_hash}" if occurrence == 0 else f"{prefix}_{content_hash}_{occurrence}"
+            doc.setdefault("metadata", {})["content_hash"] = content_hash
+        return documents
+
     def chunk_csv_text(self, csv_path, chunk_size=1, debug=False):
 
         rows = []
@@ -111,6 +720,109 @@ class Ingestion_file:
         return documents
 
 
+    def chunk_beers_table(self, csv_path, debug=False):
+        """
+        Schema-aware chunking for the Beers Criteria tables (Tables 2-6).
+
+        Emits one chunk per row, in the same "key: value" text format as chunk_csv_text, and keeps
+        the clinically relevant columns (drug, pharmacological class, disease, interacting drug,
+        CrCl threshold, quality of evidence, strength of recommendation) as typed metadata so that
+        retrieval can pre-filter with Chroma 'where' clauses. Metadata values are normalised with
+        normalise_beers_value; the CrCl threshold is also stored as an integer 'crcl_max' when it
+        is a simple upper bound. Files without a drug column fall back to chunk_csv_text.
+
+        :param csv_path: Path to the CSV file.
+        :param debug: Print every chunk as it is produced.
+        :return: List of chunk dicts.
+        """
+        documents = []
+        table_name = os.path.splitext(os.path.basename(csv_path))[0]
+        try:
+            with open(csv_path, mode='r', newline='', encoding='latin1') as file:
+                reader = csv.DictReader(file)
+
+                if not reader.fieldnames:
+                    print("No headers found in the CSV file.")
+                    return []
+
+                headers = [field for field in reader.fieldnames if field]
+                if not is_beers_header(headers):
+                    return self.chunk_csv_text(csv_path, debug=debug)
+
+                for row in reader:
+                    if not row or not any(value and value.strip() for value in row.values()):
+                        continue
+
+                    chunk_index = len(documents) + 1
+                    documents.append(table_row_document(
+                        f"csv_{chunk_index}", headers, [row.get(header) for header in headers],
+                        {"source": csv_path, "chunk_index": chunk_index, "table": table_name}
+                    ))
+
+        except Exception as e:
+            print(f"Error reading CSV file: {e}")
+            return []
+
+        if not documents:
+            print("No valid rows found in the CSV.")
+            return []
+
+        if debug:
+            for doc in documents:
+                print(f"Chunk #{doc['metadata']['chunk_index']}:\n{doc['text']}\n{doc['metadata']}\n{'-'*20}")
+
+        return documents
+
+
+# Beers Criteria PDF shipped in the repository, used by the tests below
+BEERS_PDF_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "data source",
+    "BEERS J American Geriatrics Society - 2023 -  - American Geriatrics Society 2023 updated AGS Beers Criteria  for potentially.pdf"
+)
+
+
+def test_stream_pdf_chunks_match():
+    """
+    Check that stream_pdf_chunks returns exactly the chunks of chunk_pdf_text on the bundled PDF.
+    """
+    ingesting = Ingestion_file()
+    for chunk_size, chunk_overlap in [(1000, 500), (1000, 200), (250, 50)]:
+        expected = ingesting.chunk_pdf_text(BEERS_PDF_PATH, chunk_size, chunk_overlap)
+        streamed = list(ingesting.stream_pdf_chunks(BEERS_PDF_PATH, chunk_size, chunk_overlap))
+        assert expected, "No chunks were created for the PDF."
+        assert len(streamed) == len(expected), \
+            f"{chunk_size}/{chunk_overlap}: {len(streamed)} streamed chunks, {len(expected)} expected"
+        for streamed_chunk, expected_chunk in zip(streamed, expected):
+            assert streamed_chunk == expected_chunk, \
+                f"{chunk_size}/{chunk_overlap}: chunk {expected_chunk['id']} differs"
+        print(f"Streamed chunking matches chunk_pdf_text at {chunk_size}/{chunk_overlap} ({len(expected)} chunks).")
+
+
+def test_pdf_table_rows_metadata():
+    """
+    Check the Beers metadata of known table rows extracted from the bundled PDF.
+    """
+    rows = [doc for doc in Ingestion_file().chunk_pdf_tables(BEERS_PDF_PATH)
+            if doc["metadata"]["chunk_type"] == "table_row"]
+    assert rows, "No table rows were extracted from the PDF."
+    assert all(doc["metadata"].get("drug") for doc in rows), "Some table rows have no drug metadata."
+
+    def find(table, **expected):
+        matches = [doc["metadata"] for doc in rows if doc["metadata"]["table"] == table
+                   and all(doc["metadata"].get(field) == value for field, value in expected.items())]
+        assert len(matches) == 1, f"{table}: expected one row with {expected}, found {len(matches)}"
+
+    find("Table 2", drug="amiodarone", section="Cardiovascular and antithrombotics",
+         quality_of_evidence="high", strength_of_recommendation="strong")
+    find("Table 2", drug="nitrofurantoin", section="Anti-infective", quality_of_evidence="low")
+    find("Table 3", disease="parkinson disease", section="Central nervous system",
+         quality_of_evidence="moderate", strength_of_recommendation="strong")
+    find("Table 4", drug="prasugrel ticagrelor", quality_of_evidence="moderate", strength_of_recommendation="strong")
+    find("Table 5", drug="lithium", interacting_drug="loop diuretics")
+    find("Table 6", drug="nitrofurantoin", crcl_threshold="<30", crcl_max=30, section="Anti-infective")
+    find("Table 6", drug="duloxetine", crcl_max=30, strength_of_recommendation="weak")
+    print(f"PDF table extraction: {len(rows)} rows, known rows carry the expected metadata.")
+
 
 def test_chunking_functions():
     """
@@ -150,6 +862,8 @@ def test_chunking_functions():
 
 if __name__ == "__main__":
     try:
+        test_stream_pdf_chunks_match()
+        test_pdf_table_rows_metadata()
         test_chunking_functions()
     except Exception as e:
         print(f"An error occurred during the test: {e}")
@@ -0,0 +1,117 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+import numpy as np
+
+
+# Artifact layout, one pair of files per source inside a collection directory:
+#   <artifact_dir>/<collection>/<stem>.jsonl  header line + one {"id", "text", "metadata"} line per chunk
+#   <artifact_dir>/<collection>/<stem>.npy    float32 embedding matrix (memory-mappable), row i = chunk i
+ARTIFACT_FORMAT = "tda-ingestion-artifact"
+ARTIFACT_VERSION = 1
+
+
+def artifact_stem(source):
+    """Build a file-system safe, unique file stem for a source path."""
+    name = os.path.splitext(os.path.basename(source))[0] or "source"
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")[:80]
+    return f"{name}_{hashlib.sha1(source.encode('utf-8')).hexdigest()[:10]}"
+
+
+def write_artifact(directory, source, model_name, ids, texts, metadatas, embeddings):
+    """
+    Write the chunks of one source together with their embeddings.
+
+    :param directory: Collection directory of the artifact.
+    :param source: The 'source' metadata value of the chunks.
+    :param model_name: Name of the embedding model that produced the vectors.
+    :param ids: List of chunk IDs.
+    :param texts: List of chunk texts.
+    :param metadatas: List of chunk metadata dictionaries.
+    :param embeddings: Array-like of shape (len(ids), dim).
+    :return: Path of the written .jsonl file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+    if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+        raise ValueError(f"Expected {len(ids)} embeddings for source '{source}', got shape {matrix.shape}.")
+
+    stem = artifact_stem(source)
+    np.save(os.path.join(directory, f"{stem}.npy"), matrix)
+
+    chunks_path = os.path.join(directory, f"{stem}.jsonl")
+    with open(chunks_path, "w", encoding="utf-8") as file:
+        header = {
+            "format": ARTIFACT_FORMAT,
+            "version": ARTIFACT_VERSION,
+            "source": source,
+            "model": model_name,
+            "count": len(ids),
+            "dim": int(matrix.shape[1]) if matrix.size else 0,
+        }
+        file.write(json.dumps(header) + "\n")
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            file.write(json.dumps({"id": doc_id, "text": text, "metadata": metadata or {}}) + "\n")
+    return chunks_path
+
+
+def read_artifact(chunks_path):
+    """
+    Read one source artifact. The embeddings are memory-mapped, not loaded.
+
+    :param chunks_path: Path of the .jsonl file.
+    :return: Tuple of (header, ids, texts, metadatas, embeddings).
+    """
+    with open(chunks_path, "r", encoding="utf-8") as file:
+        header = json.loads(file.readline())
+        if header.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(f"'{chunks_path}' is not an ingestion artifact.")
+
+        ids, texts, metadatas = [], [], []
+        for line in file:
+            chunk = json.loads(line)
+            ids.append(chunk["id"])
+            texts.append(chunk["text"])
+            metadatas.append(chunk["metadata"])
+
+    embeddings = np.load(os.path.splitext(chunks_path)[0] + ".npy", mmap_mode="r")
+    if embeddings.shape[0] != len(ids):
+        raise ValueError(f"'{chunks_path}' has {len(ids)} chunks but {embeddings.shape[0]} embeddings.")
+    return header, ids, texts, metadatas, embeddings
+
+
+def list_artifacts(directory):
+    """List the source artifacts of a collection directory."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".jsonl")
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import pre-built ingestion artifacts for ChromaDB.")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("artifact_dir", help="Directory holding one sub-directory per collection.")
+    parser.add_argument("--collection", action="append", default=None,
+                        help="Collection to export/import (default: Structured_data and Unstructured_data).")
+    args = parser.parse_args(argv)
+
+    from Chroma import ChromaManager
+    chroma_manager = ChromaManager()
+    collections = args.collection or list(chroma_manager.collections.keys())
+
+    for collection_name in collections:
+        directory = os.path.join(args.artifact_dir, collection_name)
+        if args.action == "export":
+            chroma_manager.export_collection(collection_name, directory)
+        else:
+            chroma_manager.import_collection(collection_name, directory)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
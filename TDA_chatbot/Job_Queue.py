@@ -0,0 +1,356 @@
+import os
+import time
+import sqlite3
+import multiprocessing
+from datetime import datetime
+from Ingestion import Ingestion_file
+from Chunk_Manifest import ChunkManifest
+
+
+# Job life cycle: queued -> running -> done | failed | cancelled (queued jobs can also be cancelled directly)
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+# Chunks embedded and written per batch by the workers
+WRITE_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", "256"))
+
+
+class JobCancelled(Exception):
+    """Raised in a worker when the resource of its job was deleted while the job ran."""
+
+
+class IngestionJobQueue:
+    def __init__(self, db_path, manifest_path=None):
+        """
+        Local background queue for file ingestion, with the job state persisted in SQLite.
+
+        The web app enqueues a job and returns straight away; worker processes started with
+        start_workers() claim queued jobs, parse, chunk and embed the file, and record their
+        progress (pages parsed, chunks embedded) so it can be polled.
+
+        :param db_path: Path of the SQLite file holding the job table.
+        :param manifest_path: Path of the ChunkManifest the workers record indexed chunk IDs in (optional).
+        """
+        self.db_path = db_path
+        self.manifest_path = manifest_path
+        self.workers = []
+        self._create_table()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _create_table(self):
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    resource_name TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    collection TEXT NOT NULL,
+                    mode TEXT NOT NULL DEFAULT 'add',
+                    status TEXT NOT NULL,
+                    pages_total INTEGER,
+                    pages_parsed INTEGER NOT NULL DEFAULT 0,
+                    chunks_total INTEGER,
+                    chunks_embedded INTEGER NOT NULL DEFAULT 0,
+                    message TEXT,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Job tables created before jobs could be cancelled have no cancel_requested column
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(ingestion_jobs)")}
+            if "cancel_requested" not in columns:
+                connection.execute("ALTER TABLE ingestion_jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+
+    # === JOBS ===
+    def enqueue(self, resource_name, file_path, collection, mode="add"):
+        """
+        Queue a file for background ingestion.
+
+        :param resource_name: Name of the Resource row the file belongs to.
+        :param file_path: Path of the uploaded file.
+        :param collection: ChromaDB collection to index into.
+        :param mode: "add" to index a new file, "sync" to incrementally re-index an updated one.
+        :return: The job ID.
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT INTO ingestion_jobs (resource_name, file_path, collection, mode, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (resource_name, file_path, collection, mode, STATUS_QUEUED, datetime.now().isoformat())
+            )
+            return cursor.lastrowid
+
+    def get_job(self, job_id):
+        """
+        Return the state of a job, including an ETA estimate in seconds while it is running.
+
+        :param job_id: ID returned by enqueue.
+        :return: Dictionary with the job columns and 'eta_seconds', or None if unknown.
+        """
+        with self._connect() as connection:
+            row = connection.execute("SELECT * FROM ingestion_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._with_eta(dict(row)) if row else None
+
+    def latest_jobs(self, resource_names):
+        """
+        Return the most recent job of each of the given resources.
+
+        :param resource_names: Iterable of Resource names.
+        :return: Dictionary mapping resource name to its latest job.
+        """
+        jobs = {}
+        with self._connect() as connection:
+            for resource_name in resource_names:
+                row = connection.execute(
+                    "SELECT * FROM ingestion_jobs WHERE resource_name = ? ORDER BY job_id DESC LIMIT 1",
+                    (resource_name,)
+                ).fetchone()
+                if row:
+                    jobs[resource_name] = self._with_eta(dict(row))
+        return jobs
+
+    def _with_eta(self, job):
+        job["eta_seconds"] = None
+        if job["status"] != STATUS_RUNNING or not job["started_at"]:
+            return job
+
+        elapsed = (datetime.now() - datetime.fromisoformat(job["started_at"])).total_seconds()
+        if job["pages_total"] and job["pages_parsed"]:
+            done, total = job["pages_parsed"], job["pages_total"]
+        elif job["chunks_total"] and job["chunks_embedded"]:
+            done, total = job["chunks_embedded"], job["chunks_total"]
+        else:
+            return job
+
+        job["eta_seconds"] = round(elapsed / done * (total - done), 1)
+        return job
+
+    def claim_next(self):
+        """
+        Atomically mark the oldest queued job as running.
+
+        :return: The claimed job, or None if the queue is empty.
+        """
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT * FROM ingestion_jobs WHERE status = ? ORDER BY job_id LIMIT 1", (STATUS_QUEUED,)
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            connection.execute(
+                "UPDATE ingestion_jobs SET status = ?, started_at = ? WHERE job_id = ?",
+                (STATUS_RUNNING, datetime.now().isoformat(), row["job_id"])
+            )
+            connection.execute("COMMIT")
+            return dict(row)
+        finally:
+            connection.close()
+
+    def update_progress(self, job_id, **fields):
+        """
+        Record progress of a running job.
+
+        :param fields: Any of pages_total, pages_parsed, chunks_total, chunks_embedded.
+        """
+        allowed = {"pages_total", "pages_parsed", "chunks_total", "chunks_embedded"}
+        fields = {key: value for key, value in fields.items() if key in allowed}
+        if not fields:
+            return
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._connect() as connection:
+            connection.execute(
+                f"UPDATE ingestion_jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id)
+            )
+
+    def finish(self, job_id, status, message=None):
+        """Mark a job as done or failed."""
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE ingestion_jobs SET status = ?, message = ?, finished_at = ? WHERE job_id = ?",
+                (status, message, datetime.now().isoformat(), job_id)
+            )
+
+    def cancel(self, resource_name):
+        """
+        Cancel the jobs of a resource, e.g. because it is being deleted.
+
+        Queued jobs are cancelled at once. Running jobs are flagged: their worker stops after the
+        batch it is writing and deletes the chunks the job wrote, so none outlive the resource.
+
+        :param resource_name: Name of the Resource row.
+        :return: Number of running jobs that were flagged.
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE ingestion_jobs SET status = ?, message = ?, finished_at = ? WHERE resource_name = ? AND status = ?",
+                (STATUS_CANCELLED, "Resource deleted before ingestion started.", datetime.now().isoformat(),
+                 resource_name, STATUS_QUEUED)
+            )
+            return connection.execute(
+                "UPDATE ingestion_jobs SET cancel_requested = 1 WHERE resource_name = ? AND status = ?",
+                (resource_name, STATUS_RUNNING)
+            ).rowcount
+
+    def is_cancelled(self, job_id):
+        """Return True if the job was flagged for cancellation while it ran."""
+        with self._connect() as connection:
+            row = connection.execute("SELECT cancel_requested FROM ingestion_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def requeue_interrupted(self):
+        """Put jobs that were running when the workers last stopped back in the queue."""
+        with self._connect() as connection:
+            # A job whose resource was deleted meanwhile is not run again
+            connection.execute(
+                "UPDATE ingestion_jobs SET status = ?, finished_at = ? WHERE status = ? AND cancel_requested = 1",
+                (STATUS_CANCELLED, datetime.now().isoformat(), STATUS_RUNNING)
+            )
+            cursor = connection.execute(
+                "UPDATE ingestion_jobs SET status = ?, started_at = NULL, pages_parsed = 0, chunks_embedded = 0 "
+                "WHERE status = ?", (STATUS_QUEUED, STATUS_RUNNING)
+            )
+            return cursor.rowcount
+
+    # === WORKERS ===
+    def start_workers(self, count=1, poll_interval=1.0):
+        """
+        Start background worker processes consuming the queue.
+
+        :param count: Number of worker processes.
+        :param poll_interval: Seconds a worker sleeps when the queue is empty.
+        """
+        requeued = self.requeue_interrupted()
+        if requeued:
+            print(f"Re-queued {requeued} interrupted ingestion job(s).")
+
+        context = multiprocessing.get_context("spawn")
+        for _ in range(count):
+            worker = context.Process(target=_worker_loop, args=(self.db_path, poll_interval, self.manifest_path),
+                                     daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        print(f"Started {count} ingestion worker(s).")
+
+
+def run_job(queue, job, chroma_manager, manifest=None):
+    """
+    Parse, chunk and embed the file of a claimed job, reporting progress to the queue.
+
+    :param queue: IngestionJobQueue the job was claimed from.
+    :param job: Job dictionary returned by claim_next.
+    :param chroma_manager: ChromaManager used for indexing.
+    :param manifest: ChunkManifest recording the resource's chunk IDs (optional).
+    :return: Message summarising the result.
+    """
+    ingesting = Ingestion_file()
+    file_path = job["file_path"]
+    job_id = job["job_id"]
+    collection_name = job["collection"]
+
+    if job["mode"] == "sync":
+        if file_path.lower().endswith(".pdf"):
+            documents = ingesting.chunk_pdf_text(file_path)
+        else:
+            documents = ingesting.chunk_beers_table(file_path)
+        queue.update_progress(job_id, chunks_total=len(documents))
+        documents = ingesting.assign_content_ids(documents)
+        # The manifest is updated under the same write fence, so a re-index swap sees the replacement
+        with chroma_manager.write_fence(collection_name):
+            result = chroma_manager.sync_documents(documents, source_value=file_path, collection_name=collection_name)
+            if queue.is_cancelled(job_id):
+                chroma_manager.delete_documents([doc["id"] for doc in documents], collection_name=collection_name)
+                raise JobCancelled(f"'{job['resource_name']}' was deleted; its re-indexed chunks were removed.")
+            if manifest is not None:
+                manifest.replace_chunks(job["resource_name"], collection_name, file_path,
+                                        [doc["id"] for doc in documents])
+        queue.update_progress(job_id, chunks_embedded=result["added"])
+        return (f"{result['added']} added, {result['deleted']} removed, "
+                f"{result['skipped']} unchanged chunks skipped.")
+
+    written_ids = []
+
+    def on_written(written, batch):
+        written_ids.extend(doc["id"] for doc in batch)
+        # Checked between batches, before the manifest records the batch of a deleted resource
+        if queue.is_cancelled(job_id):
+            raise JobCancelled(f"'{job['resource_name']}' was deleted after {written} chunks; they were removed.")
+        if manifest is not None:
+            manifest.add_chunks(job["resource_name"], collection_name, file_path, [doc["id"] for doc in batch])
+        queue.update_progress(job_id, chunks_embedded=written)
+
+    if file_path.lower().endswith(".pdf"):
+        def on_page(pages_parsed, pages_total):
+            queue.update_progress(job_id, pages_parsed=pages_parsed, pages_total=pages_total)
+
+        occurrences = {}
+        chunks = ingesting.stream_pdf_chunks(file_path, progress_callback=on_page)
+        # IDs are assigned lazily, batch by batch, so the PDF is never fully held in memory
+        documents = (
+            doc for batch in ingesting.batch_chunks(chunks)
+            for doc in ingesting.assign_content_ids(batch, occurrences)
+        )
+    else:
+        documents = ingesting.assign_content_ids(ingesting.chunk_beers_table(file_path))
+        queue.update_progress(job_id, chunks_total=len(documents))
+
+    try:
+        indexed = chroma_manager.add_documents_stream(
+            documents, batch_size=WRITE_BATCH_SIZE, use_ids=True, collection_name=collection_name,
+            progress_callback=on_written
+        )
+        # The delete may also have come after the check of the last batch
+        if queue.is_cancelled(job_id):
+            raise JobCancelled(f"'{job['resource_name']}' was deleted after {indexed} chunks; they were removed.")
+    except JobCancelled:
+        # The resource's chunks were deleted with it, except those written since; remove every chunk of this job
+        chroma_manager.delete_documents(written_ids, collection_name=collection_name)
+        if manifest is not None:
+            manifest.delete_resource(job["resource_name"])
+        raise
+
+    if not indexed:
+        raise ValueError(f"No content could be extracted from '{os.path.basename(file_path)}'.")
+    return f"Processed and indexed {indexed} documents."
+
+
+def _worker_loop(db_path, poll_interval=1.0, manifest_path=None):
+    """Entry point of a worker process: claim and run jobs until the parent exits."""
+    # Imported here so the embedding model is only loaded inside the worker processes
+    from Chroma import ChromaManager
+
+    queue = IngestionJobQueue(db_path)
+    manifest = ChunkManifest(manifest_path) if manifest_path else None
+    chroma_manager = None
+
+    while True:
+        job = queue.claim_next()
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        print(f"Ingestion job #{job['job_id']} started: {job['file_path']}")
+        try:
+            if chroma_manager is None:
+                chroma_manager = ChromaManager()
+            message = run_job(queue, job, chroma_manager, manifest)
+            queue.finish(job["job_id"], STATUS_DONE, message)
+            print(f"Ingestion job #{job['job_id']} done: {message}")
+        except JobCancelled as e:
+            queue.finish(job["job_id"], STATUS_CANCELLED, str(e))
+            print(f"Ingestion job #{job['job_id']} cancelled: {e}")
+        except Exception as e:
+            queue.finish(job["job_id"], STATUS_FAILED, str(e))
+            print(f"Ingestion job #{job['job_id']} failed: {e}")
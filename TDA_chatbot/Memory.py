@@ -5,7 +5,7 @@ from tabulate import tabulate
 from langchain_community.cache import RedisSemanticCache
 from langchain.globals import set_llm_cache
 from langchain.schema import Generation
-from Embedding_Model import PubMedBERT
+from Embedding_Model import shared_pubmedbert, NumpyEmbeddings
 # Key-Value Store
 import redis
 import json
@@ -26,7 +26,8 @@ class RedisSemanticCacheManager:
 
         # Load configuration values
         self.redis_url = os.getenv("REDIS_URL")
-        self.embeddings = PubMedBERT()
+        # float32 vectors go straight into the Redis vector buffers, without a list round-trip
+        self.embeddings = NumpyEmbeddings(shared_pubmedbert())
         self.score_threshold = 1
 
         # Initialize RedisSemanticCache
@@ -0,0 +1,130 @@
+import os
+import time
+import threading
+from tabulate import tabulate
+
+
+def resident_memory_bytes():
+    """
+    Return the resident set size of the current process in bytes (0 if it cannot be measured).
+    """
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss
+    except ImportError:
+        pass
+
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class ModelRegistry:
+    def __init__(self):
+        """
+        Process-wide registry of heavy models (embedding model, cross-encoder, ...).
+
+        Every model is loaded once per process, lazily on first use, and the same instance is
+        handed to every component asking for it. Load time and the growth of resident memory
+        during the load are recorded per model.
+        """
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def get(self, name, factory):
+        """
+        Return the model registered under name, loading it with factory on first use.
+
+        :param name: Unique key of the model, e.g. "embeddings:NeuML/pubmedbert-base-embeddings".
+        :param factory: Callable without arguments that loads the model.
+        :return: The shared model instance.
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        # One lock per model, so loading one model does not block users of another
+        with self._lock:
+            lock = self._loading.setdefault(name, threading.Lock())
+
+        with lock:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            rss_before = resident_memory_bytes()
+            start = time.perf_counter()
+            model = factory()
+            load_seconds = time.perf_counter() - start
+
+            self._stats[name] = {
+                "load_seconds": round(load_seconds, 3),
+                "rss_bytes": max(resident_memory_bytes() - rss_before, 0),
+                "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            self._models[name] = model
+            print(f"Loaded model '{name}' in {load_seconds:.2f}s.")
+            return model
+
+    def is_loaded(self, name):
+        """Return True if the model has already been loaded in this process."""
+        return name in self._models
+
+    def unload(self, name):
+        """Drop a model from the registry (it is loaded again on next use)."""
+        with self._lock:
+            self._models.pop(name, None)
+            self._stats.pop(name, None)
+
+    def get_stats(self):
+        """
+        Return the load statistics of every loaded model.
+
+        :return: Dictionary mapping model name to load_seconds, rss_bytes and loaded_at.
+        """
+        return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def format_stats(self):
+        """Format the load statistics for terminal display."""
+        if not self._stats:
+            return "No models loaded."
+        rows = [
+            [name, stats["load_seconds"], round(stats["rss_bytes"] / 1024 / 1024, 1), stats["loaded_at"]]
+            for name, stats in self._stats.items()
+        ]
+        rows.append(["Process total", "", round(resident_memory_bytes() / 1024 / 1024, 1), ""])
+        return tabulate(rows, headers=["Model", "Load (s)", "RSS (MB)", "Loaded at"], tablefmt="grid")
+
+
+# Shared by every component of the process
+model_registry = ModelRegistry()
+
+
+def test_shared_models():
+    # Imported here to avoid a circular import (both modules use the registry)
+    from Embedding_Model import shared_pubmedbert
+    from Re_ranker import CrossEncoderReRanker
+
+    first = shared_pubmedbert()
+    second = shared_pubmedbert()
+    print(f"Same PubMedBERT instance: {first is second}")
+
+    first.embed_query("What is the latest treatment for diabetes?")
+    CrossEncoderReRanker().cross_encoder
+    CrossEncoderReRanker().cross_encoder
+    print(model_registry.format_stats())
+
+
+if __name__ == "__main__":
+    try:
+        test_shared_models()
+
+    except Exception as e:
+        print(f"\nAn error occurred during testing: {e}")
+
+    finally:
+        print("\nTesting complete.")
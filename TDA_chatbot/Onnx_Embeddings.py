@@ -0,0 +1,137 @@
+import os
+import re
+import numpy as np
+
+
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "onnx")
+
+# Embedding backends selectable with EMBEDDING_BACKEND (see Embedding_Model.PubMedBERT)
+BACKEND_TORCH = "torch"
+BACKEND_ONNX = "onnx"
+BACKEND_ONNX_INT8 = "onnx-int8"
+BACKENDS = (BACKEND_TORCH, BACKEND_ONNX, BACKEND_ONNX_INT8)
+
+
+def onnx_model_dir(model_name, base_dir=None):
+    """Directory holding the exported ONNX files and tokenizer of a model."""
+    base_dir = base_dir or os.getenv("ONNX_MODEL_DIR") or DEFAULT_ONNX_DIR
+    return os.path.join(base_dir, re.sub(r"[^A-Za-z0-9._-]+", "_", model_name))
+
+
+def export_onnx(model_name, output_dir=None, quantize=True, opset=17):
+    """
+    Export a HuggingFace encoder to ONNX, optionally with a dynamically int8-quantized copy.
+
+    Only the transformer is exported; mean pooling and normalisation are done in NumPy by
+    OnnxEmbeddings, the same way sentence-transformers does them for this model.
+
+    :param model_name: HuggingFace model to export.
+    :param output_dir: Target directory (default: onnx_model_dir(model_name)).
+    :param quantize: Also write model_int8.onnx with int8 weights for the linear layers.
+    :param opset: ONNX opset version.
+    :return: The output directory.
+    """
+    # Export-only dependencies, not needed to run the exported model
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    output_dir = output_dir or onnx_model_dir(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["Warfarin in older adults."], return_tensors="pt")
+    model_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            model_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "token_type_ids": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=opset,
+        )
+    print(f"Exported '{model_name}' to '{model_path}'.")
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantized_path = os.path.join(output_dir, "model_int8.onnx")
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"Quantized model written to '{quantized_path}'.")
+    return output_dir
+
+
+class OnnxEmbeddings:
+    def __init__(self, model_name="NeuML/pubmedbert-base-embeddings", quantized=False, model_dir=None,
+                 max_seq_length=512, threads=None):
+        """
+        CPU embedding backend running an exported model with ONNX Runtime.
+
+        Drop-in replacement for the HuggingFaceEmbeddings instance used by PubMedBERT: it offers
+        embed_documents, embed_query and a tokenizer. The model is exported on first use if the
+        ONNX files are missing.
+
+        :param model_name: HuggingFace model the ONNX files were exported from.
+        :param quantized: Use the int8-quantized model instead of the float32 one.
+        :param model_dir: Directory with the ONNX files (default: onnx_model_dir(model_name)).
+        :param max_seq_length: Token length at which inputs are truncated.
+        :param threads: ONNX Runtime intra-op threads (default: ONNX_THREADS or all cores).
+        """
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.quantized = quantized
+        self.max_seq_length = max_seq_length
+        self.model_dir = model_dir or onnx_model_dir(model_name)
+
+        model_file = "model_int8.onnx" if quantized else "model.onnx"
+        model_path = os.path.join(self.model_dir, model_file)
+        if not os.path.exists(model_path):
+            export_onnx(model_name, self.model_dir, quantize=quantized)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = threads or int(os.getenv("ONNX_THREADS", "0"))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def embed_array(self, texts):
+        """
+        Embed texts in a single forward pass: mean pooling over the attention mask, L2-normalised.
+
+        :param texts: List of strings (the caller is responsible for batching).
+        :return: float32 matrix of shape (len(texts), dim).
+        """
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_seq_length,
+                                 return_tensors="np")
+        inputs = {name: encoded[name].astype(np.int64) for name in encoded if name in self.input_names}
+        hidden = self.session.run(None, inputs)[0]
+
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return np.ascontiguousarray(pooled, dtype=np.float32)
+
+    def embed_documents(self, texts):
+        """Embed a list of strings."""
+        if not texts:
+            return []
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        """Embed a single string."""
+        return self.embed_documents([text])[0]
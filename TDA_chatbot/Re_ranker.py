@@ -2,6 +2,7 @@
 from langchain_community.cross_encoders import HuggingFaceCrossEncoder
 from Retrieval import Retriever
 from tabulate import tabulate
+from Model_Registry import model_registry
 # Traditional Scoring Techniques
 import nltk
 from nltk.tokenize import word_tokenize
@@ -16,7 +17,18 @@ class CrossEncoderReRanker:
         Initializes the CrossEncoder ReRanker with the specified model.
         :param model_name: Name of the HuggingFace model to be used.
         """
-        self.cross_encoder = HuggingFaceCrossEncoder(model_name=model_name)
+        self.model_name = model_name
+        self._cross_encoder = None
+
+    @property
+    def cross_encoder(self):
+        """The shared cross-encoder, loaded once per process on first use."""
+        if self._cross_encoder is None:
+            self._cross_encoder = model_registry.get(
+                f"cross_encoder:{self.model_name}",
+                lambda: HuggingFaceCrossEncoder(model_name=self.model_name)
+            )
+        return self._cross_encoder
 
     def re_rank_documents(self, query_text, retrieved_docs, top_k=10):
         """
@@ -0,0 +1,299 @@
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+from tabulate import tabulate
+from Ingestion import Ingestion_file
+from Chroma import ChromaManager
+from Chunk_Manifest import ChunkManifest
+
+
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "chunk_manifest.sqlite3")
+COLLECTIONS = ("Structured_data", "Unstructured_data")
+
+
+class BlueGreenReindexer:
+    def __init__(self, chroma_manager=None, manifest_path=DEFAULT_MANIFEST_PATH, chunk_size=1000, chunk_overlap=500,
+                 batch_size=256, max_chunks_per_second=None):
+        """
+        Rebuild a collection from its source files next to the live one, then swap it in.
+
+        The chatbot keeps answering from the live collection during the build. The rebuilt
+        (shadow) collection only replaces it with swap(), which updates the collection aliases
+        atomically; the old collection is kept so rollback() can switch back.
+
+        :param chroma_manager: ChromaManager used for indexing (created on demand if None). It only reads
+                               the live collections' metadata and IDs, so it opens them even if they
+                               were built with another model; that is what a model change rebuilds.
+        :param manifest_path: ChunkManifest of the admin app, updated after a swap or rollback (None to skip).
+        :param chunk_size: Chunk size used for PDF files.
+        :param chunk_overlap: Chunk overlap used for PDF files.
+        :param batch_size: Chunks embedded and written per batch.
+        :param max_chunks_per_second: Embedding rate limit, so the build does not starve live queries
+                                      (default: unlimited).
+        """
+        self.chroma_manager = chroma_manager or ChromaManager(check_model=False)
+        self.manifest = ChunkManifest(manifest_path) if manifest_path and os.path.exists(manifest_path) else None
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.batch_size = batch_size
+        self.max_chunks_per_second = max_chunks_per_second
+        self.ingesting = Ingestion_file()
+        # Builds waiting for their swap: key -> (time of the last catch-up, report)
+        self.builds = {}
+        self._throttle_start = time.perf_counter()
+        self._throttled_chunks = 0
+
+    def collection_sources(self, collection_name, page_size=5000):
+        """
+        Count the chunks of every source in a collection, reading only the metadata.
+
+        :return: Dictionary of source -> number of chunks.
+        """
+        collection = self.chroma_manager.get_collection(collection_name)
+        sources = {}
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                return sources
+            for metadata in page["metadatas"]:
+                source = (metadata or {}).get("source", "")
+                sources[source] = sources.get(source, 0) + 1
+            offset += len(page["ids"])
+
+    def _chunks(self, file_path):
+        """Chunk a source file the way the ingestion workers do, with content-hash IDs."""
+        if file_path.lower().endswith(".pdf"):
+            occurrences = {}
+            chunks = self.ingesting.stream_pdf_chunks(file_path, self.chunk_size, self.chunk_overlap)
+            for batch in self.ingesting.batch_chunks(chunks):
+                yield from self.ingesting.assign_content_ids(batch, occurrences)
+        else:
+            yield from self.ingesting.assign_content_ids(self.ingesting.chunk_beers_table(file_path))
+
+    def _throttled(self, chunks):
+        """
+        Yield chunks so the build averages at most max_chunks_per_second, pausing once per batch.
+
+        add_documents_stream embeds batch_size chunks in one call, so pacing single chunks would
+        only delay the next burst. The pause is taken before each batch is pulled, and the rate is
+        kept over the whole build, so sources smaller than a batch are paced too.
+        """
+        if not self.max_chunks_per_second:
+            yield from chunks
+            return
+        for count, chunk in enumerate(chunks):
+            if count % self.batch_size == 0:
+                delay = (self._throttle_start + self._throttled_chunks / self.max_chunks_per_second
+                         - time.perf_counter())
+                if delay > 0:
+                    time.sleep(delay)
+            self._throttled_chunks += 1
+            yield chunk
+
+    def _index_source(self, shadow_key, source, throttle=True):
+        chunks = self._chunks(source)
+        return self.chroma_manager.add_documents_stream(
+            self._throttled(chunks) if throttle else chunks, batch_size=self.batch_size, use_ids=True,
+            collection_name=shadow_key
+        )
+
+    def build(self, key):
+        """
+        Rebuild a logical collection into a new shadow collection.
+
+        Every source of the live collection is chunked again from its file. Sources uploaded,
+        replaced or deleted while the build ran are caught up at the end, and once more by swap()
+        for the changes made after that. Sources whose file no longer exists are reported as
+        missing, not silently dropped.
+
+        :param key: "Structured_data" or "Unstructured_data".
+        :return: Report dictionary with shadow, sources, chunks, missing and seconds.
+        """
+        started = datetime.now().isoformat()
+        start = self._throttle_start = time.perf_counter()
+        self._throttled_chunks = 0
+        shadow_key, shadow_name = self.chroma_manager.open_shadow_collection(key)
+        print(f"Rebuilding {key} into '{shadow_name}'...")
+
+        report = {"collection": key, "shadow": shadow_name, "sources": 0, "chunks": 0, "missing": []}
+        try:
+            for source in sorted(self.collection_sources(key)):
+                self._rebuild_source(shadow_key, source, report)
+            caught_up = datetime.now().isoformat()
+            self._catch_up(key, shadow_key, started, report)
+            self.builds[key] = (caught_up, report)
+        except BaseException:
+            print(f"Re-index of {key} failed; dropping '{shadow_name}'.")
+            self.chroma_manager.drop_shadow_collection(key)
+            raise
+
+        report["seconds"] = round(time.perf_counter() - start, 2)
+        return report
+
+    def _rebuild_source(self, shadow_key, source, report, throttle=True):
+        if not source or not os.path.exists(source):
+            print(f"Source file '{source}' not found; it is missing from the rebuilt collection.")
+            if source not in report["missing"]:
+                report["missing"].append(source)
+            return
+        indexed = self._index_source(shadow_key, source, throttle)
+        report["sources"] += 1
+        report["chunks"] += indexed
+        print(f"Re-indexed {indexed} chunks of '{source}'.")
+
+    def _catch_up(self, key, shadow_key, started, report, throttle=True):
+        """
+        Apply the uploads and deletes the live collection received while the shadow was built.
+
+        :param started: ISO time from which manifest updates count as changes (None to only compare sources).
+        """
+        live = self.collection_sources(key)
+        shadow = self.collection_sources(shadow_key)
+        changed = {entry["source"] for entry in self.manifest.list_resources(key)
+                   if entry["updated_at"] >= started} if self.manifest and started else set()
+
+        for source in sorted(set(shadow) - set(live)):
+            self.chroma_manager.delete_documents_by_metadata_source(source, collection_name=shadow_key)
+            report["sources"] -= 1
+            print(f"'{source}' was deleted during the build; removed it from the rebuilt collection.")
+        for source in sorted(live):
+            if source in shadow and source not in changed:
+                continue
+            if source in report["missing"]:
+                continue
+            if source in shadow:
+                self.chroma_manager.delete_documents_by_metadata_source(source, collection_name=shadow_key)
+                report["sources"] -= 1
+            self._rebuild_source(shadow_key, source, report, throttle)
+
+    def swap(self, key):
+        """
+        Make the shadow collection of key the live one and update the manifest.
+
+        The changes made since build()'s catch-up are applied to the shadow under the write fence,
+        right before the alias switch, so no upload or delete is lost in between. This last
+        catch-up is not throttled, since live writes wait for it.
+        """
+        caught_up, report = self.builds.pop(key, (None, {"sources": 0, "chunks": 0, "missing": []}))
+
+        def final_catch_up():
+            self._catch_up(key, f"{key}:shadow", caught_up, report, throttle=False)
+
+        previous = self.chroma_manager.swap_collection(key, before_swap=final_catch_up)
+        self.refresh_manifest(key)
+        return previous
+
+    def rollback(self, key):
+        """Switch key back to its previous collection and update the manifest."""
+        restored = self.chroma_manager.rollback_collection(key)
+        self.refresh_manifest(key)
+        return restored
+
+    def refresh_manifest(self, key):
+        """Point the manifest entries of a collection at the chunk IDs of the collection now serving it."""
+        if self.manifest is None:
+            return
+        collection = self.chroma_manager.get_collection(key)
+        for entry in self.manifest.list_resources(key):
+            chunk_ids = collection.get(where={"source": entry["source"]}, include=[])["ids"]
+            self.manifest.replace_chunks(entry["resource_name"], key, entry["source"], chunk_ids)
+
+    def status(self):
+        """
+        Describe which physical collection serves each logical collection.
+
+        :return: List of dictionaries with collection, current, count, previous and swapped_at.
+        """
+        aliases = self.chroma_manager.aliases.get_all()
+        rows = []
+        for key in COLLECTIONS:
+            entry = aliases.get(key) or {}
+            collection = self.chroma_manager.get_collection(key)
+            rows.append({
+                "collection": key,
+                "current": collection.name,
+                "count": collection.count(),
+                "previous": entry.get("previous"),
+                "swapped_at": entry.get("swapped_at"),
+            })
+        return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Blue/green re-index of the ChromaDB collections from their source files.")
+    parser.add_argument("action", choices=["build", "swap", "rollback", "status", "drop-previous"],
+                        help="build: rebuild and swap in; swap: swap in a collection built with --no-swap; "
+                             "rollback: switch back to the previous collection; status: show the serving "
+                             "collections; drop-previous: delete the rollback copy.")
+    parser.add_argument("--collection", action="append", choices=COLLECTIONS, default=None,
+                        help="Collection to act on (repeatable, default: both).")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="PDF chunk size (default: 1000).")
+    parser.add_argument("--chunk-overlap", type=int, default=500, help="PDF chunk overlap (default: 500).")
+    parser.add_argument("--batch-size", type=int, default=256, help="Chunks per embedding call (default: 256).")
+    parser.add_argument("--max-chunks-per-second", type=float, default=None,
+                        help="Throttle embedding so live queries keep their latency (default: unlimited).")
+    parser.add_argument("--nice", type=int, default=10,
+                        help="Lower this process's CPU priority by this much (POSIX only, default: 10).")
+    parser.add_argument("--no-swap", action="store_true", help="Build the shadow collection but keep serving the old one.")
+    parser.add_argument("--shadow", default=None, help="Physical name of the collection to swap in (swap only).")
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="Swap even if some source files were not found (their chunks are dropped).")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH, help="Chunk manifest of the admin app.")
+    args = parser.parse_args(argv)
+
+    if args.action == "build" and args.nice and hasattr(os, "nice"):
+        os.nice(args.nice)
+
+    reindexer = BlueGreenReindexer(
+        manifest_path=args.manifest,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        batch_size=args.batch_size,
+        max_chunks_per_second=args.max_chunks_per_second,
+    )
+    collections = args.collection or list(COLLECTIONS)
+
+    if args.action == "status":
+        print(tabulate([list(row.values()) for row in reindexer.status()],
+                       headers=["Collection", "Serving", "Chunks", "Previous", "Swapped at"], tablefmt="grid"))
+        return 0
+
+    if args.action == "swap":
+        if not args.shadow or len(collections) != 1:
+            parser.error("swap needs --shadow and exactly one --collection.")
+        reindexer.chroma_manager.open_shadow_collection(collections[0], args.shadow)
+        reindexer.swap(collections[0])
+        return 0
+
+    if args.action == "rollback":
+        for key in collections:
+            reindexer.rollback(key)
+        return 0
+
+    if args.action == "drop-previous":
+        for key in collections:
+            dropped = reindexer.chroma_manager.drop_previous_collection(key)
+            print(f"Deleted '{dropped}'." if dropped else f"{key} has no previous collection.")
+        return 0
+
+    exit_code = 0
+    for key in collections:
+        report = reindexer.build(key)
+        print(f"Built '{report['shadow']}': {report['chunks']} chunks from {report['sources']} sources "
+              f"in {report['seconds']}s.")
+        if args.no_swap:
+            print(f"Not swapping {key} (--no-swap); '{report['shadow']}' is kept for inspection.")
+        elif report["missing"] and not args.allow_missing:
+            print(f"Not swapping {key}: {len(report['missing'])} source file(s) are missing. "
+                  f"Restore them or re-run with --allow-missing.")
+            exit_code = 1
+        else:
+            reindexer.swap(key)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,23 @@
-from Chroma import ChromaManager
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from Chroma import ChromaManager, distance_to_similarity
+from Ingestion import normalise_beers_value
 from tabulate import tabulate
 # MultiQuery Retrieval
 from langchain.retrievers.multi_query import MultiQueryRetriever
 from langchain_openai import ChatOpenAI
 from langchain_core.output_parsers import BaseOutputParser
 from langchain_core.prompts import PromptTemplate
-from typing import List
+from typing import Any, List, Optional
 # RePhraseQuery
 from langchain.retrievers import RePhraseQueryRetriever
 from langchain_core.output_parsers import StrOutputParser
 # EnsembleRetriever
 from langchain.retrievers import EnsembleRetriever
-from langchain_community.retrievers import BM25Retriever
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
 # Set logging for the queries
 import logging
@@ -19,6 +25,25 @@ import logging
 logging.basicConfig()
 logging.getLogger("langchain.retrievers.multi_query").setLevel(logging.INFO)
 
+# Collections searched by federated retrieval
+FEDERATED_COLLECTIONS = ("Structured_data", "Unstructured_data")
+
+# Search threads shared by every Retriever of the process, created on the first federated search.
+# Retrievers are built per request, so a pool per instance would leak its threads.
+FEDERATED_SEARCH_THREADS = 8
+_federated_executor = None
+_federated_executor_lock = threading.Lock()
+
+
+def federated_executor():
+    """Return the process-wide thread pool of the federated searches, creating it on first use."""
+    global _federated_executor
+    with _federated_executor_lock:
+        if _federated_executor is None:
+            _federated_executor = ThreadPoolExecutor(max_workers=FEDERATED_SEARCH_THREADS,
+                                                     thread_name_prefix="federated-search")
+        return _federated_executor
+
 # Output parser will split the LLM result into a list of queries
 class LineListOutputParser(BaseOutputParser[List[str]]):
     """Output parser for a list of lines."""
@@ -27,19 +52,42 @@ class LineListOutputParser(BaseOutputParser[List[str]]):
         lines = text.strip().split("\n")
         return list(filter(None, lines))  # Remove empty lines
 
+# Keyword side of the EnsembleRetriever, served by the persistent BM25 index of ChromaManager
+class KeywordIndexRetriever(BaseRetriever):
+    """BM25 retriever over a collection's on-disk keyword index."""
+
+    chroma_client: Any
+    collection_name: Optional[str] = None
+    k: int = 10
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return [
+            Document(page_content=doc["text"], metadata={"id": doc["id"], **(doc.get("metadata") or {})})
+            for doc, _ in self.chroma_client.keyword_search(query, k=self.k, collection_name=self.collection_name)
+        ]
+
 class Retriever:
-    def __init__(self, search_type="similarity", search_kwargs=None):
+    def __init__(self, search_type="similarity", search_kwargs=None, federated=None, collections=FEDERATED_COLLECTIONS):
         """
         Initialize the Retriever with default settings.
         
         :param search_type: The type of search to be performed (default: "similarity").
         :param search_kwargs: Additional keyword arguments for retriever functions (default: {'k': 10}).
         :param verbose: Enable verbose logging for debugging (default: False).
+        :param federated: Make retrieve() search all `collections` instead of only the active one
+                          (default: RETRIEVAL_FEDERATED). The other retrieve_* methods are not affected.
+        :param collections: Collections searched by retrieve_federated.
         """
         self.search_type = search_type
         self.search_kwargs = search_kwargs or {'k': 20}  # Default to 20 documents
         self.chroma_client = ChromaManager()
 
+        if federated is None:
+            federated = os.getenv("RETRIEVAL_FEDERATED", "").lower() in ("1", "true", "yes")
+        self.federated = federated
+        self.collections = list(collections)
+        self.last_timings = {}
+
     
     def _get_retriever(self, search_type=None, search_kwargs=None):
         """
@@ -52,7 +100,7 @@ class Retriever:
         # To switch to "Unstructured_data" collection
         # self.chroma_client.set_active_collection("Unstructured_data")
 
-        return self.chroma_client.vectorstore_client.as_retriever(
+        return self.chroma_client.get_vectorstore().as_retriever(
             search_type=search_type or self.search_type,
             search_kwargs=search_kwargs or self.search_kwargs
         )
@@ -65,6 +113,8 @@ class Retriever:
         :param query: The query for which to retrieve documents.
         :return: A list of retrieved documents.
         """
+        if self.federated:
+            return self.retrieve_federated(query, k=self.search_kwargs['k'])
         retriever = self._get_retriever()
         if not query.strip():
             print(f"Performing default retrieval (type: {self.search_type}, k: {self.search_kwargs['k']}) for query: {query}")
@@ -127,8 +177,123 @@ class Retriever:
             print(f"Retrieving with filter criteria: {filter_criteria}")
         results = retriever.invoke(query)
         return results
+
+    def build_beers_filter(self, drug=None, pharmacological_class=None, disease=None, interacting_drug=None,
+                           strength_of_recommendation=None, table=None, crcl=None):
+        """
+        Build a Chroma 'where' clause over the metadata kept by Ingestion_file.chunk_beers_table.
+
+        String fields accept a single value or a list of values (matched with '$in') and are
+        normalised the same way as at ingestion time.
+
+        :param crcl: Patient creatinine clearance (mL/min); keeps rows whose action threshold lies above it.
+        :return: A 'where' dictionary, or None when no criteria are given.
+        """
+        criteria = {
+            "drug": drug,
+            "pharmacological_class": pharmacological_class,
+            "disease": disease,
+            "interacting_drug": interacting_drug,
+            "strength_of_recommendation": strength_of_recommendation,
+        }
+
+        conditions = []
+        for field, value in criteria.items():
+            if not value:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                conditions.append({field: {"$in": [normalise_beers_value(v) for v in value]}})
+            else:
+                conditions.append({field: normalise_beers_value(value)})
+        if table:
+            conditions.append({"table": table})
+        if crcl is not None:
+            conditions.append({"crcl_max": {"$gt": crcl}})
+
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def retrieve_beers(self, query, num_documents=10, **criteria):
+        """
+        Similarity search restricted to Beers table rows matching the given metadata criteria.
+
+        :param query: The query for which to retrieve documents.
+        :param num_documents: The number of documents to retrieve.
+        :param criteria: Keyword arguments accepted by build_beers_filter (e.g. drug="Warfarin").
+        :return: A list of retrieved documents.
+        """
+        filter_criteria = self.build_beers_filter(**criteria)
+        if filter_criteria is None:
+            return self._get_retriever(search_kwargs={'k': num_documents}).invoke(query)
+        try:
+            return self.retrieve_with_filter(query, filter_criteria, num_documents=num_documents)
+        except Exception as e:
+            print(f"Error during Beers filtered retrieval: {e}")
+            return []
     #==========================
 
+    #=== Federated Retrieval ===
+    def _search_collection(self, embedding, k, collection_name, where):
+        start = time.perf_counter()
+        results = self.chroma_client.similarity_search_by_vector(embedding, k=k, collection_name=collection_name, where=where)
+        return results, (time.perf_counter() - start) * 1000
+
+    def retrieve_federated(self, query, k=10, where=None, normalisation="cosine"):
+        """
+        Search every collection concurrently and merge the hits into one ranked list.
+
+        The query is embedded once and the collections are searched in parallel, so the latency is
+        the embedding plus the slowest search instead of the sum of the searches. Before merging,
+        the distances are put on one scale:
+          - "cosine": cosine similarity, derived from each collection's distance space. The collections
+            share one embedding model, so these scores are directly comparable.
+          - "minmax": similarities rescaled to [0, 1] within each collection, so every collection's
+            best hit ranks at the top.
+
+        :param query: The query for which to retrieve documents.
+        :param k: Number of documents returned in total; each collection is asked for k.
+        :param where: Optional metadata filter applied in every collection.
+        :param normalisation: "cosine" or "minmax".
+        :return: A list of documents, best first, with 'collection' and 'retrieval_score' in their metadata.
+        """
+        if normalisation not in ("cosine", "minmax"):
+            raise ValueError("normalisation must be 'cosine' or 'minmax'.")
+
+        start = time.perf_counter()
+        embedding = self.chroma_client.embedding_function.embed_query(query)
+        timings = {"embed_ms": (time.perf_counter() - start) * 1000}
+        futures = {
+            name: federated_executor().submit(self._search_collection, embedding, k, name, where)
+            for name in self.collections
+        }
+
+        merged = []
+        for name, future in futures.items():
+            try:
+                results, timings[f"{name}_ms"] = future.result()
+            except Exception as e:
+                # One failing collection should not hide the hits of the other
+                print(f"Error during federated retrieval from {name}: {e}")
+                continue
+
+            # Looked up per query: a blue/green re-index may swap in a collection with another space
+            space = self.chroma_client.get_index_params(name)["space"]
+            scores = [distance_to_similarity(distance, space) for _, distance in results]
+            if normalisation == "minmax" and scores:
+                low, high = min(scores), max(scores)
+                scores = [(score - low) / (high - low) if high > low else 1.0 for score in scores]
+            for (doc, _), score in zip(results, scores):
+                doc.metadata["collection"] = name
+                doc.metadata["retrieval_score"] = float(score)
+                merged.append(doc)
+
+        merged.sort(key=lambda doc: doc.metadata["retrieval_score"], reverse=True)
+        timings["total_ms"] = (time.perf_counter() - start) * 1000
+        self.last_timings = timings
+        return merged[:k]
+    #=========================
+
     #=== EnsembleRetriever ===
     def retrieve_ensemble(self, query, k=10):
         try:
@@ -138,18 +303,8 @@ class Retriever:
                 search_kwargs={'k': k}
             )
 
-            # Fetch stored documents using the existing function in Chroma class
-            stored_docs = self.chroma_client.list_documents()
-
-            # Convert stored_docs to a list of Document objects
-            documents = [
-                Document(page_content=doc["text"], metadata={"id": doc["id"], **doc.get("metadata", {})}) 
-                for doc in stored_docs
-            ]
-
-            # Initialize BM25 Retriever
-            bm25_retriever = BM25Retriever.from_documents(documents)
-            bm25_retriever.k = k  # Number of documents to retrieve
+            # BM25 Retriever over the persistent keyword index: only the query terms' postings are read
+            bm25_retriever = KeywordIndexRetriever(chroma_client=self.chroma_client, k=k)
 
             # Ensemble Retriever
             ensemble_retriever = EnsembleRetriever(
@@ -344,6 +499,12 @@ def test_script1():
     print("\n--- Testing Ensemble Retrieval ---")
     ensemble_results = retriever.retrieve_ensemble(query)
     print(retriever.format_results(ensemble_results))
+
+    # Test 8: Federated retrieval over both collections
+    print("\n--- Testing Federated Retrieval ---")
+    federated_results = retriever.retrieve_federated(query)
+    print(retriever.format_results(federated_results))
+    print({name: round(ms, 1) for name, ms in retriever.last_timings.items()})
     
 
 if __name__ == "__main__":    
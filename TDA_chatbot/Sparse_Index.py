@@ -0,0 +1,325 @@
+import os
+import re
+import sys
+import math
+import heapq
+import sqlite3
+import argparse
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+
+INDEX_FILE = "bm25_index.sqlite3"
+
+# One BM25Index per index file and process, shared by every ChromaManager (see shared_bm25_index)
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+# Words too frequent to help ranking; skipping them keeps queries off the longest posting lists
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can do does for from had has have he her his how i if in into is it its "
+    "may more most no not of on or our should she so such than that the their them then there these they this "
+    "those to was we were what when where which while who will with would you your".split()
+)
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens without stopwords, the same for indexed chunks and queries."""
+    return [token for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in STOPWORDS]
+
+
+def _chunked(items, size=500):
+    # Stays below SQLite's limit on bound parameters per statement
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class BM25Index:
+    def __init__(self, db_path, k1=1.5, b=0.75):
+        """
+        On-disk inverted index scoring ChromaDB chunks with BM25.
+
+        Postings, document frequencies, document lengths and corpus totals are kept per physical
+        collection and maintained by ChromaManager whenever chunks are written or deleted, so a
+        query only reads the posting lists of its own terms instead of the whole collection.
+
+        :param db_path: Path of the SQLite file holding the index.
+        :param k1: BM25 term-frequency saturation.
+        :param b: BM25 document-length normalisation.
+        """
+        self.db_path = db_path
+        self.k1 = k1
+        self.b = b
+        self.verified = {}  # Collection name -> ChromaDB collection ID checked by this process
+        self._create_tables()
+
+    @contextmanager
+    def _connect(self, write=False):
+        """
+        Open a connection, committed (or rolled back) and closed on exit.
+
+        :param write: Take the write lock up front with BEGIN IMMEDIATE. sqlite3 only begins a
+                      transaction at the first write, so the counts read before it could otherwise
+                      be changed by another process's writer in between.
+        """
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            if write:
+                connection.execute("BEGIN IMMEDIATE")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _create_tables(self):
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS bm25_collections (
+                    collection TEXT PRIMARY KEY,
+                    doc_count INTEGER NOT NULL,
+                    total_length INTEGER NOT NULL,
+                    collection_id TEXT
+                )
+            """)
+            # Indexes created before collections were identified by ID have no collection_id column
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(bm25_collections)")}
+            if "collection_id" not in columns:
+                connection.execute("ALTER TABLE bm25_collections ADD COLUMN collection_id TEXT")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS bm25_docs (
+                    collection TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    length INTEGER NOT NULL,
+                    PRIMARY KEY (collection, doc_id)
+                ) WITHOUT ROWID
+            """)
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS bm25_terms (
+                    collection TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    df INTEGER NOT NULL,
+                    PRIMARY KEY (collection, term)
+                ) WITHOUT ROWID
+            """)
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS bm25_postings (
+                    collection TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (collection, term, doc_id)
+                ) WITHOUT ROWID
+            """)
+            # Reverse lookup, to find the postings of a deleted chunk
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS bm25_postings_doc ON bm25_postings (collection, doc_id)"
+            )
+
+    def _update_totals(self, connection, collection, doc_count, total_length):
+        connection.execute(
+            "INSERT INTO bm25_collections (collection, doc_count, total_length) VALUES (?, ?, ?) "
+            "ON CONFLICT(collection) DO UPDATE SET doc_count = doc_count + excluded.doc_count, "
+            "total_length = total_length + excluded.total_length",
+            (collection, doc_count, total_length)
+        )
+
+    def _remove(self, connection, collection, ids):
+        for batch in _chunked(list(ids)):
+            placeholders = ",".join("?" * len(batch))
+            removed = connection.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM bm25_docs "
+                f"WHERE collection = ? AND doc_id IN ({placeholders})", (collection, *batch)
+            ).fetchone()
+            if not removed[0]:
+                continue
+
+            terms = connection.execute(
+                f"SELECT term, COUNT(*) FROM bm25_postings WHERE collection = ? AND doc_id IN ({placeholders}) "
+                f"GROUP BY term", (collection, *batch)
+            ).fetchall()
+            connection.executemany(
+                "UPDATE bm25_terms SET df = df - ? WHERE collection = ? AND term = ?",
+                [(count, collection, term) for term, count in terms]
+            )
+            connection.executemany(
+                "DELETE FROM bm25_terms WHERE collection = ? AND term = ? AND df <= 0",
+                [(collection, term) for term, _ in terms]
+            )
+            connection.execute(f"DELETE FROM bm25_postings WHERE collection = ? AND doc_id IN ({placeholders})",
+                               (collection, *batch))
+            connection.execute(f"DELETE FROM bm25_docs WHERE collection = ? AND doc_id IN ({placeholders})",
+                               (collection, *batch))
+            self._update_totals(connection, collection, -removed[0], -removed[1])
+
+    def add(self, collection, ids, texts, collection_id=None):
+        """
+        Index (or re-index) chunks, with upsert semantics like ChromaDB's.
+
+        :param collection: Physical ChromaDB collection name.
+        :param ids: Chunk IDs.
+        :param texts: Chunk texts, same order.
+        :param collection_id: ChromaDB ID of the collection. If the index holds another collection of
+                              the same name (deleted and created again), that index is dropped first.
+        """
+        # A repeated ID keeps its last text, as an upsert would
+        documents = dict(zip(ids, texts))
+        if not documents:
+            return
+
+        docs, postings, document_frequency = [], [], Counter()
+        total_length = 0
+        for doc_id, text in documents.items():
+            counts = Counter(tokenize(text or ""))
+            length = sum(counts.values())
+            total_length += length
+            docs.append((collection, doc_id, length))
+            postings.extend((collection, term, doc_id, tf) for term, tf in counts.items())
+            document_frequency.update(counts.keys())
+
+        with self._connect(write=True) as connection:
+            if collection_id is not None:
+                stored = connection.execute(
+                    "SELECT collection_id FROM bm25_collections WHERE collection = ?", (collection,)
+                ).fetchone()
+                if stored and stored[0] not in (None, collection_id):
+                    self._drop(connection, collection)
+                    self.verified.pop(collection, None)
+            self._remove(connection, collection, list(documents))
+            connection.executemany("INSERT INTO bm25_docs (collection, doc_id, length) VALUES (?, ?, ?)", docs)
+            connection.executemany(
+                "INSERT INTO bm25_postings (collection, term, doc_id, tf) VALUES (?, ?, ?, ?)", postings
+            )
+            connection.executemany(
+                "INSERT INTO bm25_terms (collection, term, df) VALUES (?, ?, ?) "
+                "ON CONFLICT(collection, term) DO UPDATE SET df = df + excluded.df",
+                [(collection, term, df) for term, df in document_frequency.items()]
+            )
+            self._update_totals(connection, collection, len(docs), total_length)
+            if collection_id is not None:
+                connection.execute("UPDATE bm25_collections SET collection_id = ? WHERE collection = ?",
+                                   (collection_id, collection))
+
+    def remove(self, collection, ids):
+        """Remove chunks from the index (unknown IDs are ignored)."""
+        if ids:
+            with self._connect(write=True) as connection:
+                self._remove(connection, collection, ids)
+
+    def _drop(self, connection, collection):
+        for table in ("bm25_postings", "bm25_terms", "bm25_docs", "bm25_collections"):
+            connection.execute(f"DELETE FROM {table} WHERE collection = ?", (collection,))
+
+    def drop(self, collection):
+        """Forget a whole collection, e.g. when it is deleted."""
+        with self._connect(write=True) as connection:
+            self._drop(connection, collection)
+        self.verified.pop(collection, None)
+
+    def count(self, collection):
+        """Return the number of chunks indexed for a collection."""
+        return self.describe(collection)[0]
+
+    def describe(self, collection):
+        """
+        Return what the index holds for a collection.
+
+        :return: Tuple of (number of chunks indexed, ChromaDB ID of the indexed collection or None).
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT doc_count, collection_id FROM bm25_collections WHERE collection = ?", (collection,)
+            ).fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    def search(self, collection, query, k=10):
+        """
+        Return the k best BM25 matches of a query.
+
+        IDF is computed from the stored document frequencies as log(1 + (N - df + 0.5) / (df + 0.5)),
+        which stays positive for terms that occur in most chunks.
+
+        :param collection: Physical ChromaDB collection name.
+        :param query: Query text.
+        :param k: Number of chunks to return.
+        :return: List of (chunk ID, score) tuples, best first.
+        """
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+
+        scores = Counter()
+        with self._connect() as connection:
+            totals = connection.execute(
+                "SELECT doc_count, total_length FROM bm25_collections WHERE collection = ?", (collection,)
+            ).fetchone()
+            if not totals or not totals[0]:
+                return []
+            doc_count, total_length = totals
+            average_length = total_length / doc_count or 1.0
+
+            for batch in _chunked(terms):
+                placeholders = ",".join("?" * len(batch))
+                idf = {
+                    term: math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                    for term, df in connection.execute(
+                        f"SELECT term, df FROM bm25_terms WHERE collection = ? AND term IN ({placeholders})",
+                        (collection, *batch)
+                    )
+                }
+                postings = connection.execute(
+                    f"SELECT p.term, p.doc_id, p.tf, d.length FROM bm25_postings p "
+                    f"JOIN bm25_docs d ON d.collection = p.collection AND d.doc_id = p.doc_id "
+                    f"WHERE p.collection = ? AND p.term IN ({placeholders})", (collection, *batch)
+                )
+                for term, doc_id, tf, length in postings:
+                    norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[doc_id] += idf[term] * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def shared_bm25_index(db_path):
+    """
+    Return the process-wide BM25Index of an index file, creating it on first use.
+
+    Every ChromaManager of a process gets the same instance, so a collection is checked
+    against ChromaDB once per process, not once per manager.
+    """
+    db_path = os.path.abspath(db_path)
+    with _indexes_lock:
+        if db_path not in _indexes:
+            _indexes[db_path] = BM25Index(db_path)
+        return _indexes[db_path]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild or query the BM25 keyword index of the ChromaDB collections.")
+    parser.add_argument("action", choices=["rebuild", "search"])
+    parser.add_argument("--collection", action="append", default=None,
+                        help="Collection to act on (repeatable, default: Structured_data and Unstructured_data).")
+    parser.add_argument("--query", default=None, help="Query text (search only).")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    from Chroma import ChromaManager
+    chroma_manager = ChromaManager()
+    collections = args.collection or ["Structured_data", "Unstructured_data"]
+
+    if args.action == "rebuild":
+        for name in collections:
+            print(f"Indexed {chroma_manager.rebuild_keyword_index(name)} chunks of {name}.")
+        return 0
+
+    if not args.query:
+        parser.error("search needs --query.")
+    for name in collections:
+        print(f"\n{name}:")
+        for document, score in chroma_manager.keyword_search(args.query, k=args.k, collection_name=name):
+            print(f"  {score:7.3f}  {document['text'][:100]!r}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,17 @@
-from flask import Flask, redirect, url_for, render_template, request, session, flash
+from flask import Flask, redirect, url_for, render_template, request, session, flash, jsonify
 from datetime import timedelta
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, inspect, text
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
-from Ingestion import Ingestion_file
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
 from Chroma import ChromaManager
+from Model_Registry import model_registry
+from Job_Queue import IngestionJobQueue, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED
+from Chunk_Manifest import ChunkManifest
 from datetime import datetime
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  
@@ -16,10 +23,26 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.sqlite3'
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['ALLOWED_EXTENSIONS'] = {'pdf','csv'}
+app.config['INGESTION_WORKERS'] = int(os.getenv("INGESTION_WORKERS", "1"))
+# Requests above the cap are rejected from their Content-Length before the body is read
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv("MAX_UPLOAD_MB", "100")) * 1024 * 1024
+app.config['UPLOAD_BLOCK_SIZE'] = 1024 * 1024
+app.config['DOCUMENTS_PER_PAGE'] = int(os.getenv("DOCUMENTS_PER_PAGE", "50"))
 app.permanent_session_lifetime = timedelta(minutes=5)
 
 db = SQLAlchemy(app)
 
+# Uploaded files are parsed, chunked and embedded by background workers
+os.makedirs(app.instance_path, exist_ok=True)
+# The workers record every indexed chunk ID of a resource in the manifest
+chunk_manifest = ChunkManifest(os.path.join(app.instance_path, "chunk_manifest.sqlite3"))
+job_queue = IngestionJobQueue(os.path.join(app.instance_path, "ingestion_jobs.sqlite3"),
+                              manifest_path=chunk_manifest.db_path)
+
+# One ChromaManager for the lifetime of the process, created on first use (see get_vector_store)
+_vector_store = None
+_vector_store_lock = threading.Lock()
+
 
 class User(db.Model):
     _id = db.Column("user_id", db.Integer, primary_key=True)
@@ -42,15 +65,19 @@ class Resource(db.Model):
     resource_type = db.Column(db.String(100))
     supplier_name = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.now)
+    status = db.Column(db.String(20), default="ready")  # processing | ready | failed
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 of the uploaded file
     admin = db.relationship("User", backref="resources")
 
 
 
-    def __init__(self, resource_name, admin_id, resource_type, supplier_name):
+    def __init__(self, resource_name, admin_id, resource_type, supplier_name, status="ready", content_hash=None):
         self.resource_name = resource_name
         self.admin_id = admin_id
         self.resource_type = resource_type
         self.supplier_name = supplier_name
+        self.status = status
+        self.content_hash = content_hash
 
 class AuditLog(db.Model):
     admin_log_id = db.Column(db.Integer, primary_key=True)
@@ -70,9 +97,133 @@ def create_admin():
         db.session.add(admin)
         db.session.commit()
 
+def ensure_resource_columns():
+    # Databases created by earlier versions lack resource.status and resource.content_hash
+    columns = [column["name"] for column in inspect(db.engine).get_columns("resource")]
+    with db.engine.begin() as connection:
+        if "status" not in columns:
+            connection.execute(text("ALTER TABLE resource ADD COLUMN status VARCHAR(20) DEFAULT 'ready'"))
+        if "content_hash" not in columns:
+            connection.execute(text("ALTER TABLE resource ADD COLUMN content_hash VARCHAR(64)"))
+
+    # Hash files uploaded before content de-duplication existed
+    for resource in Resource.query.filter_by(content_hash=None).all():
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], resource.resource_name)
+        if os.path.exists(file_path):
+            with open(file_path, "rb") as file:
+                resource.content_hash, _ = stream_upload(file, os.devnull, max_size=0)
+    db.session.commit()
+
+def ensure_chunk_manifest():
+    # Resources indexed before the manifest existed are looked up once by their source path
+    for resource in Resource.query.filter_by(status="ready").all():
+        collection_name = collection_for(resource.resource_name)
+        if collection_name is None or chunk_manifest.has_resource(resource.resource_name):
+            continue
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], resource.resource_name)
+        collection = get_vector_store().get_collection(collection_name)
+        chunk_ids = collection.get(where={"source": file_path}, include=[])["ids"]
+        chunk_manifest.replace_chunks(resource.resource_name, collection_name, file_path, chunk_ids)
+        print(f"Added {len(chunk_ids)} chunks of '{resource.resource_name}' to the chunk manifest.")
+
 def file_exists(filename):
     return os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], filename))
 
+def stream_upload(stream, destination, max_size=None):
+    """
+    Copy an upload to disk in fixed-size blocks, hashing it on the way.
+
+    :param stream: Readable binary stream (e.g. FileStorage.stream).
+    :param destination: Path the content is written to.
+    :param max_size: Size cap in bytes (default: MAX_CONTENT_LENGTH, 0 disables the cap).
+    :return: Tuple of (SHA-256 hex digest, size in bytes).
+    :raises RequestEntityTooLarge: If the content exceeds MAX_CONTENT_LENGTH.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    block_size = app.config['UPLOAD_BLOCK_SIZE']
+    if max_size is None:
+        max_size = app.config['MAX_CONTENT_LENGTH']
+    with open(destination, "wb") as output:
+        while True:
+            block = stream.read(block_size)
+            if not block:
+                break
+            size += len(block)
+            if max_size and size > max_size:
+                raise RequestEntityTooLarge()
+            digest.update(block)
+            output.write(block)
+    return digest.hexdigest(), size
+
+@contextmanager
+def save_upload(file, filename):
+    """
+    Stream an uploaded file into a uniquely named temporary file of the upload folder.
+
+    Concurrent uploads of the same filename get separate temporary files. Unless the caller has
+    moved it into place with os.replace, the temporary file is removed when the block exits,
+    also on errors.
+
+    :return: Context manager yielding (temporary path, SHA-256 hex digest), or (None, None) if the file is too large.
+    """
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=app.config['UPLOAD_FOLDER'], prefix=f".{filename}.", suffix=".part",
+                                     delete=False) as temp_file:
+        temp_path = temp_file.name
+    try:
+        try:
+            content_hash, _ = stream_upload(file.stream, temp_path)
+        except RequestEntityTooLarge:
+            flash(f"File '{filename}' exceeds the {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB upload limit.")
+            yield None, None
+            return
+        yield temp_path, content_hash
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def get_vector_store():
+    """
+    Return the process-wide ChromaManager, opening it on first use.
+
+    The manager is shared by all requests, so routes must pass collection_name on every call
+    instead of switching the active collection.
+    """
+    global _vector_store
+    if _vector_store is None:
+        with _vector_store_lock:
+            if _vector_store is None:
+                _vector_store = ChromaManager()
+    return _vector_store
+
+def collection_for(filename):
+    if filename.lower().endswith('.pdf'):
+        return "Unstructured_data"
+    if filename.lower().endswith('.csv'):
+        return "Structured_data"
+    return None
+
+def refresh_resource_status(resources):
+    """
+    Mark resources as ready (or failed) once their background ingestion job has finished.
+
+    :return: Dictionary mapping resource name to its latest ingestion job.
+    """
+    jobs = job_queue.latest_jobs([resource.resource_name for resource in resources if resource.status == "processing"])
+    changed = False
+    for resource in resources:
+        job = jobs.get(resource.resource_name)
+        if job and job["status"] == STATUS_DONE:
+            resource.status = "ready"
+            changed = True
+        elif job and job["status"] == STATUS_FAILED:
+            resource.status = "failed"
+            changed = True
+    if changed:
+        db.session.commit()
+    return jobs
+
 
 @app.route("/home")
 @app.route("/")
@@ -85,7 +236,6 @@ def home():
 #VIEW, EDIT, AND DELETE RESOURCES
 @app.route("/view-post", methods=["GET", "POST"])
 def view_post():
-    chroma_manager = ChromaManager()
     if "user" not in session:
         flash("You must be logged in to view posts.")
         return redirect(url_for("login"))
@@ -110,40 +260,44 @@ def view_post():
             filename = file.filename
 
             if file_exists(filename):
+                if "update_existing" in request.form:
+                    return update_resource_incrementally(file, filename, user_id)
                 flash(f"File '{filename}' already exists. Please confirm if it is the correct file. ")
-                flash(f"Otherwise delete the existing file and re-upload file with latest changes. ")
+                flash(f"Otherwise tick 'Update existing file' to re-index only the changed content. ")
+                return redirect(url_for("view_post"))
+
+            # A deleted resource's job removes the chunks it wrote when it stops, which could include the new upload's
+            previous_job = job_queue.latest_jobs([filename]).get(filename)
+            if previous_job and previous_job["status"] == STATUS_RUNNING:
+                flash(f"Ingestion of the deleted '{filename}' is still stopping. Please upload it again in a moment.")
                 return redirect(url_for("view_post"))
             
-            # Save the file if it doesn't exist
-            file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-
-            if filename.lower().endswith('.pdf'):
-                documents = Ingestion_file().chunk_pdf_text(file_path)
-                if documents:
-                    # Getting name of current collection
-                    chroma_manager.set_active_collection("Unstructured_data") # QChye 
-                    current_collection=chroma_manager.get_current_collection() # QChye 
-                    print(f"Currently using {current_collection} collection.") # QChye 
-                    #(ChromaManager initialized the default to "Structured_data" collection so need to switch it to "Unstructured_data" collection)
-                    chroma_manager.add_documents(documents) # QChye
-                    flash(f"Processed and indexed {len(documents)} documents!")
-            elif filename.lower().endswith('.csv'):
-                documents = Ingestion_file().chunk_csv_text(file_path)
-                if documents:
-                    current_collection=chroma_manager.get_current_collection() # QChye 
-                    print(f"Currently using {current_collection} collection.") # QChye 
-                    chroma_manager.add_documents(documents) # QChye
-                    flash(f"Processed and indexed {len(documents)} documents!")
-            else:
+            # PDFs go to "Unstructured_data", CSVs to "Structured_data"
+            collection = collection_for(filename)
+            if collection is None:
                 flash("Only PDF and CSV files are allowed.")
                 return redirect(url_for("view_post"))
 
+            # Stream the file to disk and reject byte-identical copies of an existing resource
+            with save_upload(file, filename) as (temp_path, content_hash):
+                if temp_path is None:
+                    return redirect(url_for("view_post"))
+
+                duplicate = Resource.query.filter_by(content_hash=content_hash).first()
+                if duplicate:
+                    flash(f"File '{filename}' is identical to the existing resource '{duplicate.resource_name}'. It was not indexed again.")
+                    return redirect(url_for("view_post"))
+
+                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                os.replace(temp_path, file_path)
+
             new_resource = Resource(
                 resource_name=filename,
                 admin_id=user_id,
                 resource_type=resource_type,
-                supplier_name=supplier_name
+                supplier_name=supplier_name,
+                status="processing",
+                content_hash=content_hash
             )
             db.session.add(new_resource)
 
@@ -156,7 +310,9 @@ def view_post():
             db.session.add(AuditLog(admin_id=user_id, action=action))
             db.session.commit()
 
-            flash("Resource added successfully!")
+            # Parsing, chunking and embedding happen in a background worker
+            job_id = job_queue.enqueue(filename, file_path, collection)
+            flash(f"Resource added successfully! Ingestion job #{job_id} is processing the file in the background.")
             return redirect(url_for("view_post"))
 
     elif "edit_resource" in request.form:
@@ -197,12 +353,8 @@ def view_post():
         if resource:
             file_path = os.path.join(app.config['UPLOAD_FOLDER'], resource.resource_name)
 
-            manager = ChromaManager()
-            if resource.resource_name.lower().endswith(".pdf"):
-                manager.set_active_collection("Unstructured_data")
-            elif resource.resource_name.lower().endswith(".csv"):
-                manager.set_active_collection("Structured_data")
-            else:
+            collection_name = collection_for(resource.resource_name)
+            if collection_name is None:
                 flash("Only PDF and CSV files can be deleted from ChromaDB.")
                 return redirect(url_for("view_post"))
 
@@ -210,8 +362,16 @@ def view_post():
             if os.path.exists(file_path):
                 os.remove(file_path)
 
+            # A running ingestion job stops after its current batch and removes the chunks it wrote since
+            stopped = job_queue.cancel(resource.resource_name)
+
             print(f"Deleting from ChromaDB: {file_path}")
-            manager.delete_documents_by_metadata_source(source_value=file_path)
+            entry = chunk_manifest.get_resource(resource.resource_name)
+            if entry is not None:
+                get_vector_store().delete_documents(entry["chunk_ids"], collection_name=entry["collection"])
+            else:
+                get_vector_store().delete_documents_by_metadata_source(source_value=file_path, collection_name=collection_name)
+            chunk_manifest.delete_resource(resource.resource_name)
 
 
             db.session.delete(resource)
@@ -227,45 +387,123 @@ def view_post():
             db.session.commit()
 
             flash("Resource deleted successfully!")
+            if stopped:
+                flash("Its ingestion job was stopped; the chunks it indexed are being removed.")
             return redirect(url_for("view_post"))
 
-    return render_template("view_post.html", resources=resources)
+    jobs = refresh_resource_status(resources)
+    return render_template("view_post.html", resources=resources, jobs=jobs)
 
-@app.route("/view_document/<filename>")
-def view_document(filename):
-    manager = ChromaManager()
+def update_resource_incrementally(file, filename, user_id):
+    """
+    Replace an uploaded file with a revised version and queue a job re-indexing only its changed chunks.
+    """
+    with save_upload(file, filename) as (temp_path, content_hash):
+        if temp_path is None:
+            return redirect(url_for("view_post"))
 
+        resource = Resource.query.filter_by(resource_name=filename).first()
+        if resource and resource.content_hash == content_hash:
+            flash(f"'{filename}' is unchanged. Nothing to re-index.")
+            return redirect(url_for("view_post"))
 
-    if filename.lower().endswith('.pdf'):
-        manager.set_active_collection("Unstructured_data")
-        current_collection = manager.get_current_collection()
-        print(f"Currently using {current_collection} collection.")
-    elif filename.lower().endswith('.csv'):
-        manager.set_active_collection("Structured_data")
-        current_collection = manager.get_current_collection()
-        print(f"Currently using {current_collection} collection.")
-    else:
-        flash("Only PDF and CSV files are allowed.")
-        return redirect(url_for("view_post"))
-    
+        duplicate = Resource.query.filter(Resource.content_hash == content_hash, Resource.resource_name != filename).first()
+        if duplicate:
+            flash(f"File '{filename}' is identical to the existing resource '{duplicate.resource_name}'. It was not indexed again.")
+            return redirect(url_for("view_post"))
 
-    documents = manager.list_documents()
-    print(documents)
-   
-    if not documents:
-        flash("No documents found in the collection.")
-        return redirect(url_for("view_post"))
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        os.replace(temp_path, file_path)
 
-  
-    filtered_docs = [doc for doc in documents if filename.lower() in doc["metadata"].get("source", "").lower()]
-    
+    if resource:
+        resource.status = "processing"
+        resource.content_hash = content_hash
+
+    job_id = job_queue.enqueue(filename, file_path, collection_for(filename), mode="sync")
+    flash(f"Ingestion job #{job_id} is re-indexing the changed content of '{filename}' in the background.")
+
+    action = f"{session['user']} has updated '{filename}'"
+    if db.session.query(AuditLog).count() >= 20:
+        oldest_log = AuditLog.query.order_by(AuditLog.timestamp).first()
+        db.session.delete(oldest_log)
+
+    db.session.add(AuditLog(admin_id=user_id, action=action))
+    db.session.commit()
+
+    return redirect(url_for("view_post"))
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(error):
+    flash(f"The upload exceeds the {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB limit.")
+    return redirect(url_for("view_post"))
+
+@app.route("/ingestion-job/<int:job_id>")
+def ingestion_job(job_id):
+    if "user" not in session:
+        return jsonify({"error": "You must be logged in to view ingestion jobs."}), 401
+
+    job = job_queue.get_job(job_id)
+    if job is None:
+        return jsonify({"error": f"Ingestion job #{job_id} not found."}), 404
+
+    if job["status"] in (STATUS_DONE, STATUS_FAILED):
+        refresh_resource_status(Resource.query.filter_by(resource_name=job["resource_name"]).all())
+
+    return jsonify(job)
+
+@app.route("/health")
+def health():
+    """Report whether the vector store can be reached and which models are loaded."""
+    try:
+        vector_store = get_vector_store().health_check()
+    except Exception as e:
+        return jsonify({"status": "error", "error": str(e)}), 503
+
+    return jsonify({
+        "status": "ok",
+        "vector_store": vector_store,
+        "models": model_registry.get_stats(),
+        "ingestion_workers": sum(worker.is_alive() for worker in job_queue.workers),
+    })
+
+@app.route("/view_document/<filename>")
+def view_document(filename):
+    collection_name = collection_for(filename)
+    if collection_name is None:
+        flash("Only PDF and CSV files are allowed.")
+        return redirect(url_for("view_post"))
+    print(f"Currently using {collection_name} collection.")
+
+    per_page = app.config['DOCUMENTS_PER_PAGE']
+    page = max(request.args.get("page", 1, type=int), 1)
+
+    offset = (page - 1) * per_page
+    entry = chunk_manifest.get_entry(filename)
+    if entry is not None:
+        # Page over the manifest's chunk IDs and fetch just those chunks by ID
+        total = chunk_manifest.count_chunks(filename)
+        chunk_ids = chunk_manifest.list_chunk_ids(filename, limit=per_page, offset=offset)
+        found = {doc["id"]: doc for doc in get_vector_store().get_documents(chunk_ids, collection_name=entry["collection"])}
+        filtered_docs = [found[chunk_id] for chunk_id in chunk_ids if chunk_id in found]
+        has_next = offset + per_page < total
+    else:
+        # Resources indexed before the manifest existed: filter the collection by source
+        total = None
+        result = get_vector_store().list_documents_page(
+            collection_name=collection_name, limit=per_page, offset=offset,
+            source=os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        )
+        filtered_docs = result["documents"]
+        has_next = result["next_offset"] is not None
 
     if not filtered_docs:
         flash(f"No documents found for {filename}.")
         return redirect(url_for("view_post"))
     
 
-    return render_template("ad_view_document.html", documents=filtered_docs, filename=filename)
+    pages = -(-total // per_page) if total else None
+    return render_template("ad_view_document.html", documents=filtered_docs, filename=filename, page=page,
+                           pages=pages, offset=offset, has_next=has_next)
 
 
 
@@ -420,5 +658,8 @@ def audit_log():
 if __name__ == "__main__":
     with app.app_context():
         db.create_all()
+        ensure_resource_columns()
+        ensure_chunk_manifest()
         create_admin()  
+    job_queue.start_workers(app.config['INGESTION_WORKERS'])
     app.run(debug=False, port=5001)